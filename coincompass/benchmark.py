@@ -0,0 +1,318 @@
+"""Benchmark BudgetTracker and the app's refresh paths on synthetic ledgers
+
+Each (backend, size) case runs in a fresh process and a scratch directory,
+so peak memory is per case. Results go to a JSON file that --compare can
+check against an earlier run:
+    
+    python benchmark.py --sizes 10k,100k --output new.json
+    python benchmark.py --compare old.json new.json
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ledger import (CURRENCY, BudgetTracker, SQLiteStorage, create_storage, migrate_to_binary,
+                    migrate_to_partitions, peak_memory_kb)
+
+
+# Relative frequency, median amount and typical payees of each category
+EXPENSE_CATEGORIES = {
+    "Groceries": (30, 45, ("Safeway", "Trader Joe's", "Whole Foods", "Aldi")),
+    "Dining": (15, 25, ("Chipotle", "Starbucks", "Pizza Place", "Sushi Bar")),
+    "Transport": (15, 15, ("Uber", "Metro Card", "Shell", "Parking")),
+    "Shopping": (12, 60, ("Amazon", "Target", "IKEA", "Best Buy")),
+    "Entertainment": (10, 30, ("Netflix", "Cinema", "Spotify", "Concert")),
+    "Utilities": (5, 120, ("Electric Co", "Water Dept", "Internet", "Phone Bill")),
+    "Health": (5, 80, ("Pharmacy", "Dentist", "Gym", "Clinic")),
+    "Rent": (3, 1400, ("Landlord",)),
+    "Travel": (2, 600, ("Airline", "Hotel", "Car Rental")),
+    "Other": (3, 20, ("Misc", "Gift", "Donation")),
+}
+INCOME_CATEGORIES = {
+    "Salary": (6, 2500, ("Employer Payroll",)),
+    "Freelance": (3, 400, ("Client Invoice",)),
+    "Interest": (1, 15, ("Savings Interest",)),
+}
+INCOME_SHARE = 0.1
+
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+SAMPLES = 200
+GUI_SAMPLES = 20
+PAGE_SIZE = 100
+
+
+def parse_size(text):
+    """Turn 10k, 1m or 2500 into a row count"""
+    text = text.strip().lower()
+    if text[-1:] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def generate_ledger(size, seed=0, start=datetime.date(2015, 1, 1), days=3650):
+    """Yield size transactions spread evenly over days, oldest first
+    
+    Categories, payees and log-normal amounts follow the tables above, so
+    aggregates and text have the shape of a real household ledger.
+    """
+    rng = random.Random(seed)
+    expenses = list(EXPENSE_CATEGORIES.items())
+    expense_weights = [weight for _, (weight, _, _) in expenses]
+    incomes = list(INCOME_CATEGORIES.items())
+    income_weights = [weight for _, (weight, _, _) in incomes]
+    first_day = start.toordinal()
+    
+    for i in range(size):
+        if rng.random() < INCOME_SHARE:
+            transaction_type = "income"
+            category, (_, median, payees) = rng.choices(incomes, income_weights)[0]
+        else:
+            transaction_type = "expense"
+            category, (_, median, payees) = rng.choices(expenses, expense_weights)[0]
+        
+        day = first_day + i * days // size
+        yield {
+            "id": i + 1,
+            "date": datetime.date.fromordinal(day).isoformat(),
+            "type": transaction_type,
+            # Integer cents, as the ledger stores them
+            "amount": max(1, round(median * math.exp(rng.gauss(0, 0.5)) * 100)),
+            "category": category,
+            "description": rng.choice(payees)
+        }
+
+
+def write_ledger(kind, size, seed=0):
+    """Write a synthetic ledger where create_storage(kind) will find it"""
+    if kind == "sqlite":
+        storage = SQLiteStorage()
+        storage.load()
+        storage.import_transactions(generate_ledger(size, seed))
+        storage.close()
+        return
+    
+    with open("budget_data.json", 'w') as file:
+        json.dump({"currency": CURRENCY, "next_id": size + 1, "transactions": list(generate_ledger(size, seed))}, file)
+    if kind == "binary":
+        migrate_to_binary()
+    elif kind == "partitioned":
+        migrate_to_partitions()
+
+
+def summarize(operation, samples, rows=None):
+    """Turn a list of per-call seconds into throughput and latency percentiles"""
+    ordered = sorted(samples)
+    total = sum(ordered)
+    
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+    
+    result = {
+        "operation": operation,
+        "calls": len(ordered),
+        "total_s": total,
+        "ops_per_s": len(ordered) / total if total else None,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1] * 1000
+    }
+    if rows is not None:
+        result["rows_per_s"] = rows * len(ordered) / total if total else None
+    return result
+
+
+def timed(function, *args):
+    """Call function, returning (seconds taken, result)"""
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def save_and_flush(budget):
+    """Rewrite the whole ledger and wait until it is on disk"""
+    budget.save_data()
+    budget.flush()
+
+
+def bench_tracker(kind, size, rng):
+    """Time the BudgetTracker operations against a freshly written ledger"""
+    results = []
+    
+    seconds, budget = timed(BudgetTracker, create_storage(kind))
+    results.append(summarize("load_data", [seconds], size))
+    
+    results.append(summarize("get_balance", [timed(budget.get_balance)[0] for _ in range(SAMPLES)]))
+    results.append(summarize("get_category_summary",
+                             [timed(budget.get_category_summary)[0] for _ in range(SAMPLES)]))
+    
+    pages = [timed(budget.get_transactions, True, rng.randrange(size), PAGE_SIZE)[0] for _ in range(SAMPLES)]
+    results.append(summarize("get_transactions_page", pages, PAGE_SIZE))
+    results.append(summarize("get_transactions_all", [timed(budget.get_transactions)[0]], size))
+    results.append(summarize("build_report", [timed(budget.build_report)[0]], size))
+    
+    adds = []
+    for _ in range(SAMPLES):
+        category = rng.choice(list(EXPENSE_CATEGORIES))
+        adds.append(timed(budget.add_transaction, round(rng.uniform(1, 100), 2), category, "Benchmark", "expense")[0])
+    results.append(summarize("add_transaction", adds))
+    
+    victims = rng.sample(range(1, size + 1), min(SAMPLES, size))
+    deletes = [timed(budget.delete_transaction, transaction_id)[0] for transaction_id in victims]
+    results.append(summarize("delete_transaction", deletes))
+    
+    # Adds and deletes only queue writes on the background backends
+    results.append(summarize("flush", [timed(budget.flush)[0]]))
+    # A full write, waiting for it to land when a background writer does it
+    results.append(summarize("save_data", [timed(save_and_flush, budget)[0]], size))
+    results.append(summarize("close", [timed(budget.close)[0]]))
+    return results
+
+
+def bench_gui(kind, size):
+    """Time the app's refresh paths against a hidden Tk root"""
+    try:
+        import tkinter as tk
+        from coincompass import BudgetTrackerApp
+        root = tk.Tk()
+    except Exception as e:  # No tkinter, or no display to open
+        return [], f"GUI skipped: {e}"
+    
+    root.withdraw()
+    os.environ["COINCOMPASS_STORAGE"] = kind
+    results = []
+    
+    seconds, app = timed(BudgetTrackerApp, root)
+    results.append(summarize("app_first_paint", [seconds]))
+    
+    # The app only starts loading once its window is mapped
+    seconds, _ = timed(app.budget.load_data)
+    results.append(summarize("app_load", [seconds], size))
+    
+    for method in ("update_all_tabs", "update_dashboard", "update_transactions", "update_categories"):
+        function = getattr(app, method)
+        samples = []
+        for _ in range(GUI_SAMPLES):
+            seconds, _ = timed(function)
+            # Include the redraw Tk does once the handler returns
+            samples.append(seconds + timed(root.update_idletasks)[0])
+        results.append(summarize(method, samples))
+    
+    app.budget.close()
+    root.destroy()
+    return results, None
+
+
+def run_case(kind, size, seed, gui):
+    """Benchmark one backend and size in a scratch directory"""
+    rng = random.Random(seed)
+    
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            seconds, _ = timed(write_ledger, kind, size, seed)
+            
+            results = bench_tracker(kind, size, rng)
+            note = None
+            if gui:
+                gui_results, note = bench_gui(kind, size)
+                results.extend(gui_results)
+        finally:
+            # Leave the directory so it can be removed
+            os.chdir(previous)
+    
+    return {
+        "backend": kind,
+        "size": size,
+        "generate_s": seconds,
+        "peak_memory_kb": peak_memory_kb(),
+        "note": note,
+        "results": results
+    }
+
+
+def run(sizes, backends, seed=0, gui=True):
+    """Run every case in its own process and return the full report"""
+    cases = []
+    for size in sizes:
+        for kind in backends:
+            # A fresh process per case keeps the peak memory figures apart
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                case = pool.submit(run_case, kind, size, seed, gui).result()
+            cases.append(case)
+            print(f"{kind:>8} {size:>10,}: peak {case['peak_memory_kb']} KB", file=sys.stderr)
+    
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "cases": cases
+    }
+
+
+def compare(old, new, threshold):
+    """Print p50 changes between two reports, returning the regressions"""
+    def index(report):
+        return {(case["backend"], case["size"], result["operation"]): result
+                for case in report["cases"] for result in case["results"]}
+    
+    before = index(old)
+    regressions = []
+    
+    for key, result in sorted(index(new).items()):
+        if key not in before or not before[key]["p50_ms"]:
+            continue
+        
+        ratio = result["p50_ms"] / before[key]["p50_ms"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        
+        backend, size, operation = key
+        print(f"{backend:>8} {size:>10,} {operation:<24} "
+              f"{before[key]['p50_ms']:10.3f} -> {result['p50_ms']:10.3f} ms  x{ratio:.2f}{flag}")
+    
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CoinCompass on synthetic ledgers.")
+    parser.add_argument("--sizes", default="10k,100k", help="comma-separated row counts, e.g. 10k,100k,1m,10m")
+    parser.add_argument("--backends", default="journal,json,columnar,binary,partitioned,sqlite", help="comma-separated backends")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-gui", action="store_true", help="skip the Tk refresh benchmarks")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="p50 slowdown that counts as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+    
+    if args.compare:
+        reports = []
+        for filename in args.compare:
+            with open(filename, 'r') as file:
+                reports.append(json.load(file))
+        return 1 if compare(*reports, args.threshold) else 0
+    
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    report = run(sizes, args.backends.split(","), args.seed, not args.no_gui)
+    
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
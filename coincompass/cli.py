@@ -0,0 +1,354 @@
+"""Command-line interface to the CoinCompass ledger
+
+It never imports tkinter, so it runs on machines without a display, e.g.
+from cron: python cli.py import statement.ofx
+"""
+import argparse
+import csv
+import json
+import sys
+
+from ledger import (RECURRENCE_FREQUENCIES, BudgetTracker, create_storage, format_money, instruments, money_json,
+                    normalize_date)
+
+
+def print_json(data):
+    json.dump(data, sys.stdout, indent=2)
+    print()
+
+
+def summary_json(summary):
+    """Return a period summary with its amounts in major units, for JSON output"""
+    return dict(
+        {key: money_json(summary[key]) for key in ("income", "expenses", "balance")},
+        categories={category: money_json(amount) for category, amount in summary["categories"].items()}
+    )
+
+
+def print_summary(summary, as_json):
+    """Print an income, expenses and balance dict"""
+    if as_json:
+        print_json({key: money_json(summary[key]) for key in ("income", "expenses", "balance")})
+        return
+    
+    print(f"Income:   {format_money(summary['income'])}")
+    print(f"Expenses: {format_money(summary['expenses'])}")
+    print(f"Balance:  {format_money(summary['balance'])}")
+
+
+def print_categories(categories, as_json):
+    """Print expense totals by category, largest first"""
+    if as_json:
+        print_json({category: money_json(amount) for category, amount in categories.items()})
+        return
+    
+    for category, amount in sorted(categories.items(), key=lambda item: item[1], reverse=True):
+        print(f"{category:<20} {format_money(amount)}")
+
+
+def print_result(result):
+    """Print a (success, message) pair, returning the exit status"""
+    success, message = result
+    print(message, file=sys.stdout if success else sys.stderr)
+    return 0 if success else 1
+
+
+def cmd_add(budget, args):
+    return print_result(budget.add_transaction(args.amount, args.category, args.description, args.type, args.date))
+
+
+def cmd_import(budget, args):
+    try:
+        result = budget.import_file(args.filename)
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"Could not import statement: {e}", file=sys.stderr)
+        return 1
+    
+    if args.json:
+        print_json(result)
+    else:
+        print(f"Imported {result['added']} transactions, skipped {result['duplicates']} duplicates.")
+        for line_number, reason in result["rejected"]:
+            print(f"Line {line_number}: {reason}", file=sys.stderr)
+    return 0
+
+
+def cmd_balance(budget, args):
+    if args.as_of:
+        as_of = normalize_date(args.as_of, ("%Y-%m-%d",))
+        if as_of is None:
+            print(f"Could not compute balance: --as-of must be a valid YYYY-MM-DD date, not {args.as_of!r}",
+                  file=sys.stderr)
+            return 1
+        summary = budget.balance_as_of(as_of)
+    else:
+        summary = budget.get_balance()
+    print_summary(summary, args.json)
+    return 0
+
+
+def cmd_categories(budget, args):
+    if args.period:
+        try:
+            categories = budget.get_period_summary(args.period, args.period)["categories"]
+        except ValueError as e:
+            print(f"Could not summarize categories: {e}", file=sys.stderr)
+            return 1
+    else:
+        categories = budget.get_category_summary()
+    print_categories(categories, args.json)
+    return 0
+
+
+def cmd_export(budget, args):
+    try:
+        result = budget.export_transactions(args.filename, args.start, args.end, args.type, args.category)
+    except (OSError, ValueError) as e:
+        print(f"Could not export transactions: {e}", file=sys.stderr)
+        return 1
+    
+    if args.json:
+        print_json(result)
+    else:
+        print(f"Exported {result['rows']} transactions to {args.filename}.")
+    return 0
+
+
+def cmd_archive(budget, args):
+    try:
+        result = budget.archive(args.filename, not args.no_compress)
+    except OSError as e:
+        print(f"Could not write archive: {e}", file=sys.stderr)
+        return 1
+    
+    if args.json:
+        print_json(result)
+    else:
+        print(f"Archived {result['rows']} transactions to {args.filename} ({result['bytes']:,} bytes).")
+    return 0
+
+
+def print_months(months):
+    """Print income, expenses and balance for each month, oldest first"""
+    print(f"{'Month':<10} {'Income':>14} {'Expenses':>14} {'Balance':>14}")
+    for month, summary in months.items():
+        print(f"{month:<10} {format_money(summary['income']):>14} {format_money(summary['expenses']):>14} "
+              f"{format_money(summary['balance']):>14}")
+
+
+def cmd_recurring_add(budget, args):
+    return print_result(budget.add_recurring(args.amount, args.category, args.description, args.type,
+                                             args.frequency, args.start, args.until, args.every))
+
+
+def cmd_recurring_list(budget, args):
+    rules = budget.get_recurring()
+    if args.json:
+        print_json([dict(rule, amount=money_json(rule["amount"])) for rule in rules])
+        return 0
+    
+    for rule in rules:
+        every = rule["frequency"]
+        if rule["interval"] > 1:
+            every = f"every {rule['interval']} " + {"daily": "days", "weekly": "weeks", "monthly": "months",
+                                                     "yearly": "years"}[rule["frequency"]]
+        until = f" until {rule['until']}" if rule["until"] else ""
+        print(f"{rule['id']:>4} {rule['type']:<8} {format_money(rule['amount']):>12} {rule['category']:<15} "
+              f"{every}, from {rule['start']}{until}  {rule['description']}")
+    return 0
+
+
+def cmd_recurring_occurrences(budget, args):
+    try:
+        occurrences = budget.get_occurrences(args.start, args.end)
+    except ValueError as e:
+        print(f"Could not list occurrences: {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print_json([dict(occurrence, amount=money_json(occurrence["amount"])) for occurrence in occurrences])
+        return 0
+    
+    for o in occurrences:
+        print(f"{o['date']} {o['rule_id']:>4} {o['type']:<8} {format_money(o['amount']):>12} "
+              f"{o['category']:<15} {o['description']}")
+    return 0
+
+
+def cmd_recurring_skip(budget, args):
+    return print_result(budget.skip_occurrence(args.rule, args.date))
+
+
+def cmd_recurring_override(budget, args):
+    return print_result(budget.override_occurrence(args.rule, args.date, args.amount, args.category,
+                                                   args.description))
+
+
+def cmd_recurring_materialize(budget, args):
+    return print_result(budget.materialize_occurrence(args.rule, args.date))
+
+
+def cmd_recurring_delete(budget, args):
+    return print_result(budget.delete_recurring(args.rule))
+
+
+def cmd_report(budget, args):
+    if args.full:
+        return cmd_full_report(budget, args)
+    
+    try:
+        summary = budget.get_period_summary(args.start, args.end)
+    except ValueError as e:
+        print(f"Could not build report: {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print_json(summary_json(summary))
+        return 0
+    
+    print_summary(summary, False)
+    print()
+    print_categories(summary["categories"], False)
+    return 0
+
+
+def cmd_full_report(budget, args):
+    def progress(done, total):
+        print(f"\r{done}/{total} chunks", end="", file=sys.stderr, flush=True)
+    
+    try:
+        report = budget.build_report(args.start, args.end, args.workers, None if args.json else progress)
+    except ValueError as e:
+        print(f"Could not build report: {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print_json(dict(
+            summary_json(report),
+            months={month: summary_json(summary) for month, summary in report["months"].items()},
+            types={name: {"amount": money_json(total["amount"]), "count": total["count"]}
+                   for name, total in report["types"].items()},
+            **{key: report[key] for key in ("rows", "sources", "workers", "seconds")}
+        ))
+        return 0
+    
+    print(file=sys.stderr)
+    print_months(report["months"])
+    print()
+    print_summary(report, False)
+    print()
+    print_categories(report["categories"], False)
+    print(f"\nTotalled {report['rows']:,} transactions in {report['seconds']:.2f}s "
+          f"using {report['workers']} process(es).", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="coincompass", description="Manage a CoinCompass ledger without the GUI.")
+    parser.add_argument("--storage", choices=("journal", "json", "columnar", "binary", "partitioned", "sqlite"),
+                        help="storage backend (default: $COINCOMPASS_STORAGE or journal)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--profile", action="store_const", const="timers",
+                        help="time the hot paths and dump the stats at exit")
+    parser.add_argument("--cprofile", action="store_const", const="cprofile", dest="profile",
+                        help="like --profile, and also save cProfile data")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    add = commands.add_parser("add", help="add a transaction")
+    add.add_argument("type", choices=("income", "expense"))
+    add.add_argument("amount")
+    add.add_argument("category")
+    add.add_argument("-d", "--description", default="")
+    add.add_argument("--date", help="YYYY-MM-DD (default: today)")
+    add.set_defaults(handler=cmd_add)
+    
+    import_ = commands.add_parser("import", help="import a CSV, OFX or QIF bank statement")
+    import_.add_argument("filename")
+    import_.set_defaults(handler=cmd_import)
+    
+    balance = commands.add_parser("balance", help="show income, expenses and balance")
+    balance.add_argument("--as-of", help="balance at the end of this YYYY-MM-DD date")
+    balance.set_defaults(handler=cmd_balance)
+    
+    categories = commands.add_parser("categories", help="show expenses by category")
+    categories.add_argument("--period", help="YYYY, YYYY-MM or YYYY-MM-DD (default: all time)")
+    categories.set_defaults(handler=cmd_categories)
+    
+    export = commands.add_parser("export", help="export transactions to a .csv or .jsonl file")
+    export.add_argument("filename")
+    export.add_argument("--start", help="first date to include")
+    export.add_argument("--end", help="last date to include")
+    export.add_argument("--type", choices=("income", "expense"))
+    export.add_argument("--category")
+    export.set_defaults(handler=cmd_export)
+    
+    archive = commands.add_parser("archive", help="save a compact binary copy of the ledger")
+    archive.add_argument("filename")
+    archive.add_argument("--no-compress", action="store_true", help="skip zlib, so the copy can be memory-mapped")
+    archive.set_defaults(handler=cmd_archive)
+    
+    recurring = commands.add_parser("recurring", help="manage recurring transactions")
+    recurring_commands = recurring.add_subparsers(dest="recurring_command", required=True)
+    
+    recurring_add = recurring_commands.add_parser("add", help="add a recurrence rule")
+    recurring_add.add_argument("type", choices=("income", "expense"))
+    recurring_add.add_argument("amount")
+    recurring_add.add_argument("category")
+    recurring_add.add_argument("frequency", choices=RECURRENCE_FREQUENCIES)
+    recurring_add.add_argument("-d", "--description", default="")
+    recurring_add.add_argument("--start", help="first occurrence, YYYY-MM-DD (default: today)")
+    recurring_add.add_argument("--until", help="last possible occurrence, YYYY-MM-DD (default: never)")
+    recurring_add.add_argument("--every", type=int, default=1, help="repeat every N days, weeks, months or years")
+    recurring_add.set_defaults(handler=cmd_recurring_add)
+    
+    recurring_list = recurring_commands.add_parser("list", help="show the recurrence rules")
+    recurring_list.set_defaults(handler=cmd_recurring_list)
+    
+    recurring_occurrences = recurring_commands.add_parser("occurrences", help="show the occurrences in a period")
+    recurring_occurrences.add_argument("--start", help="YYYY, YYYY-MM or YYYY-MM-DD (default: first occurrence)")
+    recurring_occurrences.add_argument("--end", help="YYYY, YYYY-MM or YYYY-MM-DD (default: today)")
+    recurring_occurrences.set_defaults(handler=cmd_recurring_occurrences)
+    
+    for name, handler, help_text in (
+        ("skip", cmd_recurring_skip, "leave out one occurrence"),
+        ("override", cmd_recurring_override, "change one occurrence"),
+        ("materialize", cmd_recurring_materialize, "record one occurrence as a real transaction"),
+    ):
+        command = recurring_commands.add_parser(name, help=help_text)
+        command.add_argument("rule", type=int)
+        command.add_argument("date", help="YYYY-MM-DD")
+        command.set_defaults(handler=handler)
+        if name == "override":
+            command.add_argument("--amount")
+            command.add_argument("--category")
+            command.add_argument("--description")
+    
+    recurring_delete = recurring_commands.add_parser("delete", help="delete a recurrence rule")
+    recurring_delete.add_argument("rule", type=int)
+    recurring_delete.set_defaults(handler=cmd_recurring_delete)
+    
+    report = commands.add_parser("report", help="summarize a period")
+    report.add_argument("--start", help="YYYY, YYYY-MM or YYYY-MM-DD (default: first transaction)")
+    report.add_argument("--end", help="YYYY, YYYY-MM or YYYY-MM-DD (default: last transaction)")
+    report.add_argument("--full", action="store_true",
+                        help="recompute from every transaction, month by month, in parallel")
+    report.add_argument("--workers", type=int, help="worker processes for --full (default: one per CPU)")
+    report.set_defaults(handler=cmd_report)
+    
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        instruments.enable(args.profile)
+    
+    budget = BudgetTracker(create_storage(args.storage))
+    if budget.load_error:
+        print(budget.load_error, file=sys.stderr)
+    
+    try:
+        return args.handler(budget, args)
+    finally:
+        budget.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
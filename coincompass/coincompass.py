@@ -1,31 +1,97 @@
 import os
+import csv
 import datetime
 import json
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import hashlib
+import hmac
+import math
 import time
 import sys
+import threading
+import traceback
+import argparse
+
+from ledger import BudgetTracker, create_storage, format_money, instruments, to_minor
 
 class PasswordManager:
-    def __init__(self):
+    """Store the password as a salted scrypt (or PBKDF2) hash and check logins
+    
+    Hashing and verifying take about target_seconds, so the login window
+    runs them on a worker thread.
+    """
+    def __init__(self, target_seconds=0.25):
         self.password_file = "password.json"
         self.max_attempts = 3
         self.attempts = 0
+        self.target_seconds = target_seconds
+        # The credential record, read from disk once
+        self.record = None
+        # KDF cost for new hashes, measured once per run by calibrate()
+        self.kdf_params = None
     
     def hash_password(self, password):
-        """Hash the password using SHA-256"""
+        """Hash the password using SHA-256, as older versions stored it"""
         return hashlib.sha256(password.encode()).hexdigest()
     
+    def derive_key(self, password, params):
+        """Hash the password with the KDF, salt and cost a record names"""
+        salt = bytes.fromhex(params["salt"])
+        if params["kdf"] == "scrypt":
+            n, r, p = params["n"], params["r"], params["p"]
+            return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * r * n, dklen=32).hex()
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, params["iterations"]).hex()
+    
+    def calibrate(self):
+        """Pick KDF parameters that take about target_seconds on this machine
+        
+        One run at the minimum cost is timed and the cost scaled from it,
+        since both KDFs take time in proportion to it.
+        """
+        if self.kdf_params is not None:
+            return dict(self.kdf_params)
+        
+        if hasattr(hashlib, "scrypt"):
+            params = {"kdf": "scrypt", "n": 2 ** 14, "r": 8, "p": 1}
+        else:  # Python built without OpenSSL 1.1
+            params = {"kdf": "pbkdf2_sha256", "iterations": 600_000}
+        
+        start = time.perf_counter()
+        self.derive_key("calibration", dict(params, salt=os.urandom(16).hex()))
+        scale = self.target_seconds / max(time.perf_counter() - start, 1e-6)
+        
+        # Never go below the starting cost; cap scrypt at 128 MiB of memory
+        if params["kdf"] == "scrypt":
+            params["n"] = 2 ** min(17, max(14, 14 + round(math.log2(scale))))
+        else:
+            params["iterations"] = min(10_000_000, max(600_000, int(600_000 * scale)))
+        
+        self.kdf_params = params
+        return dict(params)
+    
     def password_exists(self):
         """Check if password file exists"""
-        return os.path.exists(self.password_file)
+        return self.record is not None or os.path.exists(self.password_file)
+    
+    def load_record(self):
+        """Return the stored credential record, reading the file only the first time"""
+        if self.record is None:
+            with open(self.password_file, 'r') as file:
+                self.record = json.load(file)
+        return self.record
     
     def set_password(self, password):
         """Set a new password"""
-        hashed_password = self.hash_password(password)
-        with open(self.password_file, 'w') as file:
-            json.dump({"password": hashed_password}, file)
+        record = dict(self.calibrate(), salt=os.urandom(16).hex())
+        record["password"] = self.derive_key(password, record)
+        
+        temp_filename = self.password_file + ".tmp"
+        with open(temp_filename, 'w') as file:
+            json.dump(record, file)
+        os.replace(temp_filename, self.password_file)
+        
+        self.record = record
         return True
     
     def verify_password(self, password):
@@ -33,17 +99,28 @@ class PasswordManager:
         if not self.password_exists():
             return False
         
-        with open(self.password_file, 'r') as file:
-            data = json.load(file)
-            stored_hash = data.get("password", "")
-            
-        return self.hash_password(password) == stored_hash
+        record = self.load_record()
+        stored_hash = record.get("password", "")
+        
+        if "kdf" in record:
+            return hmac.compare_digest(self.derive_key(password, record), stored_hash)
+        
+        # Older versions stored a bare SHA-256; rehash with the KDF now that
+        # the password is known to be right
+        if not hmac.compare_digest(self.hash_password(password), stored_hash):
+            return False
+        self.set_password(password)
+        return True
     
     def login(self, password):
         """Try to login with password"""
+        return self.record_attempt(self.verify_password(password))
+    
+    def record_attempt(self, success):
+        """Count a login attempt, locking down after too many failures"""
         self.attempts += 1
         
-        if self.verify_password(password):
+        if success:
             self.attempts = 0
             return True
         
@@ -74,17 +151,19 @@ class LoginWindow:
         self.root = root
         self.password_manager = password_manager
         self.on_login_success = on_login_success
+        # True while a password is hashed in the background
+        self.busy = False
         
         self.setup_ui()
         
     def setup_ui(self):
         self.root.title("Budget Tracker - Login")
-        self.root.geometry("400x300")
+        self.root.geometry("400x340")
         self.root.resizable(False, False)
         
         # Center the window
         window_width = 400
-        window_height = 300
+        window_height = 340
         screen_width = self.root.winfo_screenwidth()
         screen_height = self.root.winfo_screenheight()
         center_x = int(screen_width/2 - window_width/2)
@@ -128,6 +207,9 @@ class LoginWindow:
         # Set password button
         set_button = ttk.Button(password_frame, text="Set Password", command=self.create_password)
         set_button.pack(pady=20)
+        
+        self.inputs = [self.new_password, self.confirm_password, set_button]
+        self.setup_progress(parent)
     
     def setup_login_ui(self, parent):
         # Login frame
@@ -150,8 +232,61 @@ class LoginWindow:
         # Attempts label
         self.attempts_label = ttk.Label(login_frame, text=f"Attempts remaining: {self.password_manager.max_attempts}")
         self.attempts_label.pack(pady=5)
+        
+        self.inputs = [self.password_entry, login_button]
+        self.setup_progress(parent)
+    
+    def setup_progress(self, parent):
+        # Shown while a password is hashed in the background
+        self.progress_label = ttk.Label(parent, text="")
+        self.progress_label.pack()
+        self.progress = ttk.Progressbar(parent, mode="indeterminate", length=200)
+    
+    def set_busy(self, busy, message=""):
+        self.busy = busy
+        for widget in self.inputs:
+            widget.state(["disabled"] if busy else ["!disabled"])
+        
+        self.progress_label.config(text=message)
+        if busy:
+            self.progress.pack(pady=5)
+            self.progress.start(15)
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
+    
+    def run_in_background(self, message, work, on_done):
+        # Password hashing is deliberately slow, so keep it off the Tk thread
+        self.set_busy(True, message)
+        result = {}
+        
+        def worker():
+            try:
+                result["value"] = work()
+            except Exception as e:
+                result["error"] = e
+        
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        self.poll_background(thread, result, on_done)
+    
+    def poll_background(self, thread, result, on_done):
+        if thread.is_alive():
+            self.root.after(50, self.poll_background, thread, result, on_done)
+            return
+        
+        self.set_busy(False)
+        if "error" in result:
+            messagebox.showerror("Error", f"Could not read or write the password file: {result['error']}")
+            return
+        
+        on_done(result["value"])
     
     def create_password(self):
+        # <Return> still fires while the inputs are disabled
+        if self.busy:
+            return
+        
         password = self.new_password.get()
         confirm = self.confirm_password.get()
         
@@ -163,7 +298,10 @@ class LoginWindow:
             messagebox.showerror("Error", "Passwords do not match")
             return
         
-        self.password_manager.set_password(password)
+        self.run_in_background("Securing password...", lambda: self.password_manager.set_password(password),
+                               self.finish_create_password)
+    
+    def finish_create_password(self, result):
         messagebox.showinfo("Success", "Password set successfully!")
         
         # Destroy all widgets and setup login UI
@@ -179,13 +317,22 @@ class LoginWindow:
         self.setup_login_ui(main_frame)
     
     def login(self):
+        # <Return> still fires while the inputs are disabled, and each
+        # verify would use up an attempt
+        if self.busy:
+            return
+        
         password = self.password_entry.get()
         
         if not password:
             messagebox.showerror("Error", "Please enter your password")
             return
         
-        if self.password_manager.login(password):
+        self.run_in_background("Checking password...", lambda: self.password_manager.verify_password(password),
+                               self.finish_login)
+    
+    def finish_login(self, verified):
+        if self.password_manager.record_attempt(verified):
             self.root.destroy()  # Close login window
             self.on_login_success()  # Launch the main application
         else:
@@ -198,124 +345,131 @@ class LoginWindow:
             # If no attempts left, the show_dead_screen will be called from the login method
 
 
-class BudgetTracker:
-    def __init__(self):
-        self.transactions = []
-        self.filename = "budget_data.json"
-        self.load_data()
-    
-    def load_data(self):
-        """Load transaction data from file if it exists"""
-        if os.path.exists(self.filename):
-            try:
-                with open(self.filename, 'r') as file:
-                    self.transactions = json.load(file)
-            except:
-                messagebox.showerror("Error", "Error reading data file. Starting with empty transactions.")
-                self.transactions = []
-    
-    def save_data(self):
-        """Save transaction data to file"""
-        with open(self.filename, 'w') as file:
-            json.dump(self.transactions, file, indent=4)
-    
-    def add_transaction(self, amount, category, description, transaction_type, date=None):
-        """Add a new transaction to the tracker"""
-        if date is None:
-            date = datetime.datetime.now().strftime("%Y-%m-%d")
-        
-        # Validate amount
-        try:
-            amount = float(amount)
-            if amount <= 0:
-                return False, "Amount must be greater than zero"
-        except ValueError:
-            return False, "Amount must be a valid number"
-        
-        # Validate category
-        if not category or category.strip() == "":
-            return False, "Category cannot be empty"
-        
-        transaction = {
-            "id": len(self.transactions) + 1 if self.transactions else 1,
-            "date": date,
-            "type": transaction_type,
-            "amount": amount,
-            "category": category,
-            "description": description
-        }
-        
-        self.transactions.append(transaction)
-        self.save_data()
-        return True, f"{transaction_type.capitalize()} of ${amount:.2f} added successfully!"
+class VirtualTreeview:
+    """Show a large row set in a Treeview, keeping only the visible rows as items
     
-    def get_balance(self):
-        """Calculate current balance, total income, and total expenses"""
-        total_income = 0
-        total_expenses = 0
-        
-        for transaction in self.transactions:
-            if transaction["type"] == "income":
-                total_income += transaction["amount"]
-            else:  # expense
-                total_expenses += transaction["amount"]
-                
-        balance = total_income - total_expenses
-        
-        return {
-            "income": total_income,
-            "expenses": total_expenses,
-            "balance": balance
-        }
+    Rows are fetched through fetch_rows(offset, limit) as the user scrolls,
+    with overscan extra rows cached on each side so small scrolls do not go
+    back to the ledger. The scrollbar is driven from count_rows(), so it
+    reflects the full row count rather than the handful of items in Tk.
+    """
+    def __init__(self, tree, scrollbar, count_rows, fetch_rows, row_values, overscan=20):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.count_rows = count_rows
+        self.fetch_rows = fetch_rows
+        self.row_values = row_values
+        self.overscan = overscan
+        
+        self.total = 0
+        self.offset = 0
+        self.visible = 20
+        self.cache_offset = 0
+        self.cache = []
+        
+        scrollbar.configure(command=self.yview)
+        tree.bind("<Configure>", self.on_resize)
+        tree.bind("<MouseWheel>", self.on_mousewheel)
+        tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        tree.bind("<Button-5>", lambda e: self.scroll(3))
+        tree.bind("<Prior>", lambda e: self.scroll(-self.visible))
+        tree.bind("<Next>", lambda e: self.scroll(self.visible))
     
-    def get_transactions(self, sort_by_date=True):
-        """Get all transactions, optionally sorted by date"""
-        if sort_by_date and self.transactions:
-            # Create a copy to avoid modifying the original list
-            sorted_transactions = sorted(
-                self.transactions, 
-                key=lambda x: x["date"],
-                reverse=True  # Most recent first
-            )
-            return sorted_transactions
-        return self.transactions
-    
-    def get_category_summary(self):
-        """Get summary of expenses by category"""
-        categories = {}
-        
-        for transaction in self.transactions:
-            if transaction["type"] == "expense":
-                category = transaction["category"]
-                amount = transaction["amount"]
-                
-                if category in categories:
-                    categories[category] += amount
-                else:
-                    categories[category] = amount
-        
-        return categories
+    def refresh(self, offset=None):
+        """Re-read the row count and redraw, dropping any cached rows
+        
+        The view stays where it is unless a new offset is given.
+        """
+        self.total = self.count_rows()
+        self.cache = []
+        self.show(self.offset if offset is None else offset)
+    
+    @instruments.timed("view.show")
+    def show(self, offset):
+        """Display the window of rows starting at offset"""
+        self.offset = max(0, min(offset, self.total - self.visible))
+        end = min(self.offset + self.visible, self.total)
+        
+        # Fetch a new page, with overscan, only when the window leaves the cache
+        if self.offset < self.cache_offset or end > self.cache_offset + len(self.cache):
+            self.cache_offset = max(0, self.offset - self.overscan)
+            self.cache = self.fetch_rows(self.cache_offset, self.visible + 2 * self.overscan)
+        
+        rows = self.cache[self.offset - self.cache_offset:end - self.cache_offset]
+        
+        # Rebuild the few visible items, keeping any selection that is still shown
+        selected = set(self.tree.selection())
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            iid, values = self.row_values(row)
+            self.tree.insert("", tk.END, iid=iid, values=values)
+            if iid in selected:
+                self.tree.selection_add(iid)
+        
+        if self.total:
+            self.scrollbar.set(self.offset / self.total, end / self.total)
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def scroll(self, rows):
+        """Move the window by a number of rows"""
+        self.show(self.offset + rows)
+        return "break"
+    
+    def yview(self, *args):
+        """Handle scrollbar commands"""
+        if args[0] == "moveto":
+            self.show(int(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.show(self.offset + int(args[1]) * step)
     
-    def delete_transaction(self, transaction_id):
-        """Delete a transaction by ID"""
-        for i, transaction in enumerate(self.transactions):
-            if transaction["id"] == transaction_id:
-                self.transactions.pop(i)
-                self.save_data()
-                return True, f"Transaction {transaction_id} deleted successfully!"
+    def on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+    
+    def on_resize(self, event):
+        """Recompute how many rows fit when the tree changes size"""
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else None
+        
+        if bbox:
+            heading_height, row_height = bbox[1], bbox[3]
+        else:
+            heading_height = 25
+            row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
         
-        return False, f"Transaction with ID {transaction_id} not found."
+        visible = max(1, (event.height - heading_height) // row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.show(self.offset)
 
 
 class BudgetTrackerApp:
     def __init__(self, root):
+        # Startup is timed from here to the window first appearing and to
+        # the whole ledger being loaded
+        self.started = time.perf_counter()
+        self.startup_times = {}
+        
         self.root = root
         self.root.title("Personal Budget Tracker")
         self.root.geometry("800x600")
         self.root.resizable(True, True)
         
-        # Initialize the budget tracker
-        self.budget = BudgetTracker()
+        # Initialize the budget tracker with the configured storage backend.
+        # It starts out showing the totals saved at the last shutdown, and
+        # the ledger itself is read in chunks once the window is up.
+        self.budget = BudgetTracker(create_storage(), lazy=True)
+        self.loader = None
+        
+        # Period shown on the Dashboard and Categories tabs
+        self.period_var = tk.StringVar(value="All time")
+        self.period_combos = []
+        
+        # Status bar for loading progress and startup times
+        self.status_var = tk.StringVar(value="Loading transactions...")
+        status_label = ttk.Label(root, textvariable=self.status_var, anchor=tk.W)
+        status_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 5))
         
         # Set up the tabs
         self.notebook = ttk.Notebook(root)
@@ -326,20 +480,39 @@ class BudgetTrackerApp:
         self.add_transaction_tab = ttk.Frame(self.notebook)
         self.transactions_tab = ttk.Frame(self.notebook)
         self.categories_tab = ttk.Frame(self.notebook)
+        self.recurring_tab = ttk.Frame(self.notebook)
         
         self.notebook.add(self.dashboard_tab, text="Dashboard")
         self.notebook.add(self.add_transaction_tab, text="Add Transaction")
         self.notebook.add(self.transactions_tab, text="Transactions")
         self.notebook.add(self.categories_tab, text="Categories")
+        self.notebook.add(self.recurring_tab, text="Recurring")
         
         # Set up each tab
         self.setup_dashboard_tab()
         self.setup_add_transaction_tab()
         self.setup_transactions_tab()
         self.setup_categories_tab()
+        self.setup_recurring_tab()
+        
+        # Timings are only collected when profiling is switched on
+        if instruments.enabled:
+            self.diagnostics_tab = ttk.Frame(self.notebook)
+            self.notebook.add(self.diagnostics_tab, text="Diagnostics")
+            self.setup_diagnostics_tab()
         
         # Update all tabs with current data
         self.update_all_tabs()
+        
+        # Patch the tabs as the ledger changes, one redraw per burst of changes
+        self.pending_changes = []
+        self.refresh_job = None
+        self.budget.subscribe(self.on_budget_change)
+        
+        # Make sure queued writes reach the disk before the window goes away
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        self.root.bind("<Map>", self.on_first_map, add="+")
     
     def setup_dashboard_tab(self):
         # Title frame
@@ -349,8 +522,10 @@ class BudgetTrackerApp:
         title_label = ttk.Label(title_frame, text="Budget Summary", font=("Arial", 16, "bold"))
         title_label.pack()
         
+        self.setup_period_selector(title_frame)
+        
         # Balance frame
-        balance_frame = ttk.LabelFrame(self.dashboard_tab, text="Current Balance")
+        balance_frame = ttk.LabelFrame(self.dashboard_tab, text="Balance")
         balance_frame.pack(fill=tk.X, padx=20, pady=10)
         
         # Income
@@ -360,7 +535,7 @@ class BudgetTrackerApp:
         income_label = ttk.Label(income_frame, text="Total Income:", width=15)
         income_label.pack(side=tk.LEFT)
         
-        self.income_value = ttk.Label(income_frame, text="$0.00", width=15)
+        self.income_value = ttk.Label(income_frame, text=format_money(0), width=15)
         self.income_value.pack(side=tk.LEFT)
         
         # Expenses
@@ -370,7 +545,7 @@ class BudgetTrackerApp:
         expenses_label = ttk.Label(expenses_frame, text="Total Expenses:", width=15)
         expenses_label.pack(side=tk.LEFT)
         
-        self.expenses_value = ttk.Label(expenses_frame, text="$0.00", width=15)
+        self.expenses_value = ttk.Label(expenses_frame, text=format_money(0), width=15)
         self.expenses_value.pack(side=tk.LEFT)
         
         # Balance
@@ -380,7 +555,7 @@ class BudgetTrackerApp:
         net_label = ttk.Label(net_frame, text="Net Balance:", width=15)
         net_label.pack(side=tk.LEFT)
         
-        self.net_value = ttk.Label(net_frame, text="$0.00", width=15)
+        self.net_value = ttk.Label(net_frame, text=format_money(0), width=15)
         self.net_value.pack(side=tk.LEFT)
         
         # Recent transactions frame
@@ -466,6 +641,25 @@ class BudgetTrackerApp:
         self.date_entry = ttk.Entry(date_frame, textvariable=self.date_var)
         self.date_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
+        # Repeat, from the date above until an optional end date
+        repeat_frame = ttk.Frame(form_frame)
+        repeat_frame.pack(fill=tk.X, pady=10)
+        
+        repeat_label = ttk.Label(repeat_frame, text="Repeat:", width=15)
+        repeat_label.pack(side=tk.LEFT)
+        
+        self.repeat_var = tk.StringVar(value="Never")
+        repeat_combo = ttk.Combobox(repeat_frame, textvariable=self.repeat_var, state="readonly", width=10,
+                                    values=["Never", "Daily", "Weekly", "Monthly", "Yearly"])
+        repeat_combo.pack(side=tk.LEFT)
+        
+        until_label = ttk.Label(repeat_frame, text="Until (optional):")
+        until_label.pack(side=tk.LEFT, padx=(20, 5))
+        
+        self.until_var = tk.StringVar()
+        until_entry = ttk.Entry(repeat_frame, textvariable=self.until_var)
+        until_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
         # Submit button
         button_frame = ttk.Frame(form_frame)
         button_frame.pack(fill=tk.X, pady=20)
@@ -478,13 +672,16 @@ class BudgetTrackerApp:
         reset_button.pack(pady=10, padx=100)
     
     def setup_transactions_tab(self):
+        self.setup_search_filters()
+        
         # Create a frame for the transactions table
         transactions_frame = ttk.Frame(self.transactions_tab)
         transactions_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
         
         # Create Treeview
-        columns = ("ID", "Date", "Type", "Amount", "Category", "Description")
-        self.transactions_tree = ttk.Treeview(transactions_frame, columns=columns, show="headings")
+        columns = ("ID", "Date", "Type", "Amount", "Category", "Description", "Balance")
+        self.transactions_tree = ttk.Treeview(transactions_frame, columns=columns, show="headings",
+                                              selectmode="extended")
         
         # Define headings
         for col in columns:
@@ -493,12 +690,20 @@ class BudgetTrackerApp:
             self.transactions_tree.column(col, width=width)
         
         # Add a scrollbar
-        scrollbar = ttk.Scrollbar(transactions_frame, orient=tk.VERTICAL, command=self.transactions_tree.yview)
-        self.transactions_tree.configure(yscroll=scrollbar.set)
+        scrollbar = ttk.Scrollbar(transactions_frame, orient=tk.VERTICAL)
         
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.transactions_tree.pack(fill=tk.BOTH, expand=True)
         
+        # Only the visible rows live in the tree; pages come from the ledger
+        self.transactions_view = VirtualTreeview(
+            self.transactions_tree,
+            scrollbar,
+            self.count_transaction_rows,
+            self.fetch_transaction_page,
+            self.transaction_row
+        )
+        
         # Add buttons for actions
         button_frame = ttk.Frame(self.transactions_tab)
         button_frame.pack(fill=tk.X, pady=10)
@@ -506,10 +711,134 @@ class BudgetTrackerApp:
         delete_button = ttk.Button(button_frame, text="Delete Selected", command=self.delete_transaction)
         delete_button.pack(side=tk.LEFT, padx=20)
         
+        recategorize_button = ttk.Button(button_frame, text="Change Category...", command=self.recategorize_transactions)
+        recategorize_button.pack(side=tk.LEFT, padx=20)
+        
         refresh_button = ttk.Button(button_frame, text="Refresh", command=self.refresh_transactions)
         refresh_button.pack(side=tk.LEFT, padx=20)
+        
+        import_button = ttk.Button(button_frame, text="Import...", command=self.import_statement)
+        import_button.pack(side=tk.LEFT, padx=20)
+        
+        export_button = ttk.Button(button_frame, text="Export...", command=self.export_transactions)
+        export_button.pack(side=tk.LEFT, padx=20)
+    
+    def setup_search_filters(self):
+        # Search text and filters; the table shows only the matches while any is set
+        self.search_results = None
+        self.search_job = None
+        self.search_var = tk.StringVar()
+        self.filter_category_var = tk.StringVar()
+        self.filter_type_var = tk.StringVar(value="All")
+        self.min_amount_var = tk.StringVar()
+        self.max_amount_var = tk.StringVar()
+        self.start_date_var = tk.StringVar()
+        self.end_date_var = tk.StringVar()
+        
+        search_frame = ttk.Frame(self.transactions_tab)
+        search_frame.pack(fill=tk.X, padx=20, pady=(10, 0))
+        
+        search_label = ttk.Label(search_frame, text="Search:")
+        search_label.pack(side=tk.LEFT, padx=5)
+        
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        category_label = ttk.Label(search_frame, text="Category:")
+        category_label.pack(side=tk.LEFT, padx=5)
+        
+        self.filter_category_combo = ttk.Combobox(search_frame, textvariable=self.filter_category_var, width=14,
+                                                  postcommand=self.update_filter_categories)
+        self.filter_category_combo.pack(side=tk.LEFT)
+        
+        type_label = ttk.Label(search_frame, text="Type:")
+        type_label.pack(side=tk.LEFT, padx=5)
+        
+        type_combo = ttk.Combobox(search_frame, textvariable=self.filter_type_var, state="readonly", width=8,
+                                  values=["All", "Income", "Expense"])
+        type_combo.pack(side=tk.LEFT)
+        
+        range_frame = ttk.Frame(self.transactions_tab)
+        range_frame.pack(fill=tk.X, padx=20, pady=(5, 0))
+        
+        amount_label = ttk.Label(range_frame, text="Amount:")
+        amount_label.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Entry(range_frame, textvariable=self.min_amount_var, width=8).pack(side=tk.LEFT)
+        ttk.Label(range_frame, text="to").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(range_frame, textvariable=self.max_amount_var, width=8).pack(side=tk.LEFT)
+        
+        date_label = ttk.Label(range_frame, text="Dates:")
+        date_label.pack(side=tk.LEFT, padx=(20, 5))
+        
+        ttk.Entry(range_frame, textvariable=self.start_date_var, width=11).pack(side=tk.LEFT)
+        ttk.Label(range_frame, text="to").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(range_frame, textvariable=self.end_date_var, width=11).pack(side=tk.LEFT)
+        
+        clear_button = ttk.Button(range_frame, text="Clear", command=self.clear_search)
+        clear_button.pack(side=tk.RIGHT)
+        
+        self.search_status = ttk.Label(range_frame, text="")
+        self.search_status.pack(side=tk.RIGHT, padx=10)
+        
+        for var in (self.search_var, self.filter_category_var, self.filter_type_var, self.min_amount_var,
+                    self.max_amount_var, self.start_date_var, self.end_date_var):
+            var.trace_add("write", lambda *args: self.schedule_search())
+    
+    def update_filter_categories(self):
+        common_categories = ["Salary", "Food", "Rent", "Transport", "Entertainment", "Bills", "Other"]
+        categories = sorted(set(common_categories) | set(self.budget.get_category_summary()))
+        self.filter_category_combo.configure(values=categories)
+    
+    def schedule_search(self):
+        # Search once typing pauses; every keystroke cancels the pending search
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(250, self.run_search)
+    
+    def search_filters(self):
+        """Return the search keyword arguments for the filter controls, skipping blank ones"""
+        filters = {
+            "text": self.search_var.get(),
+            "category": self.filter_category_var.get().strip() or None,
+            "transaction_type": None if self.filter_type_var.get() == "All" else self.filter_type_var.get().lower(),
+            "start": self.start_date_var.get().strip() or None,
+            "end": self.end_date_var.get().strip() or None
+        }
+        
+        # Ignore an amount until it parses, so half-typed numbers don't clear the table
+        for key, var in (("min_amount", self.min_amount_var), ("max_amount", self.max_amount_var)):
+            try:
+                filters[key] = to_minor(var.get())
+            except ValueError:
+                filters[key] = None
+        
+        return filters
+    
+    @instruments.timed("app.run_search")
+    def run_search(self, keep_position=False):
+        self.search_job = None
+        filters = self.search_filters()
+        
+        if filters["text"].strip() or any(value is not None for key, value in filters.items() if key != "text"):
+            self.search_results = self.budget.search(**filters)
+            self.search_status.config(text=f"{len(self.search_results):,} matches")
+        else:
+            self.search_results = None
+            self.search_status.config(text="")
+        
+        # New filters start from the top; the table's rows are reused either way
+        self.transactions_view.refresh(None if keep_position else 0)
+    
+    def clear_search(self):
+        for var in (self.search_var, self.filter_category_var, self.min_amount_var, self.max_amount_var,
+                    self.start_date_var, self.end_date_var):
+            var.set("")
+        self.filter_type_var.set("All")
     
     def setup_categories_tab(self):
+        self.setup_period_selector(self.categories_tab)
+        
         # Create a frame for the categories summary
         categories_frame = ttk.LabelFrame(self.categories_tab, text="Expense Categories")
         categories_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
@@ -530,35 +859,171 @@ class BudgetTrackerApp:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.categories_tree.pack(fill=tk.BOTH, expand=True)
         
-        # Add refresh button
-        refresh_button = ttk.Button(self.categories_tab, text="Refresh", command=self.refresh_categories)
-        refresh_button.pack(pady=10)
+        # Add action buttons
+        button_frame = ttk.Frame(self.categories_tab)
+        button_frame.pack(pady=10)
+        
+        refresh_button = ttk.Button(button_frame, text="Refresh", command=self.refresh_categories)
+        refresh_button.pack(side=tk.LEFT, padx=20)
+        
+        export_button = ttk.Button(button_frame, text="Export...", command=self.export_categories)
+        export_button.pack(side=tk.LEFT, padx=20)
+        
+        self.report_button = ttk.Button(button_frame, text="Monthly Report...", command=self.build_report)
+        self.report_button.pack(side=tk.LEFT, padx=20)
+        
+        # Shown while a report is built in the background
+        self.report_progress = ttk.Progressbar(self.categories_tab, mode="determinate", length=300)
+    
+    def setup_recurring_tab(self):
+        # Occurrences from a month back to three months ahead; none are stored
+        # until recorded
+        upcoming_frame = ttk.LabelFrame(self.recurring_tab, text="Recurring Transactions")
+        upcoming_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        
+        columns = ("Date", "Rule", "Type", "Amount", "Category", "Description")
+        self.recurring_tree = ttk.Treeview(upcoming_frame, columns=columns, show="headings")
+        
+        for col in columns:
+            self.recurring_tree.heading(col, text=col)
+            self.recurring_tree.column(col, width=50 if col == "Rule" else 100)
+        
+        scrollbar = ttk.Scrollbar(upcoming_frame, orient=tk.VERTICAL, command=self.recurring_tree.yview)
+        self.recurring_tree.configure(yscroll=scrollbar.set)
+        
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.recurring_tree.pack(fill=tk.BOTH, expand=True)
+        
+        button_frame = ttk.Frame(self.recurring_tab)
+        button_frame.pack(pady=10)
+        
+        record_button = ttk.Button(button_frame, text="Record", command=self.record_occurrence)
+        record_button.pack(side=tk.LEFT, padx=10)
+        
+        skip_button = ttk.Button(button_frame, text="Skip", command=self.skip_occurrence)
+        skip_button.pack(side=tk.LEFT, padx=10)
+        
+        amount_button = ttk.Button(button_frame, text="Change Amount...", command=self.override_occurrence)
+        amount_button.pack(side=tk.LEFT, padx=10)
+        
+        delete_button = ttk.Button(button_frame, text="Delete Rule", command=self.delete_recurring)
+        delete_button.pack(side=tk.LEFT, padx=10)
+    
+    def setup_diagnostics_tab(self):
+        # One line per timed operation, slowest in total first
+        columns = ("Operation", "Calls", "Rows", "Total ms", "p50 ms", "p95 ms", "p99 ms", "Max ms")
+        self.diagnostics_tree = ttk.Treeview(self.diagnostics_tab, columns=columns, show="headings")
+        
+        for col in columns:
+            self.diagnostics_tree.heading(col, text=col)
+            self.diagnostics_tree.column(col, width=200 if col == "Operation" else 70,
+                                         anchor=tk.W if col == "Operation" else tk.E)
+        
+        self.diagnostics_tree.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        
+        button_frame = ttk.Frame(self.diagnostics_tab)
+        button_frame.pack(pady=10)
+        
+        refresh_button = ttk.Button(button_frame, text="Refresh", command=self.update_diagnostics)
+        refresh_button.pack(side=tk.LEFT, padx=20)
+        
+        reset_button = ttk.Button(button_frame, text="Reset", command=self.reset_diagnostics)
+        reset_button.pack(side=tk.LEFT, padx=20)
+        
+        # Show fresh numbers whenever the tab is opened
+        self.notebook.bind("<<NotebookTabChanged>>", lambda e: self.update_diagnostics(), add="+")
+    
+    def update_diagnostics(self):
+        if self.notebook.select() != str(self.diagnostics_tab):
+            return
+        
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        for row in instruments.report():
+            self.diagnostics_tree.insert("", tk.END, values=(
+                row["operation"],
+                row["calls"],
+                row["rows"],
+                f"{row['total_ms']:.1f}",
+                f"{row['p50_ms']:.2f}",
+                f"{row['p95_ms']:.2f}",
+                f"{row['p99_ms']:.2f}",
+                f"{row['max_ms']:.2f}"
+            ))
+    
+    def reset_diagnostics(self):
+        instruments.reset()
+        self.update_diagnostics()
+    
+    def setup_period_selector(self, parent):
+        period_frame = ttk.Frame(parent)
+        period_frame.pack(pady=(10, 0))
+        
+        period_label = ttk.Label(period_frame, text="Period:")
+        period_label.pack(side=tk.LEFT, padx=5)
+        
+        period_combo = ttk.Combobox(period_frame, textvariable=self.period_var, state="readonly", width=12)
+        period_combo.pack(side=tk.LEFT)
+        period_combo.bind("<<ComboboxSelected>>", lambda e: self.on_period_change())
+        self.period_combos.append(period_combo)
+    
+    @instruments.timed("app.update_period_choices")
+    def update_period_choices(self):
+        # Offer every year and month with transactions, newest first
+        months = self.budget.get_periods()
+        years = sorted({month[:4] for month in months}, reverse=True)
+        choices = ["All time"] + years + months[::-1]
+        
+        for combo in self.period_combos:
+            combo.configure(values=choices)
+        
+        if self.period_var.get() not in choices:
+            self.period_var.set("All time")
     
+    def selected_period(self):
+        period = self.period_var.get()
+        return None if period == "All time" else period
+    
+    def on_period_change(self):
+        self.update_balance()
+        self.update_categories()
+    
+    @instruments.timed("app.update_dashboard")
     def update_dashboard(self):
-        # Update balance information
-        balance_data = self.budget.get_balance()
+        self.update_balance()
+        self.update_recent()
+    
+    @instruments.timed("app.update_balance")
+    def update_balance(self):
+        # Update balance information for the selected period
+        period = self.selected_period()
+        if period is None:
+            balance_data = self.budget.get_balance()
+        else:
+            balance_data = self.budget.get_period_summary(period, period)
         
-        self.income_value.config(text=f"${balance_data['income']:.2f}")
-        self.expenses_value.config(text=f"${balance_data['expenses']:.2f}")
+        self.income_value.config(text=format_money(balance_data['income']))
+        self.expenses_value.config(text=format_money(balance_data['expenses']))
         
         # Set color for net balance
         balance = balance_data['balance']
-        self.net_value.config(text=f"${balance:.2f}")
-        
+        self.net_value.config(text=format_money(balance))
+    
+    @instruments.timed("app.update_recent")
+    def update_recent(self):
         # Clear existing transactions
         for item in self.recent_tree.get_children():
             self.recent_tree.delete(item)
         
         # Add recent transactions (top 5)
-        transactions = self.budget.get_transactions(sort_by_date=True)[:5]
+        transactions = self.budget.get_recent(5)
         
         for t in transactions:
             # Format based on transaction type
             amount = t["amount"]
             if t["type"] == "expense":
-                amount_str = f"-${amount:.2f}"
+                amount_str = format_money(-amount)
             else:
-                amount_str = f"${amount:.2f}"
+                amount_str = format_money(amount)
             
             self.recent_tree.insert("", tk.END, values=(
                 t["date"],
@@ -568,38 +1033,58 @@ class BudgetTrackerApp:
                 t["description"]
             ))
     
+    def count_transaction_rows(self):
+        if self.search_results is not None:
+            return len(self.search_results)
+        return self.budget.count_transactions()
+    
+    def fetch_transaction_page(self, offset, limit):
+        # Pair each row with the running balance after it
+        if self.search_results is not None:
+            transactions = self.search_results[offset:offset + limit]
+        else:
+            transactions = self.budget.get_transactions(True, offset, limit)
+        return list(zip(transactions, self.budget.get_running_balances(transactions)))
+    
+    def transaction_row(self, row):
+        """Return the (iid, values) of a Transactions tab row"""
+        t, balance = row
+        
+        # Format based on transaction type
+        amount = t["amount"]
+        if t["type"] == "expense":
+            amount_str = format_money(-amount)
+        else:
+            amount_str = format_money(amount)
+        
+        return str(t["id"]), (
+            t["id"],
+            t["date"],
+            t["type"].capitalize(),
+            amount_str,
+            t["category"],
+            t["description"],
+            "" if balance is None else format_money(balance)
+        )
+    
+    @instruments.timed("app.update_transactions")
     def update_transactions(self):
-        # Clear existing transactions
-        for item in self.transactions_tree.get_children():
-            self.transactions_tree.delete(item)
-        
-        # Add all transactions
-        transactions = self.budget.get_transactions(sort_by_date=True)
-        
-        for t in transactions:
-            # Format based on transaction type
-            amount = t["amount"]
-            if t["type"] == "expense":
-                amount_str = f"-${amount:.2f}"
-            else:
-                amount_str = f"${amount:.2f}"
-            
-            self.transactions_tree.insert("", tk.END, values=(
-                t["id"],
-                t["date"],
-                t["type"].capitalize(),
-                amount_str,
-                t["category"],
-                t["description"]
-            ))
+        # Redraw the visible window from the current ledger
+        self.transactions_view.refresh()
     
+    @instruments.timed("app.update_categories")
     def update_categories(self):
-        # Clear existing categories
-        for item in self.categories_tree.get_children():
-            self.categories_tree.delete(item)
+        # Get category summary for the selected period
+        period = self.selected_period()
+        if period is None:
+            categories = self.budget.get_category_summary()
+        else:
+            categories = self.budget.get_period_summary(period, period)["categories"]
         
-        # Get category summary
-        categories = self.budget.get_category_summary()
+        # Remove categories that no longer have expenses
+        for item in self.categories_tree.get_children():
+            if item not in categories:
+                self.categories_tree.delete(item)
         
         if categories:
             total_expenses = sum(categories.values())
@@ -607,19 +1092,90 @@ class BudgetTrackerApp:
             # Sort categories by amount (highest first)
             sorted_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)
             
-            for category, amount in sorted_categories:
+            # Update lines in place, keyed by category, and only insert new ones
+            for index, (category, amount) in enumerate(sorted_categories):
                 percentage = (amount / total_expenses) * 100
+                values = (category, format_money(amount), f"{percentage:.1f}%")
                 
-                self.categories_tree.insert("", tk.END, values=(
-                    category,
-                    f"${amount:.2f}",
-                    f"{percentage:.1f}%"
-                ))
+                if self.categories_tree.exists(category):
+                    self.categories_tree.item(category, values=values)
+                    self.categories_tree.move(category, "", index)
+                else:
+                    self.categories_tree.insert("", index, iid=category, values=values)
     
+    @instruments.timed("app.update_all_tabs")
     def update_all_tabs(self):
+        self.update_period_choices()
         self.update_dashboard()
         self.update_transactions()
         self.update_categories()
+        self.update_recurring()
+    
+    @instruments.timed("app.update_recurring")
+    def update_recurring(self):
+        today = datetime.date.today()
+        start = (today - datetime.timedelta(days=30)).isoformat()
+        end = (today + datetime.timedelta(days=90)).isoformat()
+        
+        self.recurring_tree.delete(*self.recurring_tree.get_children())
+        for o in self.budget.get_occurrences(start, end):
+            amount = o["amount"]
+            self.recurring_tree.insert("", tk.END, iid=f"{o['rule_id']}:{o['date']}", values=(
+                o["date"],
+                o["rule_id"],
+                o["type"].capitalize(),
+                format_money(-amount if o["type"] == "expense" else amount),
+                o["category"],
+                o["description"]
+            ))
+    
+    def on_recurring_change(self):
+        # Occurrences count towards the balances and categories without
+        # passing through the ledger, so redraw those directly
+        self.update_recurring()
+        self.update_period_choices()
+        self.update_balance()
+        self.update_categories()
+    
+    def on_budget_change(self, added, removed, updated):
+        # Queue the change and redraw once the current burst has been handled
+        self.pending_changes.append((added, removed, updated))
+        if self.refresh_job is None:
+            self.refresh_job = self.root.after_idle(self.apply_changes)
+    
+    @instruments.timed("app.apply_changes")
+    def apply_changes(self):
+        changes = self.pending_changes
+        self.pending_changes = []
+        self.refresh_job = None
+        
+        changed = []
+        for added, removed, updated in changes:
+            changed.extend(added)
+            changed.extend(removed)
+            for old, new in updated:
+                changed.extend((old, new))
+        
+        # The totals are kept running, so the balance labels are cheap to set
+        self.update_period_choices()
+        self.update_balance()
+        
+        # Only the five newest rows are shown, so redraw them only if a change
+        # could have reached them
+        recent = self.budget.get_recent(5)
+        oldest_shown = recent[-1]["date"] if len(recent) == 5 else ""
+        if any(t["date"] >= oldest_shown for t in changed):
+            self.update_recent()
+        
+        # The Transactions tab only holds its visible window, so re-reading
+        # that page is all the patching it needs, unless a search is showing
+        if self.search_results is not None:
+            self.run_search(keep_position=True)
+        else:
+            self.transactions_view.refresh()
+        
+        if any(t["type"] == "expense" for t in changed):
+            self.update_categories()
     
     def add_transaction(self):
         # Get values from form
@@ -628,14 +1184,20 @@ class BudgetTrackerApp:
         category = self.category_var.get()
         description = self.description_entry.get()
         date = self.date_var.get()
+        repeat = self.repeat_var.get()
         
-        # Add transaction
-        success, message = self.budget.add_transaction(amount, category, description, transaction_type, date)
+        # Add transaction, or a rule that repeats it from the given date
+        if repeat == "Never":
+            success, message = self.budget.add_transaction(amount, category, description, transaction_type, date)
+        else:
+            success, message = self.budget.add_recurring(amount, category, description, transaction_type,
+                                                         repeat.lower(), date, self.until_var.get() or None)
+            if success:
+                self.on_recurring_change()
         
         if success:
             messagebox.showinfo("Success", message)
             self.reset_form()
-            self.update_all_tabs()
         else:
             messagebox.showerror("Error", message)
     
@@ -646,30 +1208,310 @@ class BudgetTrackerApp:
         self.category_var.set("")
         self.description_entry.delete(0, tk.END)
         self.date_var.set(datetime.datetime.now().strftime("%Y-%m-%d"))
+        self.repeat_var.set("Never")
+        self.until_var.set("")
+    
+    def selected_transaction_ids(self):
+        # Items are keyed by transaction ID
+        return [int(item) for item in self.transactions_tree.selection()]
     
     def delete_transaction(self):
-        # Get selected item
-        selected_item = self.transactions_tree.selection()
+        # Get the selected transaction IDs
+        transaction_ids = self.selected_transaction_ids()
         
-        if not selected_item:
+        if not transaction_ids:
             messagebox.showwarning("Warning", "Please select a transaction to delete.")
             return
         
-        # Get the transaction ID
-        transaction_id = int(self.transactions_tree.item(selected_item[0])["values"][0])
-        
         # Confirm deletion
-        confirm = messagebox.askyesno("Confirm", "Are you sure you want to delete this transaction?")
+        if len(transaction_ids) == 1:
+            question = "Are you sure you want to delete this transaction?"
+        else:
+            question = f"Are you sure you want to delete these {len(transaction_ids)} transactions?"
         
-        if confirm:
-            success, message = self.budget.delete_transaction(transaction_id)
+        if messagebox.askyesno("Confirm", question):
+            if len(transaction_ids) == 1:
+                success, message = self.budget.delete_transaction(transaction_ids[0])
+            else:
+                success, message = self.budget.delete_transactions(transaction_ids)
             
             if success:
                 messagebox.showinfo("Success", message)
-                self.update_all_tabs()
             else:
                 messagebox.showerror("Error", message)
     
+    def recategorize_transactions(self):
+        transaction_ids = self.selected_transaction_ids()
+        
+        if not transaction_ids:
+            messagebox.showwarning("Warning", "Please select the transactions to recategorize.")
+            return
+        
+        category = simpledialog.askstring(
+            "Change Category",
+            f"New category for {len(transaction_ids)} selected transaction(s):",
+            parent=self.root
+        )
+        if category is None:
+            return
+        
+        success, message = self.budget.update_transactions(transaction_ids, category=category.strip())
+        
+        if success:
+            messagebox.showinfo("Success", message)
+        else:
+            messagebox.showerror("Error", message)
+    
+    def selected_occurrence(self):
+        # Occurrence rows are keyed "rule_id:date"
+        selection = self.recurring_tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select an occurrence.")
+            return None, None
+        
+        rule_id, date = selection[0].split(":")
+        return int(rule_id), date
+    
+    def record_occurrence(self):
+        rule_id, date = self.selected_occurrence()
+        if rule_id is None:
+            return
+        
+        success, message = self.budget.materialize_occurrence(rule_id, date)
+        if success:
+            self.update_recurring()
+            messagebox.showinfo("Success", message)
+        else:
+            messagebox.showerror("Error", message)
+    
+    def skip_occurrence(self):
+        rule_id, date = self.selected_occurrence()
+        if rule_id is None:
+            return
+        
+        success, message = self.budget.skip_occurrence(rule_id, date)
+        if success:
+            self.on_recurring_change()
+        else:
+            messagebox.showerror("Error", message)
+    
+    def override_occurrence(self):
+        rule_id, date = self.selected_occurrence()
+        if rule_id is None:
+            return
+        
+        amount = simpledialog.askstring("Change Amount", f"New amount for {date}:", parent=self.root)
+        if amount is None:
+            return
+        
+        success, message = self.budget.override_occurrence(rule_id, date, amount=amount.strip())
+        if success:
+            self.on_recurring_change()
+        else:
+            messagebox.showerror("Error", message)
+    
+    def delete_recurring(self):
+        rule_id, _ = self.selected_occurrence()
+        if rule_id is None:
+            return
+        
+        if messagebox.askyesno("Confirm", f"Delete recurring rule {rule_id}? Recorded occurrences are kept."):
+            success, message = self.budget.delete_recurring(rule_id)
+            if success:
+                self.on_recurring_change()
+                messagebox.showinfo("Success", message)
+            else:
+                messagebox.showerror("Error", message)
+    
+    def import_statement(self):
+        filename = filedialog.askopenfilename(
+            title="Import Bank Statement",
+            filetypes=[("Bank statements", "*.csv *.ofx *.qfx *.qif"), ("All files", "*.*")]
+        )
+        
+        if not filename:
+            return
+        
+        try:
+            result = self.budget.import_file(filename)
+        except (OSError, ValueError, csv.Error) as e:
+            messagebox.showerror("Error", f"Could not import statement: {e}")
+            return
+        
+        message = f"Imported {result['added']} transactions."
+        if result["duplicates"]:
+            message += f"\nSkipped {result['duplicates']} already in the ledger."
+        if result["rejected"]:
+            message += f"\nRejected {len(result['rejected'])} rows:"
+            for line_number, reason in result["rejected"][:10]:
+                message += f"\n  Line {line_number}: {reason}"
+        
+        messagebox.showinfo("Import", message)
+    
+    def ask_export_filename(self, title):
+        return filedialog.asksaveasfilename(
+            title=title,
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")]
+        )
+    
+    def export_transactions(self):
+        filename = self.ask_export_filename("Export Transactions")
+        if not filename:
+            return
+        
+        try:
+            result = self.budget.export_transactions(filename)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not export transactions: {e}")
+            return
+        
+        messagebox.showinfo("Export", f"Exported {result['rows']} transactions.")
+    
+    def export_categories(self):
+        filename = self.ask_export_filename("Export Categories")
+        if not filename:
+            return
+        
+        try:
+            result = self.budget.export_category_summary(filename)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not export categories: {e}")
+            return
+        
+        messagebox.showinfo("Export", f"Exported {result['rows']} categories.")
+    
+    def build_report(self):
+        if self.budget.loading:
+            messagebox.showinfo("Report", "The ledger is still loading, please try again in a moment.")
+            return
+        
+        # Every row is read, split across worker processes, so keep it off the Tk thread
+        period = self.selected_period()
+        state = {"done": 0, "total": 0}
+        
+        def progress(done, total):
+            state["done"], state["total"] = done, total
+        
+        def worker():
+            try:
+                state["report"] = self.budget.build_report(period, period, progress=progress)
+            except Exception as e:
+                state["error"] = e
+        
+        self.report_button.state(["disabled"])
+        self.report_progress.config(value=0)
+        self.report_progress.pack(pady=(0, 10))
+        self.status_var.set("Building report...")
+        
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        self.poll_report(thread, state, period)
+    
+    def poll_report(self, thread, state, period):
+        if state["total"]:
+            self.report_progress.config(maximum=state["total"], value=state["done"])
+            self.status_var.set(f"Building report... {state['done']} of {state['total']} chunks")
+        
+        if thread.is_alive():
+            self.root.after(100, self.poll_report, thread, state, period)
+            return
+        
+        self.report_progress.pack_forget()
+        self.report_button.state(["!disabled"])
+        if "error" in state:
+            self.status_var.set("")
+            messagebox.showerror("Error", f"Could not build the report: {state['error']}")
+            return
+        
+        report = state["report"]
+        self.status_var.set(f"Report of {report['rows']:,} transactions built in {report['seconds']:.2f} s "
+                            f"using {report['workers']} process(es)")
+        self.show_report(report, period)
+    
+    def show_report(self, report, period):
+        window = tk.Toplevel(self.root)
+        window.title(f"Monthly Report - {period or 'All time'}")
+        window.geometry("700x450")
+        
+        # Whole-period totals and transaction counts by type
+        counts = {name: total["count"] for name, total in report["types"].items()}
+        summary = (
+            f"Income {format_money(report['income'])} ({counts.get('income', 0):,})   "
+            f"Expenses {format_money(report['expenses'])} ({counts.get('expense', 0):,})   "
+            f"Balance {format_money(report['balance'])}"
+        )
+        ttk.Label(window, text=summary).pack(pady=10)
+        
+        columns = ("Month", "Income", "Expenses", "Balance", "Top Category")
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=120)
+        
+        scrollbar = ttk.Scrollbar(window, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.pack(fill=tk.BOTH, expand=True, padx=(10, 0), pady=(0, 10))
+        
+        # Newest month first, as on the other tabs
+        for month, totals in reversed(report["months"].items()):
+            top = max(totals["categories"].items(), key=lambda item: item[1], default=None)
+            tree.insert("", tk.END, values=(
+                month,
+                format_money(totals["income"]),
+                format_money(totals["expenses"]),
+                format_money(totals["balance"]),
+                "" if top is None else f"{top[0]} ({format_money(top[1])})"
+            ))
+    
+    def on_first_map(self, event):
+        # Children share the root's bindings, so only react to the window itself
+        if event.widget is not self.root or "first_paint" in self.startup_times:
+            return
+        
+        self.startup_times["first_paint"] = time.perf_counter() - self.started
+        self.loader = self.budget.load_steps()
+        self.root.after(1, self.load_next_chunk)
+    
+    @instruments.timed("app.load_next_chunk")
+    def load_next_chunk(self):
+        # One chunk per turn of the event loop keeps the window responsive
+        try:
+            loaded = next(self.loader)
+        except StopIteration:
+            self.finish_loading()
+            return
+        
+        self.status_var.set(f"Loading transactions... {loaded:,} so far")
+        self.root.after(1, self.load_next_chunk)
+    
+    def finish_loading(self):
+        self.loader = None
+        self.startup_times["loaded"] = time.perf_counter() - self.started
+        self.update_all_tabs()
+        
+        if self.budget.load_error:
+            messagebox.showerror("Error", self.budget.load_error)
+        
+        message = (
+            f"{self.budget.count_transactions():,} transactions. "
+            f"First paint {self.startup_times['first_paint'] * 1000:.0f} ms, "
+            f"fully loaded {self.startup_times['loaded'] * 1000:.0f} ms"
+        )
+        self.status_var.set(message)
+        if self.budget.debug:
+            print(f"Startup: {message}", file=sys.stderr)
+    
+    def on_close(self):
+        # Whatever the writer failed on, the window must still close
+        try:
+            self.budget.close()
+        except Exception as e:
+            traceback.print_exc()
+            messagebox.showerror("Error", f"Could not save all changes: {e}")
+        self.root.destroy()
+    
     def refresh_transactions(self):
         self.update_transactions()
     
@@ -683,6 +1525,15 @@ def launch_budget_app():
     root.mainloop()
 
 def main():
+    parser = argparse.ArgumentParser(description="CoinCompass personal budget tracker")
+    parser.add_argument("--profile", action="store_const", const="timers",
+                        help="time the hot paths and dump the stats at exit")
+    parser.add_argument("--cprofile", action="store_const", const="cprofile", dest="profile",
+                        help="like --profile, and also save cProfile data")
+    args = parser.parse_args()
+    if args.profile:
+        instruments.enable(args.profile)
+    
     # Initialize login window
     login_root = tk.Tk()
     password_manager = PasswordManager()
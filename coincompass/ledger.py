@@ -0,0 +1,3744 @@
+"""Ledger engine for CoinCompass: storage, import, export and reports, with no GUI"""
+import os
+import csv
+import datetime
+import decimal
+import bisect
+import calendar
+import heapq
+import itertools
+import json
+import math
+import re
+import sqlite3
+import time
+import sys
+import threading
+import atexit
+import array
+import collections
+import collections.abc
+import functools
+import mmap
+import struct
+import zlib
+import multiprocessing
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Instrumentation:
+    """Opt-in call counts, latencies and row counts for the hot paths
+    
+    Functions wrapped with timed() cost one attribute check per call until
+    enable() is called, after which every call is timed. The last
+    max_samples latencies of each operation are kept for percentiles.
+    """
+    def __init__(self, max_samples=10000):
+        self.enabled = False
+        self.max_samples = max_samples
+        self.stats = {}
+        self.profiler = None
+        self.lock = threading.Lock()
+    
+    def enable(self, mode="timers", stats_filename="coincompass_stats.json",
+               profile_filename="coincompass.prof"):
+        """Start timing, plus cProfile when mode is "cprofile", and dump both at exit"""
+        if not self.enabled:
+            atexit.register(self.dump, stats_filename, profile_filename)
+        self.enabled = True
+        
+        if mode == "cprofile" and self.profiler is None:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+    
+    def disable(self):
+        """Stop timing and profiling, and drop the dump at exit"""
+        if self.enabled:
+            atexit.unregister(self.dump)
+        self.enabled = False
+        
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler = None
+    
+    def timed(self, name, rows=None):
+        """Decorate a function to record its calls under name
+        
+        rows, if given, is called with the result to count the rows the
+        call processed.
+        """
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                
+                start = time.perf_counter()
+                result = function(*args, **kwargs)
+                self.record(name, time.perf_counter() - start, rows(result) if rows else 0)
+                return result
+            return wrapper
+        return decorate
+    
+    def record(self, name, seconds, rows=0):
+        """Add one call of an operation"""
+        with self.lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = {
+                    "calls": 0,
+                    "rows": 0,
+                    "total": 0.0,
+                    "samples": collections.deque(maxlen=self.max_samples)
+                }
+            
+            stat["calls"] += 1
+            stat["rows"] += rows
+            stat["total"] += seconds
+            stat["samples"].append(seconds)
+    
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self.lock:
+            self.stats = {}
+    
+    def report(self):
+        """Return one dict per operation, the slowest in total first"""
+        with self.lock:
+            stats = [(name, dict(stat, samples=sorted(stat["samples"]))) for name, stat in self.stats.items()]
+        
+        rows = []
+        for name, stat in stats:
+            samples = stat["samples"]
+            
+            def percentile(p):
+                return samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000
+            
+            rows.append({
+                "operation": name,
+                "calls": stat["calls"],
+                "rows": stat["rows"],
+                "total_ms": stat["total"] * 1000,
+                "p50_ms": percentile(50),
+                "p95_ms": percentile(95),
+                "p99_ms": percentile(99),
+                "max_ms": samples[-1] * 1000
+            })
+        
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows
+    
+    def format_report(self):
+        """Return the report as a plain text table"""
+        lines = [f"{'operation':<32}{'calls':>8}{'rows':>10}{'total ms':>11}"
+                 f"{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"]
+        for row in self.report():
+            lines.append(f"{row['operation']:<32}{row['calls']:>8}{row['rows']:>10}{row['total_ms']:>11.1f}"
+                         f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['max_ms']:>9.2f}")
+        return "\n".join(lines)
+    
+    def dump(self, stats_filename="coincompass_stats.json", profile_filename="coincompass.prof"):
+        """Write the report as JSON, print it to stderr and save any cProfile data"""
+        with open(stats_filename, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+        print(self.format_report(), file=sys.stderr)
+        
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(profile_filename)
+            print(f"cProfile data written to {profile_filename}", file=sys.stderr)
+
+
+# Shared by the ledger, the app and the CLI; $COINCOMPASS_PROFILE turns it
+# on for the whole process ("1" for timers, "cprofile" to add cProfile)
+instruments = Instrumentation()
+if os.environ.get("COINCOMPASS_PROFILE"):
+    instruments.enable("cprofile" if os.environ["COINCOMPASS_PROFILE"] == "cprofile" else "timers")
+
+
+TRANSACTION_FIELDS = ("id", "date", "type", "amount", "category", "description")
+
+# Symbol and number of minor units digits of each supported currency
+CURRENCIES = {
+    "USD": ("$", 2),
+    "EUR": ("€", 2),
+    "GBP": ("£", 2),
+    "INR": ("₹", 2),
+    "JPY": ("¥", 0),
+    "KWD": ("KD ", 3),
+}
+
+# Amounts are kept as integer minor units (cents for USD) of this currency;
+# switching it on an existing ledger is not supported
+CURRENCY = os.environ.get("COINCOMPASS_CURRENCY", "USD")
+
+# The largest amount in minor units that every backend can store: SQLite
+# integers, the int64 columns and the binary snapshot records
+MAX_AMOUNT = 2 ** 63 - 1
+
+
+def to_minor(value, currency=None):
+    """Convert an amount in major units to integer minor units, rounding half up
+    
+    value may be text, an int, a float or a Decimal. Floats go through their
+    shortest repr, so 0.1 becomes exactly 10 cents. Raises ValueError if
+    value is not a finite number.
+    """
+    digits = CURRENCIES[currency or CURRENCY][1]
+    if isinstance(value, float):
+        value = repr(value)
+    
+    try:
+        amount = decimal.Decimal(value)
+        if amount.is_finite():
+            # Scaling past the context's exponent limit (1e999999) overflows
+            return int(amount.scaleb(digits).to_integral_value(rounding=decimal.ROUND_HALF_UP))
+    except (decimal.DecimalException, TypeError):
+        pass
+    raise ValueError(f"Not a valid amount: {value!r}")
+
+
+def from_minor(units, currency=None):
+    """Convert integer minor units to an exact Decimal in major units"""
+    return decimal.Decimal(units).scaleb(-CURRENCIES[currency or CURRENCY][1])
+
+
+def format_money(units, currency=None):
+    """Format integer minor units for display, e.g. -1234 as -$12.34"""
+    symbol, digits = CURRENCIES[currency or CURRENCY]
+    sign = "-" if units < 0 else ""
+    return f"{sign}{symbol}{from_minor(abs(units), currency):.{digits}f}"
+
+
+def money_json(units):
+    """Return minor units as a JSON number in major units
+    
+    The shortest repr of the float is the exact decimal amount, so the
+    JSON text is exact for any amount below a trillion.
+    """
+    return float(from_minor(units))
+
+
+def rollup(rows):
+    """Split daily_totals() rows into the two aggregates BudgetTracker keeps
+    
+    Returns (date, type, amount) rows for the balance index and
+    (month, type, category, amount, count) rows for the monthly totals.
+    """
+    days = [(date, transaction_type, amount) for date, transaction_type, _, amount, _ in rows]
+    
+    months = {}
+    for date, transaction_type, category, amount, count in rows:
+        key = (date[:7], transaction_type, category)
+        total, size = months.get(key, (0, 0))
+        months[key] = (total + amount, size + count)
+    
+    return days, [key + value for key, value in months.items()]
+
+
+class JsonStorage:
+    """Keep the ledger in memory and store it as a single JSON file
+    
+    With background=True, disk writes happen on a worker thread: changes
+    made while a write is in progress are coalesced into the next one, and
+    flush() waits until everything so far is durable.
+    """
+    def __init__(self, filename="budget_data.json", background=False):
+        self.filename = filename
+        # The tracker's own files (startup summary, recurring rules) are
+        # named after this, so they sit in the same place for every backend
+        self.base_filename = os.path.splitext(filename)[0]
+        # Transactions keyed by ID, in the order they were added
+        self.transactions = self.new_table()
+        # (date, id) pairs in ascending order, for date-ordered paging
+        self.date_index = []
+        self.next_id = 1
+        
+        # Guards the ledger against the writer thread reading it mid-change
+        self.lock = threading.RLock()
+        self.condition = threading.Condition(self.lock)
+        self.pending = []
+        self.pending_full = False
+        self.generation = 0
+        self.durable = 0
+        self.error = None
+        self.stopping = False
+        self.worker = None
+        
+        if background:
+            self.worker = threading.Thread(target=self.run_worker, name="coincompass-writer", daemon=True)
+            self.worker.start()
+            atexit.register(self.close)
+    
+    @instruments.timed("storage.read_snapshot", rows=lambda result: len(result[0]))
+    def read_snapshot(self):
+        """Read the snapshot file, returning (transactions, metadata)"""
+        if not os.path.exists(self.filename):
+            return [], {}
+        
+        with open(self.filename, 'r') as file:
+            data = json.load(file)
+        
+        # Older files hold a bare list of transactions
+        if isinstance(data, list):
+            data = {"transactions": data}
+        
+        transactions = data.pop("transactions", [])
+        
+        # Snapshots without a currency predate integer amounts and hold
+        # floats in major units
+        if "currency" not in data:
+            for transaction in transactions:
+                transaction["amount"] = to_minor(transaction["amount"])
+        return transactions, data
+    
+    def snapshot_metadata(self):
+        """Return the values stored alongside the transactions in a snapshot"""
+        return {"currency": CURRENCY, "next_id": self.next_id}
+    
+    @instruments.timed("storage.write_snapshot")
+    def write_snapshot(self):
+        """Atomically replace the snapshot file"""
+        # Only copying the ledger needs the lock; the disk write does not
+        with self.lock:
+            data = dict(self.snapshot_metadata(), transactions=self.snapshot_records())
+        
+        temp_filename = self.filename + ".tmp"
+        with open(temp_filename, 'w') as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, self.filename)
+    
+    def new_table(self):
+        """Return an empty mapping of ID to transaction"""
+        return {}
+    
+    def snapshot_records(self):
+        """Return the transactions as a list of JSON-serializable dicts"""
+        return list(self.transactions.values())
+    
+    def index_transactions(self, transactions, next_id=1, chunk_size=5000):
+        """Index loaded transactions by ID, yielding them a chunk at a time
+        
+        The indexes are complete for every chunk yielded so far. Returns
+        True if any transactions were renumbered.
+        """
+        self.transactions = self.new_table()
+        self.date_index = []
+        self.next_id = max([next_id] + [transaction["id"] + 1 for transaction in transactions])
+        renumbered = False
+        
+        for start in range(0, len(transactions), chunk_size):
+            chunk = transactions[start:start + chunk_size]
+            for transaction in chunk:
+                # Older versions reused IDs after a delete, so give any
+                # duplicate a fresh one rather than letting it shadow another
+                if transaction["id"] in self.transactions:
+                    transaction["id"] = self.allocate_id()
+                    renumbered = True
+                self.insert_record(transaction, sort=False)
+            
+            self.sort_indexes()
+            yield chunk
+        
+        return renumbered
+    
+    def insert_record(self, transaction, sort=True):
+        """Add a transaction to the ledger and its indexes
+        
+        Bulk callers pass sort=False and call sort_indexes() once at the end.
+        """
+        self.transactions[transaction["id"]] = transaction
+        if sort:
+            bisect.insort(self.date_index, (transaction["date"], transaction["id"]))
+        else:
+            self.date_index.append((transaction["date"], transaction["id"]))
+    
+    def sort_indexes(self):
+        """Restore index order after unsorted bulk inserts"""
+        self.date_index.sort()
+    
+    def remove_record(self, transaction_id):
+        """Remove a transaction from the ledger and its indexes, returning it"""
+        transaction = self.transactions.pop(transaction_id, None)
+        if transaction is not None:
+            key = (transaction["date"], transaction_id)
+            del self.date_index[bisect.bisect_left(self.date_index, key)]
+        return transaction
+    
+    def remove_records(self, transaction_ids):
+        """Remove many transactions from the ledger and its indexes, returning them
+        
+        Past a handful of removals the date index is rebuilt in one pass
+        rather than shifted once per transaction.
+        """
+        if len(transaction_ids) <= 32:
+            return [t for t in map(self.remove_record, transaction_ids) if t is not None]
+        
+        removed = [t for t in (self.transactions.pop(i, None) for i in transaction_ids) if t is not None]
+        removed_ids = {t["id"] for t in removed}
+        self.date_index = [key for key in self.date_index if key[1] not in removed_ids]
+        return removed
+    
+    def allocate_id(self):
+        """Return the next unused transaction ID"""
+        transaction_id = self.next_id
+        self.next_id += 1
+        return transaction_id
+    
+    def load(self):
+        """Load the stored transactions"""
+        for _ in self.load_in_chunks():
+            pass
+    
+    def load_in_chunks(self, chunk_size=5000):
+        """Load the stored transactions, yielding each chunk once it is indexed"""
+        transactions, metadata = self.read_snapshot()
+        renumbered = yield from self.index_transactions(transactions, metadata.get("next_id", 1), chunk_size)
+        
+        # Rewrite older ledgers once, in integer minor units
+        if renumbered or (transactions and "currency" not in metadata):
+            self.save()
+    
+    def save(self):
+        """Write the full ledger to disk"""
+        self.persist(full=True)
+    
+    def persist(self, *entries, full=False):
+        """Write out a change now, or queue it for the background writer"""
+        if self.worker is None:
+            self.write_changes(list(entries), full)
+            return
+        
+        with self.condition:
+            self.pending.extend(entries)
+            self.pending_full = self.pending_full or full
+            self.generation += 1
+            self.condition.notify_all()
+    
+    @instruments.timed("storage.write_changes")
+    def write_changes(self, entries, full):
+        """Write queued changes to disk"""
+        self.write_snapshot()
+    
+    def run_worker(self):
+        """Write queued changes until close() is called"""
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.durable < self.generation or self.stopping)
+                if self.durable == self.generation:
+                    return
+                
+                entries, self.pending = self.pending, []
+                full, self.pending_full = self.pending_full, False
+                generation = self.generation
+            
+            try:
+                self.write_changes(entries, full)
+            except Exception as e:
+                # Keep the changes queued and retry after a pause
+                with self.condition:
+                    self.pending[:0] = entries
+                    self.pending_full = self.pending_full or full
+                    self.error = e
+                    self.condition.notify_all()
+                    self.condition.wait(1.0)
+                continue
+            
+            with self.condition:
+                self.error = None
+                self.durable = generation
+                self.condition.notify_all()
+    
+    def flush(self, timeout=None):
+        """Wait until every change so far is on disk, returning False on timeout"""
+        if self.worker is None:
+            return True
+        
+        with self.condition:
+            target = self.generation
+            self.condition.wait_for(lambda: self.durable >= target or self.error is not None, timeout)
+            if self.durable < target and self.error is not None:
+                raise self.error
+            return self.durable >= target
+    
+    def close(self):
+        """Flush outstanding changes and stop the background writer"""
+        if self.worker is None:
+            return
+        
+        self.flush()
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.worker.join()
+        self.worker = None
+    
+    def record_add(self, transaction):
+        """Persist a newly added transaction"""
+        self.persist()
+    
+    def record_add_many(self, transactions):
+        """Persist a batch of newly added transactions"""
+        self.persist()
+    
+    def record_update(self, transaction):
+        """Persist a changed transaction"""
+        self.persist()
+    
+    def record_delete(self, transaction_id):
+        """Persist the removal of a transaction"""
+        self.persist()
+    
+    def record_update_many(self, transactions):
+        """Persist a batch of changed transactions"""
+        self.persist()
+    
+    def record_delete_many(self, transaction_ids):
+        """Persist the removal of a batch of transactions"""
+        self.persist()
+    
+    def add(self, transaction):
+        """Assign an ID to a transaction and add it to the ledger"""
+        with self.lock:
+            transaction["id"] = self.allocate_id()
+            self.insert_record(transaction)
+            self.record_add(transaction)
+    
+    def add_many(self, transactions):
+        """Assign IDs to a batch of transactions and add them with one persist"""
+        with self.lock:
+            for transaction in transactions:
+                transaction["id"] = self.allocate_id()
+                self.insert_record(transaction, sort=False)
+            
+            self.sort_indexes()
+            self.record_add_many(transactions)
+    
+    def get(self, transaction_id):
+        """Return a transaction by ID, or None if not found"""
+        return self.transactions.get(transaction_id)
+    
+    def get_many(self, transaction_ids):
+        """Return the transactions with the given IDs, skipping any not found"""
+        transactions = self.transactions
+        return [transactions[transaction_id] for transaction_id in transaction_ids
+                if transaction_id in transactions]
+    
+    def update(self, transaction):
+        """Replace the transaction with the same ID, returning the old one"""
+        with self.lock:
+            old = self.remove_record(transaction["id"])
+            if old is None:
+                return None
+            
+            self.insert_record(transaction)
+            self.record_update(transaction)
+            return old
+    
+    def delete(self, transaction_id):
+        """Remove a transaction by ID, returning it, or None if not found"""
+        with self.lock:
+            transaction = self.remove_record(transaction_id)
+            if transaction is not None:
+                self.record_delete(transaction_id)
+            return transaction
+    
+    def update_many(self, transactions):
+        """Replace a batch of transactions with one persist, returning the old ones
+        
+        Transactions whose ID is not in the ledger are skipped.
+        """
+        with self.lock:
+            old = self.remove_records([transaction["id"] for transaction in transactions])
+            found = {transaction["id"] for transaction in old}
+            transactions = [transaction for transaction in transactions if transaction["id"] in found]
+            
+            for transaction in transactions:
+                self.insert_record(transaction, sort=False)
+            self.sort_indexes()
+            
+            if transactions:
+                self.record_update_many(transactions)
+            return old
+    
+    def delete_many(self, transaction_ids):
+        """Remove a batch of transactions by ID with one persist, returning them"""
+        with self.lock:
+            removed = self.remove_records(list(transaction_ids))
+            if removed:
+                self.record_delete_many([transaction["id"] for transaction in removed])
+            return removed
+    
+    def totals(self):
+        """Return (total income, total expenses) in minor units"""
+        total_income = 0
+        total_expenses = 0
+        
+        for transaction in self.transactions.values():
+            if transaction["type"] == "income":
+                total_income += transaction["amount"]
+            else:  # expense
+                total_expenses += transaction["amount"]
+        
+        return total_income, total_expenses
+    
+    def category_totals(self):
+        """Return total expenses in minor units keyed by category"""
+        categories = {}
+        
+        for transaction in self.transactions.values():
+            if transaction["type"] == "expense":
+                category = transaction["category"]
+                amount = transaction["amount"]
+                
+                if category in categories:
+                    categories[category] += amount
+                else:
+                    categories[category] = amount
+        
+        return categories
+    
+    def daily_totals(self):
+        """Return (date, type, category, amount, count) rows for the ledger"""
+        groups = {}
+        
+        for transaction in self.transactions.values():
+            key = (transaction["date"], transaction["type"], transaction["category"])
+            amount, count = groups.get(key, (0, 0))
+            groups[key] = (amount + transaction["amount"], count + 1)
+        
+        return [key + value for key, value in groups.items()]
+    
+    def aggregates(self):
+        """Return per-day balance rows and per-month totals rows, as rollup() does"""
+        return rollup(self.daily_totals())
+    
+    def report_chunks(self, directory, chunks, start_date="", end_date="9999-99-99"):
+        """Return about chunks sources for build_report() to hand to aggregate_chunk()
+        
+        Files for the sources go in directory. Rows held as dicts would have
+        to be pickled to reach a worker, so they are grouped here and
+        totalled in this process.
+        """
+        with self.lock:
+            return [("rows", self.daily_totals())]
+    
+    def count(self):
+        """Return the number of transactions"""
+        return len(self.transactions)
+    
+    def iter_transactions(self, start_date=None, end_date=None):
+        """Yield transactions dated within [start_date, end_date], oldest first"""
+        start = 0 if start_date is None else bisect.bisect_left(self.date_index, (start_date,))
+        end = len(self.date_index) if end_date is None else bisect.bisect_right(self.date_index, (end_date, math.inf))
+        
+        for i in range(start, end):
+            yield self.transactions[self.date_index[i][1]]
+    
+    def get_transactions(self, sort_by_date=True, offset=0, limit=None):
+        """Return a page of transactions, optionally sorted most recent first"""
+        if not sort_by_date:
+            stop = None if limit is None else offset + limit
+            return list(itertools.islice(self.transactions.values(), offset, stop))
+        
+        # Walk the date index backwards so only the requested page is touched
+        end = max(len(self.date_index) - offset, 0)
+        start = 0 if limit is None else max(end - limit, 0)
+        return [self.transactions[transaction_id]
+                for _, transaction_id in reversed(self.date_index[start:end])]
+
+
+class JournalStorage(JsonStorage):
+    """Keep the ledger in memory as a JSON snapshot plus an append-only journal
+    
+    Adds and deletes append one line to the journal, so a write costs the
+    same no matter how large the ledger is. Once the journal holds
+    compact_threshold entries it is folded back into the snapshot.
+    """
+    def __init__(self, filename="budget_data.json", compact_threshold=1000, background=False):
+        self.journal_filename = os.path.splitext(filename)[0] + ".journal"
+        self.compact_threshold = compact_threshold
+        self.journal_size = 0
+        self.seq = 0
+        super().__init__(filename, background)
+    
+    def load_in_chunks(self, chunk_size=5000):
+        """Load the snapshot a chunk at a time, then replay the journal entries
+        written after it
+        
+        The journal replay is not yielded, so callers keeping their own
+        totals should recompute them once loading finishes.
+        """
+        transactions, metadata = self.read_snapshot()
+        renumbered = yield from self.index_transactions(transactions, metadata.get("next_id", 1), chunk_size)
+        self.seq = metadata.get("journal_seq", 0)
+        # Journals from before integer amounts hold floats; a new ledger
+        # has no snapshot yet, but its entries are already integers
+        legacy = "currency" not in metadata
+        self.replay_journal(legacy)
+        
+        if renumbered or (legacy and (transactions or self.journal_size)):
+            self.save()
+    
+    def replay_journal(self, legacy=False):
+        """Apply the journal entries written after the snapshot that was loaded"""
+        self.journal_size = 0
+        if not os.path.exists(self.journal_filename):
+            return
+        
+        with open(self.journal_filename, 'rb+') as file:
+            end = 0
+            for line in file:
+                try:
+                    entry = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    entry = None
+                if entry is None:
+                    # A torn last line from an interrupted write. It is cut
+                    # off, or entries appended after it would never replay
+                    file.truncate(end)
+                    os.fsync(file.fileno())
+                    break
+                end += len(line)
+                
+                # Entries already folded into the snapshot are skipped,
+                # which covers a crash between compaction steps
+                if entry["seq"] <= self.seq:
+                    continue
+                
+                if legacy and "transaction" in entry and isinstance(entry["transaction"]["amount"], float):
+                    entry["transaction"]["amount"] = to_minor(entry["transaction"]["amount"])
+                self.apply(entry)
+                self.seq = entry["seq"]
+                self.journal_size += 1
+    
+    def apply(self, entry):
+        """Apply a single journal entry to the ledger"""
+        if entry["op"] in ("add", "update"):
+            transaction = entry["transaction"]
+            self.remove_record(transaction["id"])
+            self.insert_record(transaction)
+            self.next_id = max(self.next_id, transaction["id"] + 1)
+        elif entry["op"] == "delete":
+            self.remove_record(entry["id"])
+    
+    def snapshot_metadata(self):
+        # Journal entries up to this sequence number are in the snapshot
+        return dict(super().snapshot_metadata(), journal_seq=self.seq)
+    
+    def persist(self, *entries, full=False):
+        # Number and encode entries in the order the changes were made, so
+        # the background writer never sees a record that has changed since
+        lines = []
+        with self.lock:
+            for entry in entries:
+                self.seq += 1
+                entry["seq"] = self.seq
+                lines.append(json.dumps(entry) + "\n")
+            super().persist(*lines, full=full)
+    
+    @instruments.timed("storage.write_changes")
+    def write_changes(self, lines, full):
+        """Append lines to the journal, compacting when it grows too long"""
+        if lines:
+            with open(self.journal_filename, 'a') as file:
+                file.writelines(lines)
+                file.flush()
+                os.fsync(file.fileno())
+            self.journal_size += len(lines)
+        
+        if full or self.journal_size >= self.compact_threshold:
+            self.compact()
+    
+    def compact(self):
+        """Fold the journal into a fresh snapshot and truncate it
+        
+        Entries still queued when the snapshot is taken have sequence numbers
+        it already covers, so replay skips them once they are written.
+        """
+        self.write_snapshot()
+        open(self.journal_filename, 'w').close()
+        self.journal_size = 0
+    
+    def record_add(self, transaction):
+        self.persist({"op": "add", "transaction": transaction})
+    
+    def record_add_many(self, transactions):
+        self.persist(*({"op": "add", "transaction": transaction} for transaction in transactions))
+    
+    def record_update(self, transaction):
+        self.persist({"op": "update", "transaction": transaction})
+    
+    def record_delete(self, transaction_id):
+        self.persist({"op": "delete", "id": transaction_id})
+    
+    def record_update_many(self, transactions):
+        self.persist(*({"op": "update", "transaction": transaction} for transaction in transactions))
+    
+    def record_delete_many(self, transaction_ids):
+        self.persist(*({"op": "delete", "id": transaction_id} for transaction_id in transaction_ids))
+
+
+class RowView(collections.abc.Mapping):
+    """Read-only, dict-like view of one row of a ColumnTable"""
+    __slots__ = ("table", "id")
+    
+    def __init__(self, table, transaction_id):
+        self.table = table
+        self.id = transaction_id
+    
+    def __getitem__(self, key):
+        return self.table.field(self.table.positions[self.id], key)
+    
+    def __iter__(self):
+        return iter(TRANSACTION_FIELDS)
+    
+    def __len__(self):
+        return len(TRANSACTION_FIELDS)
+    
+    def __repr__(self):
+        return f"RowView({dict(self)!r})"
+
+
+class ColumnTable(collections.abc.MutableMapping):
+    """Transactions stored as parallel typed columns, keyed by ID
+    
+    Amounts are integer minor units, dates are day ordinals, and types and
+    categories are interned codes, so a row costs a few dozen bytes instead
+    of a dict. Lookups return RowView objects. Deleted rows are tombstoned
+    and squeezed out once they make up half of the table.
+    """
+    def __init__(self):
+        self.ids = array.array('q')
+        self.dates = array.array('i')
+        self.types = array.array('b')
+        self.amounts = array.array('q')
+        self.categories = array.array('i')
+        self.descriptions = []
+        self.alive = bytearray()
+        self.dead = 0
+        
+        self.positions = {}
+        self.type_codes = {}
+        self.type_names = []
+        self.category_codes = {}
+        self.category_names = []
+        # Dates that are not valid ISO dates, kept verbatim by ID
+        self.odd_dates = {}
+    
+    def intern(self, value, codes, names):
+        """Return the code for value, assigning a new one if needed"""
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+    
+    def field(self, position, key):
+        """Return one field of the row at position"""
+        if key == "id":
+            return self.ids[position]
+        if key == "date":
+            if self.dates[position] == 0:
+                return self.odd_dates[self.ids[position]]
+            return datetime.date.fromordinal(self.dates[position]).isoformat()
+        if key == "type":
+            return self.type_names[self.types[position]]
+        if key == "amount":
+            return self.amounts[position]
+        if key == "category":
+            return self.category_names[self.categories[position]]
+        if key == "description":
+            return self.descriptions[position]
+        raise KeyError(key)
+    
+    def __getitem__(self, transaction_id):
+        if transaction_id not in self.positions:
+            raise KeyError(transaction_id)
+        return RowView(self, transaction_id)
+    
+    def __setitem__(self, transaction_id, transaction):
+        try:
+            ordinal = datetime.date.fromisoformat(transaction["date"]).toordinal()
+        except ValueError:
+            ordinal = 0
+        type_code = self.intern(transaction["type"], self.type_codes, self.type_names)
+        category_code = self.intern(transaction["category"], self.category_codes, self.category_names)
+        description = sys.intern(transaction["description"])
+        
+        # A value the typed columns cannot hold (an amount past int64, say)
+        # is cut back out of every column, leaving the table as it was
+        position = len(self.ids)
+        try:
+            self.ids.append(transaction_id)
+            self.dates.append(ordinal)
+            self.types.append(type_code)
+            self.amounts.append(transaction["amount"])
+            self.categories.append(category_code)
+        except Exception:
+            for column in (self.ids, self.dates, self.types, self.amounts, self.categories):
+                del column[position:]
+            raise
+        self.descriptions.append(description)
+        self.alive.append(1)
+        
+        # Replacing a row tombstones the old one; the new row stays last
+        # even if that squeezes the table
+        if transaction_id in self.positions:
+            del self[transaction_id]
+        self.positions[transaction_id] = len(self.ids) - 1
+        if ordinal == 0:
+            self.odd_dates[transaction_id] = transaction["date"]
+    
+    def __delitem__(self, transaction_id):
+        position = self.positions.pop(transaction_id)
+        self.alive[position] = 0
+        self.descriptions[position] = ""
+        self.odd_dates.pop(transaction_id, None)
+        self.dead += 1
+        
+        if self.dead > 1024 and self.dead * 2 > len(self.ids):
+            self.squeeze()
+    
+    def __iter__(self):
+        return iter(self.positions)
+    
+    def __len__(self):
+        return len(self.positions)
+    
+    def __contains__(self, transaction_id):
+        return transaction_id in self.positions
+    
+    def pop(self, transaction_id, *default):
+        """Remove a row, returning it as a plain dict"""
+        if transaction_id not in self.positions:
+            if default:
+                return default[0]
+            raise KeyError(transaction_id)
+        
+        transaction = dict(self[transaction_id])
+        del self[transaction_id]
+        return transaction
+    
+    def squeeze(self):
+        """Drop tombstoned rows from every column"""
+        columns = self.live_columns()
+        self.ids = columns["ids"]
+        self.dates = columns["dates"]
+        self.types = columns["types"]
+        self.amounts = columns["amounts"]
+        self.categories = columns["categories"]
+        self.descriptions = columns["descriptions"]
+        self.alive = bytearray([1]) * len(self.ids)
+        self.dead = 0
+        self.positions = {transaction_id: i for i, transaction_id in enumerate(self.ids)}
+    
+    def live_columns(self):
+        """Return copies of the columns and name tables, without tombstoned rows"""
+        if self.dead:
+            keep = self.alive
+            columns = {
+                "ids": array.array('q', itertools.compress(self.ids, keep)),
+                "dates": array.array('i', itertools.compress(self.dates, keep)),
+                "types": array.array('b', itertools.compress(self.types, keep)),
+                "amounts": array.array('q', itertools.compress(self.amounts, keep)),
+                "categories": array.array('i', itertools.compress(self.categories, keep)),
+                "descriptions": list(itertools.compress(self.descriptions, keep))
+            }
+        else:
+            # Slicing copies an array with one memcpy
+            columns = {
+                "ids": self.ids[:],
+                "dates": self.dates[:],
+                "types": self.types[:],
+                "amounts": self.amounts[:],
+                "categories": self.categories[:],
+                "descriptions": self.descriptions[:]
+            }
+        
+        return dict(columns, type_names=list(self.type_names), category_names=list(self.category_names),
+                    odd_dates=dict(self.odd_dates))
+    
+    @classmethod
+    def from_columns(cls, ids, dates, types, amounts, categories, descriptions,
+                     type_names, category_names, odd_dates):
+        """Build a table from whole columns of live rows, as live_columns() returns them"""
+        table = cls()
+        table.ids = ids
+        table.dates = dates
+        table.types = types
+        table.amounts = amounts
+        table.categories = categories
+        table.descriptions = descriptions
+        table.alive = bytearray([1]) * len(ids)
+        table.positions = dict(zip(ids, range(len(ids))))
+        table.type_names = list(type_names)
+        table.type_codes = {name: code for code, name in enumerate(type_names)}
+        table.category_names = list(category_names)
+        table.category_codes = {name: code for code, name in enumerate(category_names)}
+        table.odd_dates = dict(odd_dates)
+        return table
+    
+    def date_keys(self):
+        """Return sorted (date, id) pairs for every live row
+        
+        Each distinct day is formatted once, and rows added in date order
+        are already sorted, so this is close to linear.
+        """
+        names = {ordinal: datetime.date.fromordinal(ordinal).isoformat()
+                 for ordinal in set(itertools.compress(self.dates, self.alive)) if ordinal}
+        keys = list(itertools.compress(zip(map(names.get, self.dates), self.ids), self.alive))
+        if self.odd_dates:
+            keys = [(self.odd_dates[transaction_id], transaction_id) if date is None else (date, transaction_id)
+                    for date, transaction_id in keys]
+        keys.sort()
+        return keys
+    
+    def daily_stats(self):
+        """Return (minor units, count) keyed by (date ordinal, type code, category code)
+        
+        Rows whose date is not a valid ISO date are keyed by the date text
+        instead of an ordinal.
+        """
+        if numpy is None:
+            groups = {}
+            for transaction_id, alive, ordinal, type_code, code, units in zip(
+                    self.ids, self.alive, self.dates, self.types, self.categories, self.amounts):
+                if alive:
+                    key = (ordinal or self.odd_dates[transaction_id], type_code, code)
+                    amount, count = groups.get(key, (0, 0))
+                    groups[key] = (amount + units, count + 1)
+            return groups
+        
+        alive = numpy.frombuffer(self.alive, dtype=numpy.bool_)
+        dates = numpy.frombuffer(self.dates, dtype=numpy.int32).astype(numpy.int64)
+        types = numpy.frombuffer(self.types, dtype=numpy.int8).astype(numpy.int64)
+        categories = numpy.frombuffer(self.categories, dtype=numpy.int32).astype(numpy.int64)
+        amounts = numpy.frombuffer(self.amounts, dtype=numpy.int64)
+        
+        # Pack each row's group into one int64 (22 bits of ordinal, 8 of
+        # type, 32 of category) so a single unique() finds every group
+        regular = alive & (dates != 0)
+        keys = (dates[regular] << 40) | (types[regular] << 32) | categories[regular]
+        unique, inverse = numpy.unique(keys, return_inverse=True)
+        sums = numpy.zeros(len(unique), dtype=numpy.int64)
+        numpy.add.at(sums, inverse, amounts[regular])
+        counts = numpy.bincount(inverse, minlength=len(unique))
+        
+        groups = {(key >> 40, (key >> 32) & 0xFF, key & 0xFFFFFFFF): (units, count)
+                  for key, units, count in zip(unique.tolist(), sums.tolist(), counts.tolist())}
+        
+        for position in numpy.flatnonzero(alive & (dates == 0)).tolist():
+            key = (self.odd_dates[self.ids[position]], self.types[position], self.categories[position])
+            amount, count = groups.get(key, (0, 0))
+            groups[key] = (amount + self.amounts[position], count + 1)
+        return groups
+    
+    def daily_totals(self):
+        """Return daily_stats() as named (date, type, category, amount, count) rows"""
+        # Group on the raw codes first, then name the much smaller groups
+        rows = []
+        for (date, type_code, code), (units, count) in self.daily_stats().items():
+            if isinstance(date, int):
+                date = datetime.date.fromordinal(date).isoformat()
+            rows.append((date, self.type_names[type_code], self.category_names[code], units, count))
+        return rows
+    
+    def type_mask(self, type_code):
+        """Return a bytearray with a 1 for each live row of the given type
+        
+        The mask is built with bytes.translate and one big-integer AND, so
+        no Python code runs per row.
+        """
+        table = bytearray(256)
+        table[type_code & 0xFF] = 1
+        selected = int.from_bytes(self.types.tobytes().translate(table), "little")
+        alive = int.from_bytes(self.alive, "little")
+        return (selected & alive).to_bytes(len(self.alive), "little")
+    
+    def totals(self):
+        """Return (total income, total expenses) in minor units
+        
+        Both are exact int64 reductions over the amount column: in NumPy if
+        it is installed, otherwise by summing the masked array in C.
+        """
+        income_code = self.type_codes.get("income", -1)
+        
+        if numpy is not None:
+            alive = numpy.frombuffer(self.alive, dtype=numpy.bool_)
+            types = numpy.frombuffer(self.types, dtype=numpy.int8)
+            amounts = numpy.frombuffer(self.amounts, dtype=numpy.int64)
+            income = int(amounts[alive & (types == income_code)].sum())
+            total = int(amounts[alive].sum())
+        else:
+            total = sum(itertools.compress(self.amounts, self.alive))
+            income = sum(itertools.compress(self.amounts, self.type_mask(income_code))) if income_code >= 0 else 0
+        
+        return income, total - income
+    
+    def category_stats(self):
+        """Return (expense minor units, expense count) lists indexed by category code"""
+        expense_code = self.type_codes.get("expense", -1)
+        size = len(self.category_names)
+        
+        if numpy is not None:
+            mask = numpy.frombuffer(self.alive, dtype=numpy.bool_) & (
+                numpy.frombuffer(self.types, dtype=numpy.int8) == expense_code)
+            codes = numpy.frombuffer(self.categories, dtype=self.categories.typecode)[mask]
+            amounts = numpy.frombuffer(self.amounts, dtype=numpy.int64)[mask]
+            # bincount only sums floats, so accumulate in int64 to stay exact
+            sums = numpy.zeros(size, dtype=numpy.int64)
+            numpy.add.at(sums, codes, amounts)
+            counts = numpy.bincount(codes, minlength=size)
+            return [int(units) for units in sums], [int(count) for count in counts]
+        
+        sums = [0] * size
+        counts = [0] * size
+        if expense_code < 0:
+            return sums, counts
+        
+        mask = self.type_mask(expense_code)
+        for code, units in zip(itertools.compress(self.categories, mask), itertools.compress(self.amounts, mask)):
+            sums[code] += units
+            counts[code] += 1
+        return sums, counts
+
+
+class ColumnarStorage(JournalStorage):
+    """Journal-backed storage that holds the ledger in a ColumnTable
+    
+    The files on disk are the same as JournalStorage's, so a ledger can be
+    switched between the two freely.
+    """
+    def new_table(self):
+        return ColumnTable()
+    
+    def snapshot_records(self):
+        return [dict(row) for row in self.transactions.values()]
+    
+    def totals(self):
+        return self.transactions.totals()
+    
+    def category_totals(self):
+        sums, counts = self.transactions.category_stats()
+        return {name: sums[code]
+                for code, name in enumerate(self.transactions.category_names) if counts[code]}
+    
+    def daily_totals(self):
+        return self.transactions.daily_totals()
+    
+    def report_chunks(self, directory, chunks, start_date="", end_date="9999-99-99"):
+        """Split the columns into binary snapshot files of at least REPORT_MIN_CHUNK_ROWS rows
+        
+        Copying the columns is all that happens under the lock.
+        """
+        chunks = min(chunks, len(self.transactions) // REPORT_MIN_CHUNK_ROWS)
+        if chunks <= 1:
+            return super().report_chunks(directory, chunks, start_date, end_date)
+        
+        with self.lock:
+            columns = self.transactions.live_columns()
+        
+        sources = []
+        size = -(-len(columns["ids"]) // chunks)
+        for start in range(0, len(columns["ids"]), size):
+            filename = os.path.join(directory, f"chunk{len(sources)}.bin")
+            chunk = dict(columns, **{name: columns[name][start:start + size] for name, _ in SNAPSHOT_COLUMNS})
+            write_binary_snapshot(filename, chunk, {})
+            sources.append(("binary", filename))
+        return sources
+
+
+SNAPSHOT_MAGIC = b"CCSNAP1\n"
+
+# Name and little-endian array typecode of each snapshot column, in file
+# order; a row takes 29 bytes across them
+SNAPSHOT_COLUMNS = (
+    ("ids", "q"),
+    ("dates", "i"),
+    ("types", "b"),
+    ("amounts", "q"),
+    ("categories", "i"),
+    ("descriptions", "i"),
+)
+
+
+@instruments.timed("storage.write_binary_snapshot", rows=lambda result: result)
+def write_binary_snapshot(filename, columns, metadata, compress=False):
+    """Atomically write ColumnTable.live_columns() output as a binary snapshot
+    
+    The file is the magic line, a 4-byte header length, a JSON header with
+    the metadata and name tables, then each column back to back and a
+    NUL-separated string table of the distinct descriptions. With compress,
+    everything after the header is zlib-compressed. Returns the row count.
+    """
+    # Descriptions are stored once each and referenced by code
+    strings = {}
+    columns = dict(columns, descriptions=array.array(
+        'i', [strings.setdefault(text, len(strings)) for text in columns["descriptions"]]))
+    
+    header = json.dumps({
+        "metadata": metadata,
+        "rows": len(columns["ids"]),
+        "types": columns["type_names"],
+        "categories": columns["category_names"],
+        "odd_dates": columns["odd_dates"],
+        "compressed": compress
+    }).encode("utf-8")
+    
+    body = []
+    for name, typecode in SNAPSHOT_COLUMNS:
+        column = columns[name]
+        if sys.byteorder == "big":
+            column = array.array(typecode, column)
+            column.byteswap()
+        body.append(column.tobytes())
+    body.append("\0".join(text.replace("\0", "") for text in strings).encode("utf-8"))
+    body = b"".join(body)
+    if compress:
+        body = zlib.compress(body)
+    
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, 'wb') as file:
+        file.write(SNAPSHOT_MAGIC + struct.pack("<I", len(header)) + header)
+        file.write(body)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_filename, filename)
+    return len(columns["ids"])
+
+
+@instruments.timed("storage.read_binary_snapshot", rows=lambda result: len(result[0]))
+def read_binary_snapshot(filename):
+    """Read a binary snapshot into a ColumnTable, returning (table, metadata)
+    
+    An uncompressed file is memory-mapped and each column is copied out of
+    the mapping in one go, so no per-row objects are built beyond the
+    description references.
+    """
+    with open(filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{filename} is not a CoinCompass binary snapshot")
+        
+        start = len(SNAPSHOT_MAGIC) + 4
+        header_size, = struct.unpack_from("<I", data, len(SNAPSHOT_MAGIC))
+        header = json.loads(data[start:start + header_size])
+        start += header_size
+        
+        if header["compressed"]:
+            body, start = zlib.decompress(data[start:]), 0
+        else:
+            body = data
+        
+        columns = {}
+        with memoryview(body) as view:
+            for name, typecode in SNAPSHOT_COLUMNS:
+                column = array.array(typecode)
+                size = header["rows"] * column.itemsize
+                column.frombytes(view[start:start + size])
+                if sys.byteorder == "big":
+                    column.byteswap()
+                columns[name] = column
+                start += size
+            strings = str(view[start:], "utf-8").split("\0")
+    
+    # Every row with the same description shares one string
+    columns["descriptions"] = list(map(strings.__getitem__, columns["descriptions"]))
+    table = ColumnTable.from_columns(
+        type_names=header["types"],
+        category_names=header["categories"],
+        odd_dates={int(transaction_id): date for transaction_id, date in header["odd_dates"].items()},
+        **columns
+    )
+    return table, header["metadata"]
+
+
+class BinaryStorage(ColumnarStorage):
+    """Columnar storage whose snapshot is a compact binary file
+    
+    The snapshot holds fixed-width id, date ordinal, type, amount, category
+    and description columns plus a string table (see write_binary_snapshot),
+    and loads through mmap straight into a ColumnTable, so startup builds
+    no per-row dicts. Changes still go to an append-only journal. With
+    compress=True the snapshot is zlib-compressed, which suits archives
+    better than a ledger in daily use.
+    """
+    def __init__(self, filename="budget_data.bin", compact_threshold=1000, background=False, compress=False):
+        self.compress = compress
+        super().__init__(filename, compact_threshold, background)
+        # Kept apart from the journal of the JSON backends' budget_data.json
+        self.journal_filename = filename + ".journal"
+    
+    def load(self):
+        """Load the snapshot and replay the journal entries written after it"""
+        self.transactions = self.new_table()
+        self.next_id = 1
+        self.seq = 0
+        
+        if os.path.exists(self.filename):
+            self.transactions, metadata = read_binary_snapshot(self.filename)
+            self.next_id = metadata.get("next_id", 1)
+            self.seq = metadata.get("journal_seq", 0)
+        
+        self.date_index = self.transactions.date_keys()
+        self.replay_journal()
+    
+    def load_in_chunks(self, chunk_size=5000):
+        """Load the whole ledger; columns are read in bulk, so there are no chunks"""
+        self.load()
+        return iter(())
+    
+    @instruments.timed("storage.write_snapshot")
+    def write_snapshot(self):
+        """Atomically replace the snapshot file"""
+        # Copying the columns is a few memcpys; encoding happens outside the lock
+        with self.lock:
+            metadata = self.snapshot_metadata()
+            columns = self.transactions.live_columns()
+        write_binary_snapshot(self.filename, columns, metadata, self.compress)
+
+
+def write_binary_ledger(transactions, filename, compress=False, next_id=None):
+    """Write transactions to a binary snapshot that BinaryStorage can open, keeping IDs
+    
+    Returns the number of transactions written.
+    """
+    table = ColumnTable()
+    for transaction in transactions:
+        table[transaction["id"]] = transaction
+    
+    metadata = {"currency": CURRENCY, "next_id": next_id or max(table, default=0) + 1}
+    return write_binary_snapshot(filename, table.live_columns(), metadata, compress)
+
+
+MONTH_PATTERN = re.compile(r"\d{4}-\d{2}")
+
+# Partition for transactions whose date is not an ISO date
+UNDATED = "undated"
+
+
+def partition_key(date):
+    """Return the YYYY-MM partition a date belongs in"""
+    month = date[:7]
+    return month if MONTH_PATTERN.fullmatch(month) else UNDATED
+
+
+class PartitionSummary:
+    """Aggregates of one partition, kept in the manifest so the partition need not be read"""
+    __slots__ = ("count", "days", "groups", "id_ranges")
+    
+    def __init__(self):
+        self.count = 0
+        # [income, expenses] by date, for the balance index
+        self.days = {}
+        # [amount, count] by (month, type, category), for the monthly totals
+        self.groups = {}
+        # Sorted [first, last] runs covering every ID stored here; deletes
+        # leave them alone, so they may cover IDs that are gone
+        self.id_ranges = []
+    
+    def add(self, transaction, sign=1):
+        """Count a transaction in, or out when sign is -1"""
+        date = transaction["date"]
+        amount = sign * transaction["amount"]
+        self.count += sign
+        
+        day = self.days.setdefault(date, [0, 0])
+        day[0 if transaction["type"] == "income" else 1] += amount
+        if day == [0, 0]:
+            del self.days[date]
+        
+        key = (date[:7], transaction["type"], transaction["category"])
+        group = self.groups.setdefault(key, [0, 0])
+        group[0] += amount
+        group[1] += sign
+        if group[1] == 0:
+            del self.groups[key]
+        
+        if sign > 0:
+            self.add_id(transaction["id"])
+    
+    def add_id(self, transaction_id):
+        """Extend the ID runs to cover transaction_id"""
+        ranges = self.id_ranges
+        i = bisect.bisect_right(ranges, [transaction_id, math.inf])
+        if i and ranges[i - 1][1] >= transaction_id:
+            return
+        
+        joins_previous = i and ranges[i - 1][1] == transaction_id - 1
+        joins_next = i < len(ranges) and ranges[i][0] == transaction_id + 1
+        if joins_previous and joins_next:
+            ranges[i - 1][1] = ranges.pop(i)[1]
+        elif joins_previous:
+            ranges[i - 1][1] = transaction_id
+        elif joins_next:
+            ranges[i][0] = transaction_id
+        else:
+            ranges.insert(i, [transaction_id, transaction_id])
+    
+    def may_hold(self, transaction_id):
+        """Return whether transaction_id could be in this partition"""
+        i = bisect.bisect_right(self.id_ranges, [transaction_id, math.inf])
+        return i > 0 and self.id_ranges[i - 1][1] >= transaction_id
+    
+    def to_json(self):
+        """Return the summary as JSON-serializable data"""
+        return {
+            "count": self.count,
+            "days": {date: list(totals) for date, totals in self.days.items()},
+            "groups": [list(key) + group for key, group in self.groups.items()],
+            "ids": [list(run) for run in self.id_ranges]
+        }
+    
+    @classmethod
+    def from_json(cls, data):
+        """Rebuild a summary from to_json() output"""
+        summary = cls()
+        summary.count = data["count"]
+        summary.days = data["days"]
+        summary.groups = {(month, transaction_type, category): [amount, count]
+                          for month, transaction_type, category, amount, count in data["groups"]}
+        summary.id_ranges = data["ids"]
+        return summary
+
+
+class PartitionedStorage(JsonStorage):
+    """Keep the ledger as one JSON file per month, reading old months only when needed
+    
+    A manifest holds every partition's PartitionSummary, so totals, counts
+    and balances never touch the partitions themselves. Loading reads the
+    newest recent_months partitions; older ones are read the first time a
+    page, a date range or an ID lookup reaches them. A change rewrites only
+    the partitions it touched, then the manifest.
+    """
+    def __init__(self, directory="budget_data", recent_months=3, background=False):
+        self.directory = directory
+        self.recent_months = recent_months
+        self.summaries = {}
+        # Partitions read so far, and the partition of each transaction in them
+        self.partitions = {}
+        self.locations = {}
+        super().__init__(os.path.join(directory, "manifest.json"), background)
+        self.base_filename = os.path.normpath(directory)
+    
+    def partition_filename(self, key):
+        return os.path.join(self.directory, key + ".json")
+    
+    def partition_keys(self, newest_first=False):
+        """Return the partition keys in date order, with undated last either way"""
+        keys = sorted((key for key in self.summaries if key != UNDATED), reverse=newest_first)
+        if UNDATED in self.summaries:
+            keys.append(UNDATED)
+        return keys
+    
+    def open_partition(self, key):
+        """Return the partition for key, reading it from disk the first time"""
+        with self.lock:
+            partition = self.partitions.get(key)
+            if partition is None:
+                partition = JsonStorage(self.partition_filename(key))
+                # Share the lock, so the writer never copies a partition mid-change
+                partition.lock = self.lock
+                partition.load()
+                self.partitions[key] = partition
+                self.locations.update(dict.fromkeys(partition.transactions, key))
+            return partition
+    
+    def load_in_chunks(self, chunk_size=5000):
+        """Read the manifest and the newest partitions, yielding their transactions a chunk at a time"""
+        self.read_manifest()
+        
+        months = [key for key in self.partition_keys(newest_first=True) if key != UNDATED]
+        for key in months[:self.recent_months]:
+            transactions = self.open_partition(key).get_transactions(sort_by_date=False)
+            for start in range(0, len(transactions), chunk_size):
+                yield transactions[start:start + chunk_size]
+    
+    def read_manifest(self):
+        """Read the manifest, summarizing again any partition written after it"""
+        self.summaries = {}
+        self.partitions = {}
+        self.locations = {}
+        self.next_id = 1
+        os.makedirs(self.directory, exist_ok=True)
+        
+        manifest_time = 0
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r') as file:
+                data = json.load(file)
+            manifest_time = os.stat(self.filename).st_mtime_ns
+            self.next_id = data["next_id"]
+            self.summaries = {key: PartitionSummary.from_json(summary) for key, summary in data["partitions"].items()}
+        
+        keys = {name[:-5] for name in os.listdir(self.directory) if name.endswith(".json")}
+        keys = {key for key in keys if key == UNDATED or MONTH_PATTERN.fullmatch(key)}
+        
+        # A crash between writing a partition and the manifest leaves the
+        # partition newer, or missing once it was emptied
+        stale = set(self.summaries) - keys
+        stale.update(key for key in keys if key not in self.summaries
+                     or os.stat(self.partition_filename(key)).st_mtime_ns >= manifest_time)
+        for key in stale:
+            self.summaries.pop(key, None)
+            partition = self.open_partition(key) if key in keys else None
+            if partition is not None and partition.transactions:
+                self.summaries[key] = summary = PartitionSummary()
+                for transaction in partition.transactions.values():
+                    summary.add(transaction)
+                self.next_id = max(self.next_id, partition.next_id)
+            elif partition is not None:
+                os.remove(self.partition_filename(key))
+        
+        if stale:
+            self.write_snapshot()
+    
+    @instruments.timed("storage.write_snapshot")
+    def write_snapshot(self):
+        """Atomically replace the manifest"""
+        with self.lock:
+            data = {
+                "currency": CURRENCY,
+                "next_id": self.next_id,
+                "partitions": {key: summary.to_json() for key, summary in sorted(self.summaries.items())}
+            }
+        
+        temp_filename = self.filename + ".tmp"
+        with open(temp_filename, 'w') as file:
+            json.dump(data, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, self.filename)
+    
+    @instruments.timed("storage.write_changes")
+    def write_changes(self, keys, full):
+        """Rewrite the partitions named by keys, or every loaded one, then the manifest"""
+        with self.lock:
+            keys = set(self.partitions) if full else set(keys)
+        
+        # An emptied partition is written out empty too, so a crash before
+        # it is removed below cannot bring its rows back
+        for key in keys:
+            self.partitions[key].write_snapshot()
+        self.write_snapshot()
+        
+        # Emptied partitions go only once the manifest no longer lists them
+        for key in keys:
+            with self.lock:
+                if key not in self.summaries and os.path.exists(self.partition_filename(key)):
+                    os.remove(self.partition_filename(key))
+    
+    def insert(self, transaction, sort=True):
+        """Add a transaction to its partition and summary, returning the partition key"""
+        key = partition_key(transaction["date"])
+        self.open_partition(key).insert_record(transaction, sort)
+        self.locations[transaction["id"]] = key
+        self.summaries.setdefault(key, PartitionSummary()).add(transaction)
+        return key
+    
+    def locate(self, transaction_id):
+        """Return the key of the partition holding transaction_id, reading candidates as needed"""
+        key = self.locations.get(transaction_id)
+        if key is not None:
+            return key
+        
+        for key, summary in list(self.summaries.items()):
+            if key not in self.partitions and summary.may_hold(transaction_id):
+                self.open_partition(key)
+                if transaction_id in self.locations:
+                    return key
+        return None
+    
+    def remove(self, transaction_id):
+        """Remove a transaction from its partition and summary, returning (key, transaction)"""
+        key = self.locate(transaction_id)
+        if key is None:
+            return None, None
+        
+        transaction = self.partitions[key].remove_record(transaction_id)
+        del self.locations[transaction_id]
+        
+        summary = self.summaries[key]
+        summary.add(transaction, -1)
+        if summary.count == 0:
+            del self.summaries[key]
+        return key, transaction
+    
+    def import_transactions(self, transactions, next_id=1):
+        """Add existing transactions, keeping their IDs, and write every partition"""
+        with self.lock:
+            keys = set()
+            for transaction in transactions:
+                keys.add(self.insert(transaction, sort=False))
+                next_id = max(next_id, transaction["id"] + 1)
+            
+            for key in keys:
+                self.partitions[key].sort_indexes()
+            self.next_id = max(self.next_id, next_id)
+            self.persist(*keys)
+    
+    def add(self, transaction):
+        """Assign an ID to a transaction and add it to its partition"""
+        with self.lock:
+            transaction["id"] = self.allocate_id()
+            self.persist(self.insert(transaction))
+    
+    def add_many(self, transactions):
+        """Assign IDs to a batch of transactions and add them with one persist"""
+        with self.lock:
+            keys = set()
+            for transaction in transactions:
+                transaction["id"] = self.allocate_id()
+                keys.add(self.insert(transaction, sort=False))
+            
+            for key in keys:
+                self.partitions[key].sort_indexes()
+            self.persist(*keys)
+    
+    def get(self, transaction_id):
+        """Return a transaction by ID, or None if not found"""
+        with self.lock:
+            key = self.locate(transaction_id)
+            return None if key is None else self.partitions[key].get(transaction_id)
+    
+    def get_many(self, transaction_ids):
+        """Return the transactions with the given IDs, skipping any not found"""
+        with self.lock:
+            transactions = []
+            for transaction_id in transaction_ids:
+                key = self.locate(transaction_id)
+                if key is not None:
+                    transactions.append(self.partitions[key].get(transaction_id))
+            return transactions
+    
+    def update(self, transaction):
+        """Replace the transaction with the same ID, returning the old one"""
+        with self.lock:
+            old_key, old = self.remove(transaction["id"])
+            if old is None:
+                return None
+            
+            self.persist(old_key, self.insert(transaction))
+            return old
+    
+    def delete(self, transaction_id):
+        """Remove a transaction by ID, returning it, or None if not found"""
+        with self.lock:
+            key, transaction = self.remove(transaction_id)
+            if transaction is not None:
+                self.persist(key)
+            return transaction
+    
+    def update_many(self, transactions):
+        """Replace a batch of transactions with one persist, returning the old ones"""
+        with self.lock:
+            keys = set()
+            old = []
+            for transaction in transactions:
+                old_key, previous = self.remove(transaction["id"])
+                if previous is not None:
+                    old.append(previous)
+                    keys.update((old_key, self.insert(transaction)))
+            
+            if keys:
+                self.persist(*keys)
+            return old
+    
+    def delete_many(self, transaction_ids):
+        """Remove a batch of transactions by ID with one persist, returning them"""
+        with self.lock:
+            keys = set()
+            removed = []
+            for transaction_id in transaction_ids:
+                key, transaction = self.remove(transaction_id)
+                if transaction is not None:
+                    keys.add(key)
+                    removed.append(transaction)
+            
+            if keys:
+                self.persist(*keys)
+            return removed
+    
+    def totals(self):
+        """Return (total income, total expenses) in minor units, from the manifest"""
+        income = 0
+        expenses = 0
+        for summary in self.summaries.values():
+            for (_, transaction_type, _), (amount, _) in summary.groups.items():
+                if transaction_type == "income":
+                    income += amount
+                else:  # expense
+                    expenses += amount
+        return income, expenses
+    
+    def category_totals(self):
+        """Return total expenses in minor units keyed by category, from the manifest"""
+        categories = {}
+        for summary in self.summaries.values():
+            for (_, transaction_type, category), (amount, _) in summary.groups.items():
+                if transaction_type == "expense":
+                    categories[category] = categories.get(category, 0) + amount
+        return categories
+    
+    def daily_totals(self):
+        """Return (date, type, category, amount, count) rows, reading every partition"""
+        groups = {}
+        for transaction in self.iter_transactions():
+            key = (transaction["date"], transaction["type"], transaction["category"])
+            amount, count = groups.get(key, (0, 0))
+            groups[key] = (amount + transaction["amount"], count + 1)
+        return [key + value for key, value in groups.items()]
+    
+    def aggregates(self):
+        """Return per-day balance rows and per-month totals rows, from the manifest"""
+        days = []
+        months = []
+        for summary in self.summaries.values():
+            for date, (income, expenses) in summary.days.items():
+                days.append((date, "income", income))
+                days.append((date, "expense", expenses))
+            months.extend(key + tuple(group) for key, group in summary.groups.items())
+        return days, months
+    
+    def report_chunks(self, directory, chunks, start_date="", end_date="9999-99-99"):
+        """Return the files of the partitions within the dates, once pending writes are on disk"""
+        self.flush()
+        with self.lock:
+            return [("json", self.partition_filename(key)) for key in self.partition_keys()
+                    if key == UNDATED or start_date[:7] <= key <= end_date[:7]]
+    
+    def count(self):
+        """Return the number of transactions"""
+        return sum(summary.count for summary in self.summaries.values())
+    
+    def iter_transactions(self, start_date=None, end_date=None):
+        """Yield transactions dated within [start_date, end_date], oldest first
+        
+        Partitions are read as the iteration reaches them.
+        """
+        for key in self.partition_keys():
+            if key != UNDATED and ((start_date is not None and key + "-99" < start_date)
+                                   or (end_date is not None and key + "-01" > end_date)):
+                continue
+            yield from self.open_partition(key).iter_transactions(start_date, end_date)
+    
+    def get_transactions(self, sort_by_date=True, offset=0, limit=None):
+        """Return a page of transactions, optionally sorted most recent first
+        
+        Whole partitions before the page are skipped using the manifest
+        counts, so only the partitions the page overlaps are read.
+        """
+        page = []
+        for key in self.partition_keys(newest_first=sort_by_date):
+            if limit is not None and len(page) >= limit:
+                break
+            
+            size = self.summaries[key].count
+            if offset >= size:
+                offset -= size
+                continue
+            
+            remaining = None if limit is None else limit - len(page)
+            page.extend(self.open_partition(key).get_transactions(sort_by_date, offset, remaining))
+            offset = 0
+        
+        return page
+
+
+class SQLiteStorage:
+    """Store the ledger in a SQLite database and answer queries in SQL
+    
+    Nothing beyond the rows a query returns is held in memory, and the
+    indexes on date, type and category keep lookups fast on large ledgers.
+    """
+    def __init__(self, filename="budget_data.db"):
+        self.filename = filename
+        self.base_filename = os.path.splitext(filename)[0]
+        # Opened by load(). Until then the ledger reads as empty, as the
+        # in-memory backends do, so a lazy tracker can draw its window first
+        self.connection = None
+    
+    # Bumped whenever load() has to migrate older databases
+    SCHEMA_VERSION = 1
+    
+    def load(self):
+        """Open the database, creating or migrating the schema if needed"""
+        self.connection = sqlite3.connect(self.filename)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+        """)
+        
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        exists = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions'").fetchone()
+        if exists and version < 1:
+            self.migrate_amounts()
+        
+        self.connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS transactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT NOT NULL,
+                type TEXT NOT NULL,
+                amount INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                description TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date);
+            CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions (type);
+            CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions (category);
+            PRAGMA user_version = {self.SCHEMA_VERSION};
+        """)
+    
+    def migrate_amounts(self):
+        """Convert a version 0 table of REAL major-unit amounts to INTEGER minor units
+        
+        A REAL column would turn the integers back into floats, so the table
+        is rebuilt rather than updated in place. The indexes go with the old
+        table and load() recreates them. Amounts go through to_minor(), so
+        they round exactly as a legacy JSON ledger does.
+        """
+        self.connection.execute("BEGIN")
+        with self.connection:
+            self.connection.execute("ALTER TABLE transactions RENAME TO transactions_v0")
+            self.connection.execute("""
+                CREATE TABLE transactions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    amount INTEGER NOT NULL,
+                    category TEXT NOT NULL,
+                    description TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            rows = self.connection.execute("SELECT * FROM transactions_v0")
+            self.connection.executemany(
+                "INSERT INTO transactions (id, date, type, amount, category, description) "
+                "VALUES (:id, :date, :type, :amount, :category, :description)",
+                (dict(row, amount=to_minor(row["amount"])) for row in rows)
+            )
+            self.connection.execute("DROP TABLE transactions_v0")
+    
+    def load_in_chunks(self, chunk_size=5000):
+        """Open the database; rows are read on demand, so there are no chunks"""
+        self.load()
+        return iter(())
+    
+    def save(self):
+        """Commit any pending changes"""
+        self.connection.commit()
+    
+    def flush(self, timeout=None):
+        """Every change is committed as it is made, so there is nothing to wait for"""
+        return True
+    
+    def close(self):
+        """Close the database connection"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+    
+    def import_transactions(self, transactions):
+        """Insert existing transactions, keeping their IDs, in one commit"""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO transactions (id, date, type, amount, category, description) "
+                "VALUES (:id, :date, :type, :amount, :category, :description)",
+                transactions
+            )
+    
+    def add(self, transaction):
+        """Insert a transaction, letting SQLite assign its ID"""
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO transactions (date, type, amount, category, description) "
+                "VALUES (:date, :type, :amount, :category, :description)",
+                transaction
+            )
+        transaction["id"] = cursor.lastrowid
+    
+    def add_many(self, transactions):
+        """Insert a batch of transactions in a single commit"""
+        with self.connection:
+            for transaction in transactions:
+                cursor = self.connection.execute(
+                    "INSERT INTO transactions (date, type, amount, category, description) "
+                    "VALUES (:date, :type, :amount, :category, :description)",
+                    transaction
+                )
+                transaction["id"] = cursor.lastrowid
+    
+    def get(self, transaction_id):
+        """Return a transaction by ID, or None if not found"""
+        if self.connection is None:
+            return None
+        row = self.connection.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,)).fetchone()
+        return dict(row) if row is not None else None
+    
+    def get_many(self, transaction_ids, batch_size=500):
+        """Return the transactions with the given IDs, skipping any not found"""
+        transaction_ids = list(transaction_ids)
+        transactions = []
+        if self.connection is None:
+            return transactions
+        
+        # Stay well under SQLite's limit on query parameters
+        for start in range(0, len(transaction_ids), batch_size):
+            batch = transaction_ids[start:start + batch_size]
+            rows = self.connection.execute(
+                f"SELECT * FROM transactions WHERE id IN ({', '.join('?' * len(batch))})", batch
+            )
+            transactions.extend(dict(row) for row in rows)
+        
+        return transactions
+    
+    def update(self, transaction):
+        """Replace the transaction with the same ID, returning the old one"""
+        old = self.get(transaction["id"])
+        if old is None:
+            return None
+        
+        with self.connection:
+            self.connection.execute(
+                "UPDATE transactions SET date = :date, type = :type, amount = :amount, "
+                "category = :category, description = :description WHERE id = :id",
+                transaction
+            )
+        return old
+    
+    def delete(self, transaction_id):
+        """Remove a transaction by ID, returning it, or None if not found"""
+        transaction = self.get(transaction_id)
+        if transaction is None:
+            return None
+        
+        with self.connection:
+            self.connection.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
+        return transaction
+    
+    def update_many(self, transactions):
+        """Replace a batch of transactions in a single commit, returning the old ones"""
+        old = self.get_many(transaction["id"] for transaction in transactions)
+        found = {transaction["id"] for transaction in old}
+        
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE transactions SET date = :date, type = :type, amount = :amount, "
+                "category = :category, description = :description WHERE id = :id",
+                [transaction for transaction in transactions if transaction["id"] in found]
+            )
+        return old
+    
+    def delete_many(self, transaction_ids):
+        """Remove a batch of transactions in a single commit, returning them"""
+        removed = self.get_many(transaction_ids)
+        
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM transactions WHERE id = ?",
+                [(transaction["id"],) for transaction in removed]
+            )
+        return removed
+    
+    def totals(self):
+        """Return (total income, total expenses) in minor units"""
+        if self.connection is None:
+            return 0, 0
+        income, expenses = self.connection.execute(
+            "SELECT COALESCE(SUM(CASE WHEN type = 'income' THEN amount END), 0), "
+            "COALESCE(SUM(CASE WHEN type != 'income' THEN amount END), 0) "
+            "FROM transactions"
+        ).fetchone()
+        return income, expenses
+    
+    def category_totals(self):
+        """Return total expenses in minor units keyed by category"""
+        if self.connection is None:
+            return {}
+        rows = self.connection.execute(
+            "SELECT category, SUM(amount) FROM transactions "
+            "WHERE type = 'expense' GROUP BY category"
+        )
+        return {category: amount for category, amount in rows}
+    
+    def daily_totals(self):
+        """Return (date, type, category, amount, count) rows for the ledger"""
+        if self.connection is None:
+            return []
+        return self.connection.execute(
+            "SELECT date, type, category, SUM(amount), COUNT(*) "
+            "FROM transactions GROUP BY date, type, category"
+        ).fetchall()
+    
+    def aggregates(self):
+        """Return per-day balance rows and per-month totals rows, as rollup() does"""
+        return rollup(self.daily_totals())
+    
+    def report_chunks(self, directory, chunks, start_date="", end_date="9999-99-99"):
+        """Split the table into ID ranges that workers query on their own connections"""
+        # Reports may run off the thread that owns self.connection
+        connection = sqlite3.connect(self.filename)
+        try:
+            low, high, rows = connection.execute("SELECT MIN(id), MAX(id), COUNT(*) FROM transactions").fetchone()
+        finally:
+            connection.close()
+        
+        if not rows:
+            return []
+        
+        chunks = max(1, min(chunks, rows // REPORT_MIN_CHUNK_ROWS))
+        size = -(-(high - low + 1) // chunks)
+        return [("sqlite", self.filename, first, first + size - 1) for first in range(low, high + 1, size)]
+    
+    def count(self):
+        """Return the number of transactions"""
+        if self.connection is None:
+            return 0
+        return self.connection.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    
+    def iter_transactions(self, start_date=None, end_date=None):
+        """Yield transactions dated within [start_date, end_date], oldest first"""
+        if self.connection is None:
+            return
+        rows = self.connection.execute(
+            "SELECT * FROM transactions WHERE (:start IS NULL OR date >= :start) "
+            "AND (:end IS NULL OR date <= :end) ORDER BY date, id",
+            {"start": start_date, "end": end_date}
+        )
+        for row in rows:
+            yield dict(row)
+    
+    def get_transactions(self, sort_by_date=True, offset=0, limit=None):
+        """Return a page of transactions, optionally sorted most recent first"""
+        if self.connection is None:
+            return []
+        query = "SELECT * FROM transactions"
+        if sort_by_date:
+            query += " ORDER BY date DESC, id DESC"
+        query += " LIMIT ? OFFSET ?"
+        
+        rows = self.connection.execute(query, (-1 if limit is None else limit, offset))
+        return [dict(row) for row in rows]
+
+
+def migrate_to_sqlite(json_filename="budget_data.json", db_filename="budget_data.db"):
+    """Copy a JSON (and journal) ledger into a SQLite database, keeping IDs"""
+    source = JournalStorage(json_filename)
+    source.load()
+    
+    target = SQLiteStorage(db_filename)
+    target.load()
+    target.import_transactions(source.get_transactions(sort_by_date=False))
+    return target
+
+
+def migrate_to_binary(json_filename="budget_data.json", binary_filename="budget_data.bin"):
+    """Copy a JSON (and journal) ledger into a binary snapshot, keeping IDs"""
+    source = JournalStorage(json_filename)
+    source.load()
+    write_binary_ledger(source.get_transactions(sort_by_date=False), binary_filename, next_id=source.next_id)
+
+
+def migrate_to_partitions(json_filename="budget_data.json", directory="budget_data"):
+    """Split a JSON (and journal) ledger into monthly partitions, keeping IDs"""
+    source = JournalStorage(json_filename)
+    source.load()
+    
+    target = PartitionedStorage(directory)
+    target.load()
+    target.import_transactions(source.get_transactions(sort_by_date=False), source.next_id)
+
+
+def create_storage(kind=None):
+    """Create the storage backend named by kind or $COINCOMPASS_STORAGE"""
+    kind = kind or os.environ.get("COINCOMPASS_STORAGE", "journal")
+    
+    if kind == "json":
+        return JsonStorage(background=True)
+    if kind == "journal":
+        return JournalStorage(background=True)
+    if kind == "columnar":
+        return ColumnarStorage(background=True)
+    if kind == "binary":
+        storage = BinaryStorage(background=True)
+        # Bring an existing JSON ledger across the first time the binary format is used
+        if not os.path.exists(storage.filename) and os.path.exists("budget_data.json"):
+            migrate_to_binary(binary_filename=storage.filename)
+        return storage
+    if kind == "partitioned":
+        storage = PartitionedStorage(background=True)
+        # Split an existing JSON ledger into partitions the first time
+        if not os.path.exists(storage.filename) and os.path.exists("budget_data.json"):
+            migrate_to_partitions(directory=storage.directory)
+        return storage
+    if kind == "sqlite":
+        storage = SQLiteStorage()
+        # Bring an existing JSON ledger across the first time SQLite is used
+        if not os.path.exists(storage.filename) and os.path.exists("budget_data.json"):
+            migrate_to_sqlite(db_filename=storage.filename).close()
+        return storage
+    
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def normalize_date(text, formats=("%Y-%m-%d", "%Y%m%d", "%m/%d/%Y", "%m/%d/%y", "%d.%m.%Y")):
+    """Convert a statement date to YYYY-MM-DD, or return None if it cannot be read"""
+    text = text.strip()
+    for date_format in formats:
+        try:
+            return datetime.datetime.strptime(text, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(text):
+    """Parse a statement amount such as "$1,234.50" or "(12.00)" into a Decimal"""
+    text = text.strip().replace(",", "").replace(CURRENCIES[CURRENCY][0].strip(), "")
+    negative = text.startswith("(") and text.endswith(")")
+    if negative:
+        text = text[1:-1]
+    
+    try:
+        amount = decimal.Decimal(text)
+    except decimal.InvalidOperation:
+        raise ValueError(f"Not a valid amount: {text!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"Not a valid amount: {text!r}")
+    return -amount if negative else amount
+
+
+def statement_row(date, amount, transaction_type=None, category=None, description=""):
+    """Build a transaction from raw statement fields
+    
+    Statements usually carry a signed amount instead of a type, so a
+    missing type is taken from the sign. Fields that cannot be parsed are
+    passed through unchanged for import_transactions to reject.
+    """
+    try:
+        amount = parse_amount(amount)
+        if not transaction_type:
+            transaction_type = "expense" if amount < 0 else "income"
+        amount = abs(amount)
+    except ValueError:
+        pass
+    
+    return {
+        "id": None,
+        "date": normalize_date(date) or date,
+        "type": (transaction_type or "").strip().lower(),
+        "amount": amount,
+        "category": category or "Imported",
+        "description": description or ""
+    }
+
+
+def parse_csv(file):
+    """Yield (line number, transaction) pairs from a CSV statement
+    
+    The header row must name date and amount columns; type, category and
+    description (or memo) columns are optional.
+    """
+    reader = csv.DictReader(file)
+    for row in reader:
+        fields = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+        yield reader.line_num, statement_row(
+            fields.get("date", ""),
+            fields.get("amount", ""),
+            fields.get("type"),
+            fields.get("category"),
+            fields.get("description") or fields.get("memo", "")
+        )
+
+
+def parse_ofx(file):
+    """Yield (line number, transaction) pairs from an OFX statement"""
+    fields = None
+    start = 0
+    
+    for line_number, line in enumerate(file, 1):
+        # OFX puts one <TAG>value per line and may omit closing tags
+        for tag, value in re.findall(r"<(/?\w+)>([^<]*)", line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                fields = {}
+                start = line_number
+            elif tag == "/STMTTRN" and fields is not None:
+                yield start, statement_row(
+                    fields.get("DTPOSTED", "")[:8],
+                    fields.get("TRNAMT", ""),
+                    description=fields.get("NAME") or fields.get("MEMO", "")
+                )
+                fields = None
+            elif fields is not None and value.strip():
+                fields[tag] = value.strip()
+
+
+def parse_qif(file):
+    """Yield (line number, transaction) pairs from a QIF statement"""
+    fields = {}
+    start = 1
+    
+    for line_number, line in enumerate(file, 1):
+        line = line.rstrip("\n")
+        if not line or line.startswith("!"):
+            continue
+        
+        code, value = line[0], line[1:].strip()
+        if code == "^":
+            if fields:
+                yield start, statement_row(
+                    fields.get("D", "").replace("'", "/"),
+                    fields.get("T", fields.get("U", "")),
+                    category=fields.get("L"),
+                    description=fields.get("P") or fields.get("M", "")
+                )
+            fields = {}
+        else:
+            # Blank lines and headers may come before a record's first field
+            if not fields:
+                start = line_number
+            fields[code] = value
+
+
+STATEMENT_PARSERS = {
+    ".csv": parse_csv,
+    ".ofx": parse_ofx,
+    ".qfx": parse_ofx,
+    ".qif": parse_qif,
+}
+
+
+def read_statement(filename):
+    """Yield (line number, transaction) pairs from a CSV, OFX or QIF file"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in STATEMENT_PARSERS:
+        raise ValueError(f"Unsupported statement format: {extension or filename}")
+    
+    with open(filename, 'r', newline='', encoding='utf-8-sig') as file:
+        yield from STATEMENT_PARSERS[extension](file)
+
+
+def filter_transactions(transactions, transaction_type=None, category=None):
+    """Yield only the transactions matching the given type and category"""
+    for transaction in transactions:
+        if transaction_type is not None and transaction["type"] != transaction_type:
+            continue
+        if category is not None and transaction["category"] != category:
+            continue
+        yield transaction
+
+
+def write_csv(rows, file, fieldnames, chunk_size=1000):
+    """Write dict rows to a CSV file in chunks, returning the row count"""
+    writer = csv.DictWriter(file, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    
+    rows = iter(rows)
+    count = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return count
+        writer.writerows(chunk)
+        count += len(chunk)
+
+
+def write_jsonl(rows, file, fieldnames, chunk_size=1000):
+    """Write dict rows as JSON Lines in chunks, returning the row count"""
+    rows = iter(rows)
+    count = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return count
+        # Decimal amounts go out as plain JSON numbers
+        file.write("".join(json.dumps({field: row[field] for field in fieldnames}, default=float) + "\n"
+                           for row in chunk))
+        count += len(chunk)
+
+
+EXPORT_WRITERS = {
+    ".csv": write_csv,
+    ".jsonl": write_jsonl,
+    ".json": write_jsonl,
+}
+
+
+def peak_memory_kb():
+    """Return the peak resident set size of this process in KB, if known"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def export_rows(rows, filename, fieldnames):
+    """Stream rows to a CSV or JSON Lines file chosen by extension
+    
+    Returns the row count, elapsed time, throughput and peak memory so
+    exports of growing ledgers can be compared.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in EXPORT_WRITERS:
+        raise ValueError(f"Unsupported export format: {extension or filename}")
+    
+    start = time.perf_counter()
+    with open(filename, 'w', newline='', encoding='utf-8') as file:
+        count = EXPORT_WRITERS[extension](rows, file, fieldnames)
+    seconds = time.perf_counter() - start
+    
+    return {
+        "rows": count,
+        "seconds": seconds,
+        "rows_per_second": count / seconds if seconds else None,
+        "peak_memory_kb": peak_memory_kb()
+    }
+
+
+class Totals:
+    """Running income, expense and per-category expense totals, in minor units"""
+    __slots__ = ("income", "expenses", "categories", "counts", "size")
+    
+    def __init__(self):
+        self.income = 0
+        self.expenses = 0
+        self.categories = {}
+        self.counts = {}
+        self.size = 0
+    
+    def add(self, transaction_type, category, amount, count=1):
+        """Count transactions in, or out when amount and count are negative"""
+        self.size += count
+        
+        if transaction_type == "income":
+            self.income += amount
+            return
+        
+        self.expenses += amount
+        if transaction_type != "expense":
+            return
+        
+        count = self.counts.get(category, 0) + count
+        
+        # Drop categories with no expenses left rather than showing $0.00
+        if count == 0:
+            del self.counts[category]
+            del self.categories[category]
+        else:
+            self.counts[category] = count
+            self.categories[category] = self.categories.get(category, 0) + amount
+    
+    def merge(self, other):
+        """Add another set of totals into this one"""
+        self.size += other.size
+        self.income += other.income
+        self.expenses += other.expenses
+        for category, amount in other.categories.items():
+            self.categories[category] = self.categories.get(category, 0) + amount
+            self.counts[category] = self.counts.get(category, 0) + other.counts[category]
+    
+    def summary(self):
+        """Return the totals as a balance and category summary dict"""
+        return {
+            "income": self.income,
+            "expenses": self.expenses,
+            "balance": self.income - self.expenses,
+            "categories": dict(self.categories)
+        }
+
+
+class FenwickTree:
+    """Prefix sums over a fixed number of slots, with O(log n) updates and queries"""
+    def __init__(self, values):
+        # Build in O(n) by pushing each node's sum up to its parent
+        self.tree = [0] + list(values)
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+    
+    def add(self, index, amount):
+        """Add amount to the slot at index"""
+        i = index + 1
+        while i < len(self.tree):
+            self.tree[i] += amount
+            i += i & -i
+    
+    def prefix_sum(self, index):
+        """Return the sum of slots 0 through index"""
+        total = 0
+        i = min(index + 1, len(self.tree) - 1)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class BalanceIndex:
+    """Cumulative income and expenses by day, for point-in-time balances
+    
+    Each day is a slot in a pair of Fenwick trees, so recording a
+    transaction and asking for the totals up to a date are both O(log n) in
+    the number of days covered. When a date falls outside the covered
+    range the trees are rebuilt with room to spare.
+    """
+    def __init__(self):
+        self.first = 0
+        self.size = 0
+        # Per-day [income, expenses], kept for rebuilding the trees
+        self.daily = {}
+        self.income = FenwickTree([])
+        self.expenses = FenwickTree([])
+    
+    def add(self, date, transaction_type, amount):
+        """Record amount of income or expense on date"""
+        try:
+            ordinal = datetime.date.fromisoformat(date).toordinal()
+        except ValueError:
+            return
+        
+        if not self.first <= ordinal < self.first + self.size:
+            self.grow(ordinal)
+        
+        day = self.daily.setdefault(ordinal, [0, 0])
+        if transaction_type == "income":
+            day[0] += amount
+            self.income.add(ordinal - self.first, amount)
+        else:  # expense
+            day[1] += amount
+            self.expenses.add(ordinal - self.first, amount)
+    
+    def add_many(self, rows):
+        """Record (date, type, amount) rows, building the trees once at the end"""
+        for date, transaction_type, amount in rows:
+            try:
+                ordinal = datetime.date.fromisoformat(date).toordinal()
+            except ValueError:
+                continue
+            
+            day = self.daily.setdefault(ordinal, [0, 0])
+            day[0 if transaction_type == "income" else 1] += amount
+        
+        if self.daily:
+            self.grow(min(self.daily))
+    
+    def grow(self, ordinal):
+        """Rebuild the trees to cover ordinal, with a year of slack each side"""
+        days = list(self.daily) + [ordinal]
+        self.first = min(days) - 366
+        self.size = max(days) + 366 - self.first
+        
+        income = [0] * self.size
+        expenses = [0] * self.size
+        for day, (day_income, day_expenses) in self.daily.items():
+            income[day - self.first] = day_income
+            expenses[day - self.first] = day_expenses
+        
+        self.income = FenwickTree(income)
+        self.expenses = FenwickTree(expenses)
+    
+    def totals_through(self, ordinal):
+        """Return (income, expenses) for every day up to and including ordinal"""
+        index = ordinal - self.first
+        if index < 0 or self.size == 0:
+            return 0, 0
+        return self.income.prefix_sum(index), self.expenses.prefix_sum(index)
+
+
+def today():
+    """Return today's date as YYYY-MM-DD"""
+    return datetime.date.today().isoformat()
+
+
+def period_bounds(start=None, end=None):
+    """Turn YYYY, YYYY-MM or YYYY-MM-DD bounds into inclusive date strings
+    
+    A bare year or month works as a start bound as it is, since it sorts
+    before every date inside it, and as an end bound once padded with -99.
+    """
+    start_date = start or ""
+    end_date = end or "9999"
+    end_date += "-99" * (2 - end_date.count("-"))
+    return start_date, end_date
+
+
+PERIOD_FORMATS = {4: "%Y", 7: "%Y-%m", 10: "%Y-%m-%d"}
+
+
+def check_period(start=None, end=None):
+    """Raise ValueError unless each given bound is a valid YYYY, YYYY-MM or YYYY-MM-DD date
+    
+    period_bounds() compares bounds as strings, so a junk end bound such as
+    "junk" sorts after every date and would expand recurring rules out to
+    year 9999.
+    """
+    for name, bound in (("Start", start), ("End", end)):
+        if not bound:
+            continue
+        try:
+            datetime.datetime.strptime(bound, PERIOD_FORMATS[len(bound)])
+        except (KeyError, ValueError):
+            raise ValueError(f"{name} date must be a valid YYYY, YYYY-MM or YYYY-MM-DD date, not {bound!r}") from None
+
+
+# Fewer rows than this are not worth a worker process
+REPORT_MIN_CHUNK_ROWS = 100_000
+
+
+def aggregate_chunk(source, start_date, end_date):
+    """Total one report source by (month, type, category), usually in a worker process
+    
+    Returns (month, type, category, amount, count) rows, so only totals
+    travel back to the parent, never transactions.
+    """
+    kind = source[0]
+    if kind == "rows":
+        rows = source[1]
+    elif kind == "binary":
+        table, _ = read_binary_snapshot(source[1])
+        rows = table.daily_totals()
+    elif kind == "json":
+        transactions, _ = JsonStorage(source[1]).read_snapshot()
+        rows = [(t["date"], t["type"], t["category"], t["amount"], 1) for t in transactions]
+    elif kind == "sqlite":
+        connection = sqlite3.connect(source[1])
+        try:
+            rows = connection.execute(
+                "SELECT date, type, category, SUM(amount), COUNT(*) FROM transactions "
+                "WHERE id BETWEEN ? AND ? GROUP BY date, type, category",
+                source[2:]
+            ).fetchall()
+        finally:
+            connection.close()
+    else:
+        raise ValueError(f"Unknown report source: {kind}")
+    
+    _, months = rollup([row for row in rows if start_date <= row[0] <= end_date])
+    return months
+
+
+def init_report_worker():
+    """Turn off the profiling a worker process picks up from $COINCOMPASS_PROFILE
+    
+    Each worker imports this module afresh, and its dump at exit would
+    overwrite the stats and cProfile files of the process it reports to.
+    """
+    instruments.disable()
+
+
+def build_report(storage, start_date="", end_date="9999-99-99", workers=None, progress=None, extra=()):
+    """Total every transaction in [start_date, end_date] by month, type and category
+    
+    The storage splits itself into file-backed sources (report_chunks())
+    which a pool of worker processes totals in parallel, and the partial
+    totals are merged here, along with any extra (month, type, category,
+    amount, count) rows. progress(done, total) is called as each source
+    finishes. Returns the overall and per-month summaries, totals by type,
+    and how the work was split.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    
+    with tempfile.TemporaryDirectory(prefix="coincompass-report-") as directory:
+        # A few sources per worker evens out chunks that finish early
+        sources = storage.report_chunks(directory, workers * 4 if workers > 1 else 1, start_date, end_date)
+        local = [source for source in sources if source[0] == "rows"]
+        remote = [source for source in sources if source[0] != "rows"]
+        if workers <= 1 or len(remote) <= 1:
+            local, remote = sources, []
+        
+        done = 0
+        partials = []
+        for source in local:
+            partials.append(aggregate_chunk(source, start_date, end_date))
+            done += 1
+            if progress is not None:
+                progress(done, len(sources))
+        
+        if remote:
+            workers = min(workers, len(remote))
+            # Spawned workers inherit no locks held by the writer or Tk threads
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(workers, mp_context=context, initializer=init_report_worker) as pool:
+                futures = [pool.submit(aggregate_chunk, source, start_date, end_date) for source in remote]
+                for future in as_completed(futures):
+                    partials.append(future.result())
+                    done += 1
+                    if progress is not None:
+                        progress(done, len(sources))
+        else:
+            workers = 1
+    
+    overall = Totals()
+    months = {}
+    types = {}
+    for partial in partials + [extra]:
+        for month, transaction_type, category, amount, count in partial:
+            overall.add(transaction_type, category, amount, count)
+            if month not in months:
+                months[month] = Totals()
+            months[month].add(transaction_type, category, amount, count)
+            
+            total = types.setdefault(transaction_type, {"amount": 0, "count": 0})
+            total["amount"] += amount
+            total["count"] += count
+    
+    return dict(
+        overall.summary(),
+        months={month: months[month].summary() for month in sorted(months)},
+        types=types,
+        rows=overall.size,
+        sources=len(sources),
+        workers=workers,
+        seconds=time.perf_counter() - started
+    )
+
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Split text into the lowercase words the search index uses"""
+    return set(WORD_PATTERN.findall(text.lower()))
+
+
+class SearchIndex:
+    """Inverted index from the words of each description and category to IDs
+    
+    The last word of a query matches as a prefix unless the query ends in
+    a space, so results can follow the user's typing.
+    """
+    def __init__(self):
+        self.postings = {}
+        # Every indexed word in sorted order, for prefix lookups
+        self.words = []
+    
+    def transaction_words(self, transaction):
+        return tokenize(transaction["description"]) | tokenize(transaction["category"])
+    
+    def add_many(self, transactions):
+        """Index a batch of transactions, sorting the word list once"""
+        for transaction in transactions:
+            for word in self.transaction_words(transaction):
+                self.postings.setdefault(word, set()).add(transaction["id"])
+        self.words = sorted(self.postings)
+    
+    def add(self, transaction):
+        """Index one transaction"""
+        for word in self.transaction_words(transaction):
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = set()
+                bisect.insort(self.words, word)
+            ids.add(transaction["id"])
+    
+    def remove(self, transaction):
+        """Drop one transaction from the index"""
+        for word in self.transaction_words(transaction):
+            ids = self.postings.get(word)
+            if ids is None:
+                continue
+            
+            ids.discard(transaction["id"])
+            if not ids:
+                del self.postings[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+    
+    def update(self, added=(), removed=(), updated=()):
+        """Apply a change in the form observers are told about"""
+        for transaction in removed:
+            self.remove(transaction)
+        for old, new in updated:
+            self.remove(old)
+            self.add(new)
+        for transaction in added:
+            self.add(transaction)
+    
+    def lookup(self, query):
+        """Return the IDs matching every word of query, or None if it has no words"""
+        words = WORD_PATTERN.findall(query.lower())
+        if not words:
+            return None
+        
+        matches = []
+        if not query[-1].isspace():
+            prefix = words.pop()
+            start = bisect.bisect_left(self.words, prefix)
+            end = bisect.bisect_left(self.words, prefix + "\uffff")
+            matches.append(set().union(*(self.postings[word] for word in self.words[start:end])))
+        
+        matches.extend(self.postings.get(word, set()) for word in words)
+        
+        # Intersect smallest first so each step scans as little as possible
+        matches.sort(key=len)
+        result = set(matches[0])
+        for ids in matches[1:]:
+            result &= ids
+        return result
+
+
+RECURRENCE_FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+
+
+def recurrence_date(first, frequency, n):
+    """Return the date n days, weeks, months or years after first
+    
+    Monthly and yearly dates keep first's day of the month, moved back to
+    the last day of shorter months.
+    """
+    if frequency == "daily":
+        return first + datetime.timedelta(days=n)
+    if frequency == "weekly":
+        return first + datetime.timedelta(weeks=n)
+    
+    index = first.month - 1 + (n * 12 if frequency == "yearly" else n)
+    year, month = first.year + index // 12, index % 12 + 1
+    return datetime.date(year, month, min(first.day, calendar.monthrange(year, month)[1]))
+
+
+def recurrence_steps(first, frequency, target):
+    """Return roughly how many periods lie between first and target, never too many"""
+    if frequency in ("daily", "weekly"):
+        return (target - first).days // (7 if frequency == "weekly" else 1)
+    
+    months = (target.year - first.year) * 12 + target.month - first.month - 1
+    return months // 12 if frequency == "yearly" else months
+
+
+def rule_occurrences(rule, start_date="", end_date="9999-99-99"):
+    """Yield a rule's occurrences dated within [start_date, end_date], in date order
+    
+    Dates are generated from the window's start, so a window costs only
+    the occurrences inside it. Skipped dates are left out and overridden
+    ones carry their changed fields.
+    """
+    first = datetime.date.fromisoformat(rule["start"])
+    last = min(rule["until"] or end_date, end_date)
+    interval = rule["interval"]
+    exceptions = rule["exceptions"]
+    
+    n = 0
+    if start_date > rule["start"]:
+        try:
+            target = datetime.date(int(start_date[:4]), int(start_date[5:7] or 1), int(start_date[8:10] or 1))
+            n = max(recurrence_steps(first, rule["frequency"], target) // interval, 0)
+        except ValueError:  # Not a date; walk from the rule's start
+            pass
+    
+    while True:
+        try:
+            date = recurrence_date(first, rule["frequency"], n * interval).isoformat()
+        except (ValueError, OverflowError):  # Past year 9999
+            return
+        if date > last:
+            return
+        n += 1
+        
+        if date < start_date:
+            continue
+        if date in exceptions and exceptions[date] is None:
+            continue
+        
+        occurrence = {
+            "id": None,
+            "rule_id": rule["id"],
+            "date": date,
+            "type": rule["type"],
+            "amount": rule["amount"],
+            "category": rule["category"],
+            "description": rule["description"]
+        }
+        occurrence.update(exceptions.get(date) or {})
+        yield occurrence
+
+
+class RecurringRules:
+    """Recurrence rules kept in a JSON file beside the ledger
+    
+    Occurrences are never stored; they are generated for whatever dates
+    are asked about. exceptions maps an occurrence date to None when it
+    is skipped (or was recorded as a real transaction), or to the fields
+    that override it.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.rules = {}
+        self.next_id = 1
+        # Cumulative totals of every occurrence up to horizon, for balances
+        self.horizon = ""
+        self.schedule = ([], [], [])
+        # Totals and months by window, as the tabs ask for the same ones on every refresh
+        self.cache = {}
+    
+    def load(self):
+        """Read the rules file, if there is one"""
+        self.rules = {}
+        self.next_id = 1
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r') as file:
+                data = json.load(file)
+            self.next_id = data["next_id"]
+            self.rules = {rule["id"]: rule for rule in data["rules"]}
+        self.changed()
+    
+    def save(self):
+        """Atomically replace the rules file"""
+        data = {"currency": CURRENCY, "next_id": self.next_id, "rules": list(self.rules.values())}
+        temp_filename = self.filename + ".tmp"
+        with open(temp_filename, 'w') as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, self.filename)
+    
+    def changed(self):
+        """Forget the cached schedule after a rule changes"""
+        self.horizon = ""
+        self.schedule = ([], [], [])
+        self.cache = {}
+    
+    def add(self, rule):
+        """Assign an ID to a rule, store it and save"""
+        rule["id"] = self.next_id
+        self.next_id += 1
+        self.rules[rule["id"]] = rule
+        self.changed()
+        self.save()
+    
+    def delete(self, rule_id):
+        """Remove a rule by ID and save, returning it, or None if not found"""
+        rule = self.rules.pop(rule_id, None)
+        if rule is not None:
+            self.changed()
+            self.save()
+        return rule
+    
+    def set_exception(self, rule_id, date, change):
+        """Skip (change=None) or override one occurrence of a rule and save"""
+        self.rules[rule_id]["exceptions"][date] = change
+        self.changed()
+        self.save()
+    
+    def occurrences(self, start_date="", end_date="9999-99-99"):
+        """Yield every rule's occurrences dated within [start_date, end_date], in date order"""
+        return heapq.merge(*(rule_occurrences(rule, start_date, end_date) for rule in self.rules.values()),
+                           key=lambda occurrence: occurrence["date"])
+    
+    def cached(self, key, compute):
+        """Return compute() for key, remembering a few dozen results until a rule changes"""
+        if key not in self.cache:
+            if len(self.cache) >= 64:
+                self.cache.clear()
+            self.cache[key] = compute()
+        return self.cache[key]
+    
+    def totals(self, start_date="", end_date="9999-99-99"):
+        """Return the Totals of the occurrences dated within [start_date, end_date]
+        
+        The result is shared between callers, so merge it rather than change it.
+        """
+        def compute():
+            totals = Totals()
+            for occurrence in self.occurrences(start_date, end_date):
+                totals.add(occurrence["type"], occurrence["category"], occurrence["amount"])
+            return totals
+        
+        return self.cached(("totals", start_date, end_date), compute)
+    
+    def months(self, end_date):
+        """Return the set of YYYY-MM months with occurrences up to end_date"""
+        return self.cached(("months", end_date), lambda: {o["date"][:7] for o in self.occurrences("", end_date)})
+    
+    def totals_through(self, date):
+        """Return (income, expenses) of every occurrence up to and including date"""
+        if not self.rules:
+            return 0, 0
+        
+        # Build the running sums a year at a time past the furthest date asked for
+        if date > self.horizon:
+            self.horizon = date[:4] + "-12-31"
+            dates, income, expenses = [], [0], [0]
+            for occurrence in self.occurrences("", self.horizon):
+                dates.append(occurrence["date"])
+                is_income = occurrence["type"] == "income"
+                income.append(income[-1] + (occurrence["amount"] if is_income else 0))
+                expenses.append(expenses[-1] + (0 if is_income else occurrence["amount"]))
+            self.schedule = (dates, income, expenses)
+        
+        dates, income, expenses = self.schedule
+        i = bisect.bisect_right(dates, date)
+        return income[i], expenses[i]
+
+
+LOADING_MESSAGE = "The ledger is still loading, please try again in a moment."
+
+
+class BudgetTracker:
+    def __init__(self, storage=None, debug=None, lazy=False):
+        self.storage = storage if storage is not None else JsonStorage()
+        
+        # Debug mode checks the running totals after every change
+        if debug is None:
+            debug = bool(os.environ.get("COINCOMPASS_DEBUG"))
+        self.debug = debug
+        
+        # All-time totals, plus a rollup per YYYY-MM month for period reports
+        # and cumulative sums by day for point-in-time balances
+        self.totals = Totals()
+        self.months = {}
+        self.balances = BalanceIndex()
+        self.observers = []
+        
+        # Word index over descriptions and categories, built on first search
+        self.search_index = None
+        
+        # Totals and recent rows saved at the last clean shutdown, shown
+        # while a lazy load is still reading the ledger
+        self.summary_filename = self.storage.base_filename + ".summary.json"
+        self.cached = None
+        self.loading = False
+        self.load_error = None
+        
+        # Rent, salary and the like, expanded into occurrences only when asked
+        self.recurring = RecurringRules(self.storage.base_filename + ".recurring.json")
+        try:
+            self.recurring.load()
+        except (OSError, ValueError, KeyError) as e:
+            self.load_error = f"Error reading recurring transactions ({e}). Starting without them."
+        
+        # A lazy tracker starts empty; the caller drives load_steps()
+        if lazy:
+            self.restore_summary()
+        else:
+            self.load_data()
+    
+    @instruments.timed("tracker.load_data")
+    def load_data(self):
+        """Load transaction data from storage"""
+        for _ in self.load_steps():
+            pass
+    
+    def load_steps(self, chunk_size=5000):
+        """Load transaction data a chunk at a time, yielding the count loaded so far
+        
+        Observers hear about each chunk as it is added, but the totals are
+        only computed once the whole ledger is in. Changes are refused until
+        loading finishes.
+        """
+        self.loading = True
+        loaded = 0
+        
+        try:
+            for chunk in self.storage.load_in_chunks(chunk_size):
+                loaded += len(chunk)
+                self.notify(added=chunk)
+                yield loaded
+        except Exception as e:
+            # Start with what could be read rather than refusing to run;
+            # callers decide how to report the problem
+            self.load_error = f"Error reading data file ({e}). Starting with empty transactions."
+        finally:
+            self.loading = False
+            self.cached = None
+            # The journal replay is not announced, so rebuild on next search
+            self.search_index = None
+        
+        try:
+            self.rebuild_totals()
+        except Exception as e:
+            # A ledger written before totals were bounded can overflow a SQL SUM
+            self.load_error = f"Error totalling data ({e}). Balances and reports may be incomplete."
+    
+    def restore_summary(self):
+        """Read the summary saved at the last clean shutdown, if there is one
+        
+        The file is removed once read, so a crash can never leave a stale
+        summary behind for the next start.
+        """
+        try:
+            with open(self.summary_filename, 'r') as file:
+                self.cached = json.load(file)
+            os.remove(self.summary_filename)
+        except (OSError, ValueError):
+            self.cached = None
+        
+        # Summaries from before integer amounts, or in another currency
+        if self.cached is not None and self.cached.get("currency") != CURRENCY:
+            self.cached = None
+    
+    def save_summary(self):
+        """Save the totals and recent rows for the next start to show at once"""
+        if self.loading:
+            return
+        
+        data = dict(self.totals.summary(), currency=CURRENCY, recent=[dict(t) for t in self.get_recent(5)])
+        temp_filename = self.summary_filename + ".tmp"
+        with open(temp_filename, 'w') as file:
+            json.dump(data, file)
+        os.replace(temp_filename, self.summary_filename)
+    
+    @instruments.timed("tracker.aggregate")
+    def rebuild_totals(self):
+        """Recompute the running, monthly and daily totals from the full ledger"""
+        self.totals = Totals()
+        self.months = {}
+        self.balances = BalanceIndex()
+        
+        # The days come rolled up into months, so the Totals see far fewer rows
+        days, months = self.storage.aggregates()
+        self.balances.add_many(days)
+        
+        for month, transaction_type, category, amount, count in months:
+            self.totals.add(transaction_type, category, amount, count)
+            if month not in self.months:
+                self.months[month] = Totals()
+            self.months[month].add(transaction_type, category, amount, count)
+    
+    def check_room(self, added=(), removed=()):
+        """Return an error message if a change would take total income or
+        expenses past MAX_AMOUNT, or None
+        
+        Backends total amounts as int64 (SQL SUM, NumPy), so bounding each
+        amount is not enough; the totals every other sum is part of are
+        bounded too.
+        """
+        income, expenses = self.totals.income, self.totals.expenses
+        for sign, transactions in ((1, added), (-1, removed)):
+            for t in transactions:
+                if t["type"] == "income":
+                    income += sign * t["amount"]
+                else:
+                    expenses += sign * t["amount"]
+        
+        if income > MAX_AMOUNT:
+            return f"Total income cannot exceed {format_money(MAX_AMOUNT)}"
+        if expenses > MAX_AMOUNT:
+            return f"Total expenses cannot exceed {format_money(MAX_AMOUNT)}"
+        return None
+    
+    def update_totals(self, transaction, sign):
+        """Add (sign=1) or remove (sign=-1) a transaction from the running totals"""
+        transaction_type = transaction["type"]
+        category = transaction["category"]
+        amount = sign * transaction["amount"]
+        
+        self.totals.add(transaction_type, category, amount, sign)
+        self.balances.add(transaction["date"], transaction_type, amount)
+        
+        month = transaction["date"][:7]
+        if month not in self.months:
+            self.months[month] = Totals()
+        self.months[month].add(transaction_type, category, amount, sign)
+        if self.months[month].size == 0:
+            del self.months[month]
+    
+    def check_totals(self):
+        """Compare the running totals against a full recompute of the ledger"""
+        income, expenses = self.storage.totals()
+        categories = self.storage.category_totals()
+        
+        # Integer minor units add up exactly, so the totals must match to the cent
+        consistent = (
+            income == self.totals.income
+            and expenses == self.totals.expenses
+            and categories == self.totals.categories
+            and sum(totals.size for totals in self.months.values()) == self.storage.count()
+        )
+        
+        if not consistent:
+            raise RuntimeError("Running totals do not match the ledger")
+    
+    @instruments.timed("tracker.save_data")
+    def save_data(self):
+        """Save the full transaction data to storage"""
+        self.storage.save()
+    
+    def flush(self, timeout=None):
+        """Wait until every change so far is durable on disk"""
+        return self.storage.flush(timeout)
+    
+    def close(self):
+        """Flush outstanding changes and release the storage"""
+        # The summary is only a startup cache; the queued writes still go out
+        try:
+            self.save_summary()
+        finally:
+            self.storage.close()
+    
+    def subscribe(self, callback):
+        """Call callback(added, removed, updated) whenever the ledger changes
+        
+        added and removed are lists of transactions, updated is a list of
+        (old, new) transaction pairs.
+        """
+        self.observers.append(callback)
+    
+    def unsubscribe(self, callback):
+        """Stop sending change notifications to callback"""
+        self.observers.remove(callback)
+    
+    def notify(self, added=(), removed=(), updated=()):
+        """Tell every subscriber about a change to the ledger"""
+        # Every change comes through here, so this keeps the index current
+        if self.search_index is not None:
+            self.search_index.update(added, removed, updated)
+        
+        for callback in list(self.observers):
+            callback(list(added), list(removed), list(updated))
+    
+    def validate_transaction(self, amount, category, date=None):
+        """Check an amount, category and date, returning (amount in minor units, error message)
+        
+        amount is in major units, e.g. "12.50" or Decimal("12.50") for $12.50.
+        """
+        # Validate amount
+        try:
+            amount = to_minor(amount)
+            if amount <= 0:
+                return None, "Amount must be greater than zero"
+            if amount > MAX_AMOUNT:
+                return None, f"Amount must be at most {format_money(MAX_AMOUNT)}"
+        except ValueError:
+            return None, "Amount must be a valid number"
+        
+        # Validate category
+        if not category or category.strip() == "":
+            return None, "Category cannot be empty"
+        
+        # Validate date
+        if date is not None and normalize_date(date, ("%Y-%m-%d",)) is None:
+            return None, "Date must be a valid YYYY-MM-DD date"
+        
+        return amount, None
+    
+    @instruments.timed("tracker.add_transaction")
+    def add_transaction(self, amount, category, description, transaction_type, date=None):
+        """Add a new transaction to the tracker, with amount in major units"""
+        if self.loading:
+            return False, LOADING_MESSAGE
+        
+        if date is None:
+            date = datetime.datetime.now().strftime("%Y-%m-%d")
+        
+        amount, error = self.validate_transaction(amount, category, date)
+        if error:
+            return False, error
+        
+        transaction = {
+            "id": None,
+            "date": date,
+            "type": transaction_type,
+            "amount": amount,
+            "category": category,
+            "description": description
+        }
+        
+        error = self.check_room(added=[transaction])
+        if error:
+            return False, error
+        
+        self.storage.add(transaction)
+        self.update_totals(transaction, 1)
+        
+        if self.debug:
+            self.check_totals()
+        
+        self.notify(added=[transaction])
+        return True, f"{transaction_type.capitalize()} of {format_money(amount)} added successfully!"
+    
+    @instruments.timed("tracker.import_transactions", rows=lambda result: result["added"])
+    def import_transactions(self, rows, batch_size=1000):
+        """Validate and add parsed statement rows with a single persist
+        
+        rows is an iterable of (line number, transaction) pairs, as yielded
+        by read_statement. Rows are validated with the add_transaction rules
+        and checked for duplicates a batch at a time; a row matching an
+        existing transaction on date, type, amount and description is
+        skipped. Returns a summary with the added and duplicate counts and
+        the rejected (line number, reason) pairs. Raises ValueError, adding
+        nothing, if the new rows would take a total past MAX_AMOUNT.
+        """
+        if self.loading:
+            raise ValueError(LOADING_MESSAGE)
+        
+        rows = iter(rows)
+        new_transactions = []
+        rejected = []
+        duplicates = 0
+        matched_ids = set()
+        
+        def key(t):
+            return t["date"], t["type"], t["amount"], t["description"]
+        
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            
+            valid = []
+            for line_number, transaction in batch:
+                amount, error = self.validate_transaction(
+                    transaction["amount"], transaction["category"], transaction["date"])
+                if error is None and transaction["type"] not in ("income", "expense"):
+                    error = "Type must be income or expense"
+                
+                if error:
+                    rejected.append((line_number, error))
+                else:
+                    transaction["amount"] = amount
+                    valid.append(transaction)
+            
+            if not valid:
+                continue
+            
+            # Index the existing transactions in this batch's date range, so
+            # each one can absorb at most one incoming duplicate
+            existing = {}
+            start_date = min(t["date"] for t in valid)
+            end_date = max(t["date"] for t in valid)
+            for t in self.storage.iter_transactions(start_date, end_date):
+                if t["id"] not in matched_ids:
+                    existing.setdefault(key(t), []).append(t["id"])
+            
+            for transaction in valid:
+                ids = existing.get(key(transaction))
+                if ids:
+                    matched_ids.add(ids.pop())
+                    duplicates += 1
+                else:
+                    new_transactions.append(transaction)
+        
+        error = self.check_room(added=new_transactions)
+        if error:
+            raise ValueError(error)
+        
+        if new_transactions:
+            self.storage.add_many(new_transactions)
+            for transaction in new_transactions:
+                self.update_totals(transaction, 1)
+            
+            if self.debug:
+                self.check_totals()
+            
+            self.notify(added=new_transactions)
+        
+        return {
+            "added": len(new_transactions),
+            "duplicates": duplicates,
+            "rejected": rejected
+        }
+    
+    def import_file(self, filename):
+        """Import a CSV, OFX or QIF bank statement"""
+        return self.import_transactions(read_statement(filename))
+    
+    @instruments.timed("tracker.export_transactions", rows=lambda result: result["rows"])
+    def export_transactions(self, filename, start_date=None, end_date=None,
+                            transaction_type=None, category=None):
+        """Stream matching transactions, oldest first, to a CSV or JSON Lines file
+        
+        Amounts are written in major units, e.g. 12.50.
+        """
+        transactions = filter_transactions(
+            self.storage.iter_transactions(start_date, end_date),
+            transaction_type,
+            category
+        )
+        rows = (dict(t, amount=from_minor(t["amount"])) for t in transactions)
+        return export_rows(rows, filename, TRANSACTION_FIELDS)
+    
+    @instruments.timed("tracker.archive", rows=lambda result: result["rows"])
+    def archive(self, filename, compress=True):
+        """Write the whole ledger to a binary snapshot, zlib-compressed by default
+        
+        Copying the archive to budget_data.bin restores it with the binary
+        backend.
+        """
+        start = time.perf_counter()
+        rows = write_binary_ledger(self.storage.iter_transactions(), filename, compress,
+                                   getattr(self.storage, "next_id", None))
+        return {
+            "rows": rows,
+            "bytes": os.path.getsize(filename),
+            "seconds": time.perf_counter() - start
+        }
+    
+    def export_category_summary(self, filename):
+        """Write the expense-by-category report to a CSV or JSON Lines file"""
+        rows = ({"category": category, "amount": from_minor(amount)}
+                for category, amount in sorted(self.totals.categories.items()))
+        return export_rows(rows, filename, ("category", "amount"))
+    
+    @instruments.timed("tracker.get_balance")
+    def get_balance(self):
+        """Get current balance, total income, and total expenses in minor units
+        
+        Recurring occurrences up to today count as if they were recorded.
+        """
+        if self.cached is not None:
+            income, expenses = self.cached["income"], self.cached["expenses"]
+        else:
+            income, expenses = self.totals.income, self.totals.expenses
+        
+        recurring_income, recurring_expenses = self.recurring.totals_through(today())
+        income += recurring_income
+        expenses += recurring_expenses
+        return {
+            "income": income,
+            "expenses": expenses,
+            "balance": income - expenses
+        }
+    
+    @instruments.timed("tracker.get_transactions", rows=len)
+    def get_transactions(self, sort_by_date=True, offset=0, limit=None):
+        """Get transactions, optionally sorted by date and limited to a page"""
+        return self.storage.get_transactions(sort_by_date, offset, limit)
+    
+    def count_transactions(self):
+        """Get the total number of transactions"""
+        return self.storage.count()
+    
+    def get_recent(self, n=5):
+        """Get the n most recent transactions"""
+        if self.cached is not None:
+            return self.cached["recent"][:n]
+        return self.storage.get_transactions(sort_by_date=True, limit=n)
+    
+    @instruments.timed("tracker.get_category_summary")
+    def get_category_summary(self):
+        """Get summary of expenses in minor units by category, with recurring ones up to today"""
+        if self.cached is not None:
+            categories = dict(self.cached["categories"])
+        else:
+            categories = dict(self.totals.categories)
+        
+        if self.recurring.rules:
+            for category, amount in self.recurring.totals("", today()).categories.items():
+                categories[category] = categories.get(category, 0) + amount
+        return categories
+    
+    def balance_as_of(self, date):
+        """Get income, expenses and balance up to and including a date
+        
+        A future date gives a projection from the recurring transactions.
+        """
+        income, expenses = self.balances.totals_through(datetime.date.fromisoformat(date).toordinal())
+        recurring_income, recurring_expenses = self.recurring.totals_through(date)
+        income += recurring_income
+        expenses += recurring_expenses
+        return {
+            "income": income,
+            "expenses": expenses,
+            "balance": income - expenses
+        }
+    
+    def balance_series(self, start, end, step=1):
+        """Get (date, balance) pairs from start to end, every step days"""
+        if step < 1:
+            raise ValueError(f"step must be at least 1 day, not {step}")
+        
+        day = datetime.date.fromisoformat(start)
+        last = datetime.date.fromisoformat(end)
+        series = []
+        
+        while day <= last:
+            income, expenses = self.balances.totals_through(day.toordinal())
+            recurring_income, recurring_expenses = self.recurring.totals_through(day.isoformat())
+            series.append((day.isoformat(), income + recurring_income - expenses - recurring_expenses))
+            day += datetime.timedelta(days=step)
+        
+        return series
+    
+    @instruments.timed("tracker.get_running_balances", rows=len)
+    def get_running_balances(self, transactions):
+        """Get the balance just after each of the given transactions
+        
+        Transactions on the same day are applied in ID order. Each distinct
+        date costs one prefix-sum lookup plus a pass over that day's rows.
+        """
+        balances = {}
+        
+        for date in {t["date"] for t in transactions}:
+            try:
+                ordinal = datetime.date.fromisoformat(date).toordinal()
+            except ValueError:
+                continue
+            
+            income, expenses = self.balances.totals_through(ordinal - 1)
+            # A day's recurring occurrences count before its recorded rows
+            recurring_income, recurring_expenses = self.recurring.totals_through(date)
+            balance = income + recurring_income - expenses - recurring_expenses
+            for t in self.storage.iter_transactions(date, date):
+                balance += t["amount"] if t["type"] == "income" else -t["amount"]
+                balances[t["id"]] = balance
+        
+        return [balances.get(t["id"]) for t in transactions]
+    
+    def get_periods(self):
+        """Get the YYYY-MM months that have transactions, oldest first
+        
+        Months with recurring occurrences count up to the current month.
+        """
+        return sorted(self.recurring.months(today()).union(self.months))
+    
+    def get_search_index(self):
+        """Get the search index, building it from the ledger the first time"""
+        if self.search_index is None:
+            self.search_index = SearchIndex()
+            self.search_index.add_many(self.storage.iter_transactions())
+        return self.search_index
+    
+    @instruments.timed("tracker.search", rows=len)
+    def search(self, text="", category=None, transaction_type=None, min_amount=None, max_amount=None,
+               start=None, end=None):
+        """Get the transactions matching every given filter, newest first
+        
+        text matches words of the description or category, the last one as
+        a prefix. category and transaction_type must match exactly, the
+        amounts are inclusive and in minor units, and start and end may be
+        YYYY, YYYY-MM or YYYY-MM-DD. Text and category go through the word
+        index; with only the other filters, the date range is scanned.
+        """
+        start_date, end_date = period_bounds(start, end)
+        
+        ids = None
+        if text.strip() or category:
+            index = self.get_search_index()
+            # Category words must match whole, hence the trailing space
+            for query in (text, (category or "") + " "):
+                matches = index.lookup(query)
+                if matches is not None:
+                    ids = matches if ids is None else ids & matches
+        
+        if ids is None:
+            candidates = self.storage.iter_transactions(start_date, end_date)
+        else:
+            candidates = self.storage.get_many(ids)
+        
+        results = [
+            t for t in candidates
+            if start_date <= t["date"] <= end_date
+            and (category is None or t["category"] == category)
+            and (transaction_type is None or t["type"] == transaction_type)
+            and (min_amount is None or t["amount"] >= min_amount)
+            and (max_amount is None or t["amount"] <= max_amount)
+        ]
+        results.sort(key=lambda t: (t["date"], t["id"]), reverse=True)
+        return results
+    
+    @instruments.timed("tracker.get_period_summary")
+    def get_period_summary(self, start=None, end=None):
+        """Get income, expenses, balance and expense categories for a period
+        
+        start and end are inclusive and may be YYYY, YYYY-MM or YYYY-MM-DD.
+        Months that lie wholly inside the period come from the monthly
+        rollups; only the days of partly covered months are scanned.
+        Recurring occurrences in the period are included, future ones too,
+        but an open-ended period stops them at today. Raises ValueError
+        for a bound that is not a valid date.
+        """
+        check_period(start, end)
+        start_date, end_date = period_bounds(start, end)
+        result = Totals()
+        result.merge(self.recurring.totals(start_date, end_date if end else today()))
+        
+        for month, totals in self.months.items():
+            first, last = month + "-01", month + "-99"
+            if last < start_date or first > end_date:
+                continue
+            
+            if start_date <= first and last <= end_date:
+                result.merge(totals)
+            else:
+                for t in self.storage.iter_transactions(max(first, start_date), min(last, end_date)):
+                    result.add(t["type"], t["category"], t["amount"])
+        
+        return result.summary()
+    
+    @instruments.timed("tracker.build_report", rows=lambda result: result["rows"])
+    def build_report(self, start=None, end=None, workers=None, progress=None):
+        """Recompute a period's totals, by month, type and category, from every row
+        
+        Unlike get_period_summary() this reads the transactions themselves,
+        split across worker processes; see build_report(). Safe to call off
+        the Tk thread. Raises ValueError for a bound that is not a valid date.
+        """
+        check_period(start, end)
+        start_date, end_date = period_bounds(start, end)
+        occurrences = [(o["date"], o["type"], o["category"], o["amount"], 1)
+                       for o in self.recurring.occurrences(start_date, end_date if end else today())]
+        _, extra = rollup(occurrences)
+        return build_report(self.storage, start_date, end_date, workers, progress, extra)
+    
+    def get_transaction(self, transaction_id):
+        """Get a single transaction by ID"""
+        return self.storage.get(transaction_id)
+    
+    @instruments.timed("tracker.update_transaction")
+    def update_transaction(self, transaction_id, amount=None, category=None, description=None,
+                           transaction_type=None, date=None):
+        """Change fields of an existing transaction, keeping the rest"""
+        if self.loading:
+            return False, LOADING_MESSAGE
+        
+        old = self.storage.get(transaction_id)
+        if old is None:
+            return False, f"Transaction with ID {transaction_id} not found."
+        
+        amount, error = self.validate_transaction(
+            from_minor(old["amount"]) if amount is None else amount,
+            old["category"] if category is None else category,
+            date
+        )
+        if error:
+            return False, error
+        
+        transaction = dict(
+            old,
+            amount=amount,
+            category=old["category"] if category is None else category,
+            description=old["description"] if description is None else description,
+            type=old["type"] if transaction_type is None else transaction_type,
+            date=old["date"] if date is None else date
+        )
+        
+        error = self.check_room(added=[transaction], removed=[old])
+        if error:
+            return False, error
+        
+        old = self.storage.update(transaction)
+        self.update_totals(old, -1)
+        self.update_totals(transaction, 1)
+        
+        if self.debug:
+            self.check_totals()
+        
+        self.notify(updated=[(old, transaction)])
+        return True, f"Transaction {transaction_id} updated successfully!"
+    
+    @instruments.timed("tracker.update_transactions")
+    def update_transactions(self, transaction_ids, category=None, description=None,
+                            transaction_type=None, date=None):
+        """Make the same change to a batch of transactions
+        
+        The batch is persisted once and observers get a single notification.
+        """
+        if self.loading:
+            return False, LOADING_MESSAGE
+        
+        old = self.storage.get_many(set(transaction_ids))
+        if not old:
+            return False, "None of the selected transactions were found."
+        
+        # Every transaction gets the same new values, so checking one checks them all
+        _, error = self.validate_transaction(
+            from_minor(old[0]["amount"]),
+            old[0]["category"] if category is None else category,
+            date
+        )
+        if error:
+            return False, error
+        
+        transactions = [
+            dict(
+                t,
+                category=t["category"] if category is None else category,
+                description=t["description"] if description is None else description,
+                type=t["type"] if transaction_type is None else transaction_type,
+                date=t["date"] if date is None else date
+            )
+            for t in old
+        ]
+        
+        # Changing the type moves amounts from one total to the other
+        error = self.check_room(added=transactions, removed=old)
+        if error:
+            return False, error
+        
+        old = {t["id"]: t for t in self.storage.update_many(transactions)}
+        updated = [(old[t["id"]], t) for t in transactions if t["id"] in old]
+        for previous, transaction in updated:
+            self.update_totals(previous, -1)
+            self.update_totals(transaction, 1)
+        
+        if self.debug:
+            self.check_totals()
+        
+        self.notify(updated=updated)
+        return True, f"Updated {len(updated)} transactions."
+    
+    @instruments.timed("tracker.delete_transactions")
+    def delete_transactions(self, transaction_ids):
+        """Delete a batch of transactions by ID
+        
+        The batch is persisted once and observers get a single notification.
+        """
+        if self.loading:
+            return False, LOADING_MESSAGE
+        
+        transaction_ids = set(transaction_ids)
+        removed = self.storage.delete_many(transaction_ids)
+        if not removed:
+            return False, "None of the selected transactions were found."
+        
+        for transaction in removed:
+            self.update_totals(transaction, -1)
+        
+        if self.debug:
+            self.check_totals()
+        
+        self.notify(removed=removed)
+        
+        message = f"Deleted {len(removed)} transactions."
+        if len(removed) < len(transaction_ids):
+            message += f" {len(transaction_ids) - len(removed)} were not found."
+        return True, message
+    
+    @instruments.timed("tracker.delete_transaction")
+    def delete_transaction(self, transaction_id):
+        """Delete a transaction by ID"""
+        if self.loading:
+            return False, LOADING_MESSAGE
+        
+        transaction = self.storage.delete(transaction_id)
+        
+        if transaction is not None:
+            self.update_totals(transaction, -1)
+            
+            if self.debug:
+                self.check_totals()
+            
+            self.notify(removed=[transaction])
+            return True, f"Transaction {transaction_id} deleted successfully!"
+        
+        return False, f"Transaction with ID {transaction_id} not found."
+    
+    def add_recurring(self, amount, category, description, transaction_type, frequency,
+                      start=None, until=None, interval=1):
+        """Add a rule repeating a transaction every interval days, weeks, months or years
+        
+        amount is in major units. start is the first occurrence (default
+        today) and until the last possible one (default never).
+        """
+        if start is None:
+            start = today()
+        
+        amount, error = self.validate_transaction(amount, category, start)
+        if error:
+            return False, error
+        if transaction_type not in ("income", "expense"):
+            return False, "Type must be income or expense"
+        if frequency not in RECURRENCE_FREQUENCIES:
+            return False, f"Frequency must be one of {', '.join(RECURRENCE_FREQUENCIES)}"
+        if not isinstance(interval, int) or interval < 1:
+            return False, "Interval must be a whole number of at least 1"
+        if until is not None and (normalize_date(until, ("%Y-%m-%d",)) is None or until < start):
+            return False, "End date must be a valid YYYY-MM-DD date on or after the start"
+        
+        rule = {
+            "id": None,
+            "type": transaction_type,
+            "amount": amount,
+            "category": category,
+            "description": description,
+            "frequency": frequency,
+            "interval": interval,
+            "start": start,
+            "until": until,
+            "exceptions": {}
+        }
+        self.recurring.add(rule)
+        return True, f"{frequency.capitalize()} {transaction_type} of {format_money(amount)} added as rule {rule['id']}."
+    
+    def get_recurring(self):
+        """Get the recurrence rules, oldest first"""
+        return [self.recurring.rules[rule_id] for rule_id in sorted(self.recurring.rules)]
+    
+    def delete_recurring(self, rule_id):
+        """Delete a recurrence rule; occurrences already recorded are kept"""
+        if self.recurring.delete(rule_id) is None:
+            return False, f"Recurring rule {rule_id} not found."
+        return True, f"Recurring rule {rule_id} deleted successfully!"
+    
+    def get_occurrences(self, start=None, end=None):
+        """Get the recurring occurrences in a period, oldest first
+        
+        start and end may be YYYY, YYYY-MM or YYYY-MM-DD; the period is
+        open at the start, and ends today unless end is given. Raises
+        ValueError for a bound that is not a valid date.
+        """
+        check_period(start, end)
+        start_date, end_date = period_bounds(start, end or today())
+        return list(self.recurring.occurrences(start_date, end_date))
+    
+    def find_occurrence(self, rule_id, date):
+        """Return (occurrence, error message) for one date of a rule"""
+        rule = self.recurring.rules.get(rule_id)
+        if rule is None:
+            return None, f"Recurring rule {rule_id} not found."
+        if normalize_date(date, ("%Y-%m-%d",)) != date:
+            return None, "Date must be a valid YYYY-MM-DD date"
+        
+        occurrence = next(rule_occurrences(rule, date, date), None)
+        if occurrence is None:
+            return None, f"Rule {rule_id} has no occurrence on {date}."
+        return occurrence, None
+    
+    def skip_occurrence(self, rule_id, date):
+        """Leave one occurrence of a rule out"""
+        occurrence, error = self.find_occurrence(rule_id, date)
+        if error:
+            return False, error
+        
+        self.recurring.set_exception(rule_id, date, None)
+        return True, f"Skipped the {date} occurrence of rule {rule_id}."
+    
+    def override_occurrence(self, rule_id, date, amount=None, category=None, description=None):
+        """Change the amount (in major units), category or description of one occurrence"""
+        occurrence, error = self.find_occurrence(rule_id, date)
+        if error:
+            return False, error
+        
+        amount, error = self.validate_transaction(
+            from_minor(occurrence["amount"]) if amount is None else amount,
+            occurrence["category"] if category is None else category
+        )
+        if error:
+            return False, error
+        
+        change = dict(self.recurring.rules[rule_id]["exceptions"].get(date) or {}, amount=amount)
+        if category is not None:
+            change["category"] = category
+        if description is not None:
+            change["description"] = description
+        
+        self.recurring.set_exception(rule_id, date, change)
+        return True, f"Changed the {date} occurrence of rule {rule_id}."
+    
+    def materialize_occurrence(self, rule_id, date):
+        """Record one occurrence as a real transaction, which then replaces it"""
+        occurrence, error = self.find_occurrence(rule_id, date)
+        if error:
+            return False, error
+        
+        success, message = self.add_transaction(from_minor(occurrence["amount"]), occurrence["category"],
+                                                occurrence["description"], occurrence["type"], date)
+        if success:
+            self.recurring.set_exception(rule_id, date, None)
+        return success, message
\ No newline at end of file
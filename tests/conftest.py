@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The app modules import each other by bare name, as when run from coincompass/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "coincompass"))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test in an empty directory, where the default ledger files go"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("COINCOMPASS_STORAGE", raising=False)
+    return tmp_path
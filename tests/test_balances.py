@@ -0,0 +1,93 @@
+import datetime
+import random
+
+import pytest
+
+from ledger import BalanceIndex, BudgetTracker, FenwickTree, create_storage
+
+
+def brute_balance(transactions, date):
+    return sum(t["amount"] if t["type"] == "income" else -t["amount"]
+               for t in transactions if t["date"] <= date)
+
+
+def test_fenwick_prefix_sums_match_a_running_sum():
+    rng = random.Random(1)
+    values = [rng.randint(-1000, 1000) for _ in range(257)]
+    tree = FenwickTree(values)
+    
+    for _ in range(300):
+        index = rng.randrange(len(values))
+        amount = rng.randint(-1000, 1000)
+        values[index] += amount
+        tree.add(index, amount)
+    
+    for index in range(len(values)):
+        assert tree.prefix_sum(index) == sum(values[:index + 1])
+    # Past the end is the whole sum
+    assert tree.prefix_sum(10 ** 6) == sum(values)
+
+
+def test_balance_index_grows_in_both_directions():
+    index = BalanceIndex()
+    rows = [("2024-06-15", "income", 500), ("2019-01-01", "expense", 20), ("2031-12-31", "income", 7),
+            ("2024-06-15", "expense", 100), ("someday", "income", 1000)]
+    for date, transaction_type, amount in rows:
+        index.add(date, transaction_type, amount)
+    
+    bulk = BalanceIndex()
+    bulk.add_many(rows)
+    
+    for date in ("2018-12-31", "2019-01-01", "2024-06-14", "2024-06-15", "2031-12-30", "2040-01-01"):
+        ordinal = datetime.date.fromisoformat(date).toordinal()
+        income = sum(a for d, t, a in rows if t == "income" and d <= date and d != "someday")
+        expenses = sum(a for d, t, a in rows if t == "expense" and d <= date)
+        assert index.totals_through(ordinal) == (income, expenses)
+        assert bulk.totals_through(ordinal) == (income, expenses)
+
+
+@pytest.mark.parametrize("kind", ["journal", "columnar", "sqlite"])
+def test_balances_match_a_running_sum_after_changes(workdir, kind):
+    rng = random.Random(7)
+    tracker = BudgetTracker(create_storage(kind))
+    start = datetime.date(2023, 1, 1)
+    for _ in range(200):
+        date = (start + datetime.timedelta(days=rng.randrange(400))).isoformat()
+        assert tracker.add_transaction(f"{rng.randint(1, 50000) / 100}", "Misc", "",
+                                       rng.choice(["income", "expense"]), date)[0]
+    
+    ids = [t["id"] for t in tracker.get_transactions()]
+    for transaction_id in rng.sample(ids, 40):
+        assert tracker.delete_transaction(transaction_id)[0]
+    remaining = [t["id"] for t in tracker.get_transactions()]
+    for transaction_id in rng.sample(remaining, 20):
+        assert tracker.update_transaction(transaction_id, amount="3.21", transaction_type="income",
+                                          date="2023-07-04")[0]
+    assert tracker.add_transaction("99", "Misc", "", "expense", "2020-02-29")[0]
+    
+    transactions = tracker.get_transactions()
+    for offset in range(-10, 420, 7):
+        date = (start + datetime.timedelta(days=offset)).isoformat()
+        assert tracker.balance_as_of(date)["balance"] == brute_balance(transactions, date)
+    
+    series = tracker.balance_series("2022-12-25", "2024-02-10", step=3)
+    assert series[0][0] == "2022-12-25"
+    assert all(balance == brute_balance(transactions, date) for date, balance in series)
+    
+    # Each row's running balance counts everything before it, same-day rows in ID order
+    ordered = sorted(transactions, key=lambda t: (t["date"], t["id"]))
+    balance = 0
+    expected = {}
+    for t in ordered:
+        balance += t["amount"] if t["type"] == "income" else -t["amount"]
+        expected[t["id"]] = balance
+    assert tracker.get_running_balances(transactions) == [expected[t["id"]] for t in transactions]
+    tracker.close()
+
+
+@pytest.mark.parametrize("step", [0, -1])
+def test_balance_series_rejects_a_step_below_one_day(workdir, step):
+    tracker = BudgetTracker(create_storage("journal"))
+    with pytest.raises(ValueError):
+        tracker.balance_series("2024-01-01", "2024-01-31", step)
+    tracker.close()
@@ -0,0 +1,77 @@
+import pytest
+
+from ledger import BudgetTracker, create_storage
+
+BACKENDS = ["json", "journal", "columnar", "binary", "partitioned", "sqlite"]
+
+
+@pytest.fixture
+def tracker(workdir, request):
+    tracker = BudgetTracker(create_storage(request.param), debug=True)
+    for day in range(1, 11):
+        assert tracker.add_transaction(f"{day}", "Food", f"Item {day}", "expense", f"2024-01-{day:02d}")[0]
+    yield tracker
+    tracker.close()
+
+
+def reopen(tracker):
+    kind = {"JsonStorage": "json", "JournalStorage": "journal", "ColumnarStorage": "columnar",
+            "BinaryStorage": "binary", "PartitionedStorage": "partitioned",
+            "SQLiteStorage": "sqlite"}[type(tracker.storage).__name__]
+    tracker.close()
+    return BudgetTracker(create_storage(kind), debug=True)
+
+
+@pytest.mark.parametrize("tracker", BACKENDS, indirect=True)
+def test_update_transactions(tracker):
+    notifications = []
+    tracker.subscribe(lambda added, removed, updated: notifications.append(updated))
+    
+    success, message = tracker.update_transactions([2, 4, 6, 99], category="Dining", date="2024-03-01")
+    assert success, message
+    assert message == "Updated 3 transactions."
+    assert len(notifications) == 1
+    assert sorted((old["id"], new["category"]) for old, new in notifications[0]) == [
+        (2, "Dining"), (4, "Dining"), (6, "Dining")]
+    
+    assert tracker.get_category_summary()["Dining"] == 1200
+    assert tracker.get_period_summary("2024-03", "2024-03")["expenses"] == 1200
+    
+    assert tracker.update_transactions([1, 3], transaction_type="income", description="Refund")[0]
+    assert tracker.get_balance()["income"] == 400
+    
+    tracker = reopen(tracker)
+    rows = {t["id"]: t for t in tracker.get_transactions()}
+    assert [rows[i]["category"] for i in (2, 4, 6)] == ["Dining"] * 3
+    assert [rows[i]["date"] for i in (2, 4, 6)] == ["2024-03-01"] * 3
+    assert (rows[1]["type"], rows[1]["description"], rows[1]["amount"]) == ("income", "Refund", 100)
+    assert rows[5]["category"] == "Food"
+    tracker.close()
+
+
+@pytest.mark.parametrize("tracker", BACKENDS, indirect=True)
+def test_update_transactions_validates_once_for_all(tracker):
+    assert tracker.update_transactions([1, 2], category=" ") == (False, "Category cannot be empty")
+    assert tracker.update_transactions([1, 2], date="2024-02-30")[0] is False
+    assert tracker.update_transactions([98, 99], category="Dining")[0] is False
+    assert tracker.get_category_summary() == {"Food": 5500}
+
+
+@pytest.mark.parametrize("tracker", BACKENDS, indirect=True)
+def test_delete_transactions(tracker):
+    notifications = []
+    tracker.subscribe(lambda added, removed, updated: notifications.append(removed))
+    
+    success, message = tracker.delete_transactions([1, 5, 10, 99])
+    assert success
+    assert message == "Deleted 3 transactions. 1 were not found."
+    assert len(notifications) == 1
+    assert sorted(t["id"] for t in notifications[0]) == [1, 5, 10]
+    assert tracker.get_balance()["expenses"] == 5500 - 1600
+    
+    assert tracker.delete_transactions([1, 5]) == (False, "None of the selected transactions were found.")
+    
+    tracker = reopen(tracker)
+    assert sorted(t["id"] for t in tracker.get_transactions()) == [2, 3, 4, 6, 7, 8, 9]
+    assert tracker.get_balance()["expenses"] == 5500 - 1600
+    tracker.close()
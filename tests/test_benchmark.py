@@ -0,0 +1,11 @@
+import os
+
+import benchmark
+
+
+def test_run_case_restores_the_working_directory(workdir):
+    case = benchmark.run_case("journal", 200, 0, gui=False)
+    assert os.getcwd() == str(workdir)
+    
+    operations = {result["operation"] for result in case["results"]}
+    assert {"load_data", "add_transaction", "save_data", "close"} <= operations
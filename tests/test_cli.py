@@ -0,0 +1,38 @@
+import pytest
+
+import cli
+
+
+def test_balance_as_of(workdir, capsys):
+    assert cli.main(["add", "expense", "12.34", "Food", "--date", "2024-01-05"]) == 0
+    assert cli.main(["add", "income", "1000", "Salary", "--date", "2024-02-01"]) == 0
+    capsys.readouterr()
+    
+    assert cli.main(["--json", "balance", "--as-of", "2024-01-31"]) == 0
+    assert '"balance": -12.34' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("as_of", ["junk", "2024-13-01", "2024-02-30"])
+def test_balance_as_of_rejects_bad_dates(workdir, capsys, as_of):
+    assert cli.main(["balance", "--as-of", as_of]) == 1
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "YYYY-MM-DD" in captured.err
+
+
+@pytest.mark.parametrize("argv", [
+    ["recurring", "occurrences", "--end", "junk"],
+    ["recurring", "skip", "1", "junk"],
+    ["recurring", "override", "1", "2024-02-30", "--amount", "5"],
+    ["report", "--start", "2024", "--end", "junk"],
+    ["report", "--full", "--start", "2024-13"],
+    ["categories", "--period", "junk"],
+])
+def test_recurring_and_report_reject_bad_dates(workdir, capsys, argv):
+    assert cli.main(["recurring", "add", "expense", "10", "Gym", "daily", "--start", "2024-01-01"]) == 0
+    capsys.readouterr()
+    
+    assert cli.main(argv) == 1
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "YYYY-MM-DD" in captured.err
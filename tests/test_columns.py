@@ -0,0 +1,52 @@
+import pytest
+
+from ledger import ColumnTable
+
+
+def row(transaction_id, amount, date="2024-01-05"):
+    return {"id": transaction_id, "date": date, "type": "expense", "amount": amount,
+            "category": "Food", "description": "Lunch"}
+
+
+def column_lengths(table):
+    return {len(column) for column in (table.ids, table.dates, table.types, table.amounts,
+                                       table.categories, table.descriptions, table.alive)}
+
+
+def test_round_trip_keeps_fields():
+    table = ColumnTable()
+    table[1] = row(1, 1234)
+    table[2] = row(2, -5, date="someday")
+    assert dict(table[1]) == row(1, 1234)
+    assert dict(table[2]) == row(2, -5, date="someday")
+
+
+def test_oversized_amount_leaves_table_unchanged():
+    table = ColumnTable()
+    table[1] = row(1, 1234)
+    
+    with pytest.raises(OverflowError):
+        table[2] = row(2, 2 ** 63)
+    assert column_lengths(table) == {1}
+    assert list(table) == [1]
+    
+    # A failed update keeps the row it would have replaced
+    with pytest.raises(OverflowError):
+        table[1] = row(1, 2 ** 63, date="someday")
+    assert dict(table[1]) == row(1, 1234)
+    assert column_lengths(table) == {1}
+    
+    table[3] = row(3, 99)
+    assert dict(table[3]) == row(3, 99)
+
+
+def test_replacing_rows_through_a_squeeze():
+    table = ColumnTable()
+    for transaction_id in range(1, 3001):
+        table[transaction_id] = row(transaction_id, transaction_id)
+    for transaction_id in range(1, 3001):
+        table[transaction_id] = row(transaction_id, -transaction_id)
+    
+    assert len(table) == 3000
+    assert column_lengths(table) == {len(table.ids)}
+    assert all(table[i]["amount"] == -i for i in range(1, 3001))
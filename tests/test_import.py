@@ -0,0 +1,124 @@
+import pytest
+
+import cli
+from ledger import BudgetTracker, create_storage, parse_amount, read_statement
+
+CSV_STATEMENT = """Date,Amount,Description,Category
+2024-01-05,-12.34,Coffee shop,Food
+01/31/2024,"$1,500.00",Payroll,
+2024-02-01,(20.00),Refund reversal,
+2024-02-02,nan,Broken row,
+2024-02-03,-inf,Broken row,
+not a date,-5.00,Broken row,
+2024-02-04,0,Zero row,
+"""
+
+OFX_STATEMENT = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240105120000
+<TRNAMT>-12.34
+<NAME>Coffee shop
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240131<TRNAMT>1500.00<MEMO>Payroll</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+QIF_STATEMENT = """!Type:Bank
+D01/05'24
+T-12.34
+PCoffee shop
+LFood
+^
+D01/31/2024
+T1,500.00
+MPayroll
+^
+"""
+
+
+def write(name, text):
+    with open(name, "w") as file:
+        file.write(text)
+    return name
+
+
+def rows(filename):
+    return [(line_number, t["date"], t["type"], t["amount"], t["category"], t["description"])
+            for line_number, t in read_statement(filename)]
+
+
+@pytest.mark.parametrize("text", ["nan", "NaN", "-inf", "Infinity", "sNaN", "abc", ""])
+def test_parse_amount_rejects_non_numbers(text):
+    with pytest.raises(ValueError):
+        parse_amount(text)
+
+
+def test_parse_amount_formats():
+    assert parse_amount("$1,234.50") == parse_amount("1234.50")
+    assert parse_amount("(12.00)") == -parse_amount("12")
+
+
+def test_csv_import(workdir):
+    tracker = BudgetTracker(create_storage("journal"))
+    result = tracker.import_file(write("statement.csv", CSV_STATEMENT))
+    assert result["added"] == 3
+    assert result["duplicates"] == 0
+    assert [line_number for line_number, _ in result["rejected"]] == [5, 6, 7, 8]
+    
+    assert sorted((t["date"], t["type"], t["amount"], t["category"]) for t in tracker.get_transactions()) == [
+        ("2024-01-05", "expense", 1234, "Food"),
+        ("2024-01-31", "income", 150000, "Imported"),
+        ("2024-02-01", "expense", 2000, "Imported")]
+    tracker.close()
+
+
+def test_ofx_rows(workdir):
+    assert rows(write("statement.ofx", OFX_STATEMENT)) == [
+        (3, "2024-01-05", "expense", parse_amount("12.34"), "Imported", "Coffee shop"),
+        (9, "2024-01-31", "income", parse_amount("1500.00"), "Imported", "Payroll")]
+
+
+def test_qif_rows(workdir):
+    assert rows(write("statement.qif", QIF_STATEMENT)) == [
+        (2, "2024-01-05", "expense", parse_amount("12.34"), "Food", "Coffee shop"),
+        (7, "2024-01-31", "income", parse_amount("1500.00"), "Imported", "Payroll")]
+
+
+def test_unsupported_format(workdir):
+    with pytest.raises(ValueError):
+        list(read_statement(write("statement.txt", "")))
+
+
+def test_reimport_and_overlapping_statements_are_deduplicated(workdir):
+    tracker = BudgetTracker(create_storage("journal"))
+    assert tracker.import_file(write("statement.ofx", OFX_STATEMENT))["added"] == 2
+    
+    result = tracker.import_file("statement.ofx")
+    assert (result["added"], result["duplicates"]) == (0, 2)
+    
+    # The same two transactions from another bank export, plus a new one
+    result = tracker.import_file(write("statement.qif", QIF_STATEMENT + "D02/01/2024\nT-3.00\nPBus\n^\n"))
+    assert (result["added"], result["duplicates"]) == (1, 2)
+    assert tracker.count_transactions() == 3
+    tracker.close()
+
+
+def test_repeated_rows_each_absorb_one_duplicate(workdir):
+    tracker = BudgetTracker(create_storage("journal"))
+    statement = write("statement.csv", "Date,Amount,Description\n2024-01-05,-3.00,Bus\n2024-01-05,-3.00,Bus\n")
+    assert tracker.import_file(statement)["added"] == 2
+    
+    result = tracker.import_file(write("more.csv", "Date,Amount,Description\n"
+                                       "2024-01-05,-3.00,Bus\n2024-01-05,-3.00,Bus\n2024-01-05,-3.00,Bus\n"))
+    assert (result["added"], result["duplicates"]) == (1, 2)
+    tracker.close()
+
+
+def test_cli_import_reports_rejected_rows(workdir, capsys):
+    write("statement.csv", CSV_STATEMENT)
+    assert cli.main(["import", "statement.csv"]) == 0
+    captured = capsys.readouterr()
+    assert "Imported 3 transactions" in captured.out
+    assert "Line 5:" in captured.err
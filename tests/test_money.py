@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from ledger import CURRENCY, MAX_AMOUNT, BudgetTracker, JournalStorage, JsonStorage, SQLiteStorage, create_storage
+
+
+def test_reopened_journal_ledger_keeps_integer_amounts(workdir):
+    tracker = BudgetTracker(JournalStorage())
+    tracker.add_transaction("12.34", "Food", "Lunch", "expense", "2024-01-05")
+    tracker.add_transaction("1000", "Salary", "January", "income", "2024-01-31")
+    tracker.close()
+    
+    # Nothing has been compacted yet, so the ledger is only a journal
+    assert not os.path.exists("budget_data.json")
+    assert os.path.exists("budget_data.journal")
+    
+    tracker = BudgetTracker(JournalStorage())
+    assert sorted(t["amount"] for t in tracker.get_transactions()) == [1234, 100000]
+    assert tracker.get_balance()["balance"] == 100000 - 1234
+    tracker.close()
+
+
+def test_legacy_float_journal_is_migrated(workdir):
+    with open("budget_data.journal", "w") as file:
+        entry = {"seq": 1, "op": "add", "transaction": {
+            "id": 1, "date": "2024-01-05", "type": "expense",
+            "amount": 12.34, "category": "Food", "description": "Lunch"}}
+        file.write(json.dumps(entry) + "\n")
+    
+    tracker = BudgetTracker(JournalStorage())
+    assert [t["amount"] for t in tracker.get_transactions()] == [1234]
+    tracker.close()
+
+
+LEGACY_AMOUNTS = [1.005, 2.675, 12.34, 0.1]
+
+
+def test_legacy_json_snapshot_is_migrated(workdir):
+    with open("budget_data.json", "w") as file:
+        json.dump([{"id": i, "date": "2024-01-05", "type": "expense", "amount": amount,
+                    "category": "Food", "description": ""}
+                   for i, amount in enumerate(LEGACY_AMOUNTS, 1)], file)
+    
+    tracker = BudgetTracker(JsonStorage())
+    assert sorted(t["amount"] for t in tracker.get_transactions()) == [10, 101, 268, 1234]
+    tracker.close()
+    
+    # The ledger is rewritten once, with its currency recorded
+    with open("budget_data.json") as file:
+        assert json.load(file)["currency"] == CURRENCY
+
+
+def test_legacy_sqlite_table_rounds_like_json(workdir):
+    connection = sqlite3.connect("budget_data.db")
+    connection.execute(
+        "CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL, "
+        "type TEXT NOT NULL, amount REAL NOT NULL, category TEXT NOT NULL, "
+        "description TEXT NOT NULL DEFAULT '')")
+    connection.executemany(
+        "INSERT INTO transactions (date, type, amount, category) VALUES ('2024-01-05', 'expense', ?, 'Food')",
+        [(amount,) for amount in LEGACY_AMOUNTS])
+    connection.commit()
+    connection.close()
+    
+    tracker = BudgetTracker(SQLiteStorage())
+    assert sorted(t["amount"] for t in tracker.get_transactions()) == [10, 101, 268, 1234]
+    assert tracker.storage.connection.execute("PRAGMA user_version").fetchone()[0] == SQLiteStorage.SCHEMA_VERSION
+    tracker.close()
+
+
+@pytest.mark.parametrize("amount, error", [
+    ("abc", "Amount must be a valid number"),
+    ("nan", "Amount must be a valid number"),
+    ("inf", "Amount must be a valid number"),
+    ("0", "Amount must be greater than zero"),
+    ("-5", "Amount must be greater than zero"),
+    ("1e20", "Amount must be at most"),
+    ("1e999999", "Amount must be a valid number"),
+    ("-1e999999", "Amount must be a valid number"),
+    ("92233720368547758.08", "Amount must be at most"),
+])
+@pytest.mark.parametrize("kind", ["journal", "columnar", "binary", "sqlite"])
+def test_invalid_amounts_are_rejected(workdir, kind, amount, error):
+    tracker = BudgetTracker(create_storage(kind))
+    success, message = tracker.add_transaction(amount, "Food", "", "expense", "2024-01-05")
+    assert not success
+    assert message.startswith(error)
+    assert tracker.count_transactions() == 0
+    tracker.close()
+
+
+@pytest.mark.parametrize("kind", ["journal", "columnar", "binary", "partitioned", "sqlite"])
+def test_largest_amount_is_stored_exactly(workdir, kind):
+    tracker = BudgetTracker(create_storage(kind))
+    success, _ = tracker.add_transaction("92233720368547758.07", "Food", "", "income", "2024-01-05")
+    assert success
+    tracker.close()
+    
+    tracker = BudgetTracker(create_storage(kind))
+    assert [t["amount"] for t in tracker.get_transactions()] == [MAX_AMOUNT]
+    tracker.close()
+
+
+
+@pytest.mark.parametrize("kind", ["journal", "columnar", "sqlite"])
+def test_totals_are_bounded_too(workdir, kind):
+    largest = "92233720368547758.07"
+    tracker = BudgetTracker(create_storage(kind))
+    assert tracker.add_transaction(largest, "Salary", "", "income", "2024-01-05")[0]
+    assert tracker.add_transaction(largest, "Food", "", "expense", "2024-01-05")[0]
+    
+    assert tracker.add_transaction("0.01", "Salary", "", "income", "2024-01-06") == (
+        False, "Total income cannot exceed $92233720368547758.07")
+    assert not tracker.add_transaction("0.01", "Food", "", "expense", "2024-01-06")[0]
+    
+    # Moving an amount from one total to the other counts as well
+    assert tracker.update_transaction(2, transaction_type="income")[0] is False
+    assert tracker.update_transactions([2], transaction_type="income")[0] is False
+    assert tracker.update_transaction(2, amount="5")[0]
+    assert tracker.add_transaction("1", "Food", "", "expense", "2024-01-06")[0]
+    
+    with open("statement.csv", "w") as file:
+        file.write("Date,Amount,Description\n2024-01-07,1.00,Bonus\n")
+    with pytest.raises(ValueError):
+        tracker.import_file("statement.csv")
+    tracker.close()
+    
+    tracker = BudgetTracker(create_storage(kind))
+    assert tracker.load_error is None
+    assert tracker.get_balance()["income"] == MAX_AMOUNT
+    assert tracker.count_transactions() == 3
+    tracker.close()
+
+
+def test_overflowing_sqlite_ledger_still_opens(workdir):
+    storage = SQLiteStorage()
+    storage.load()
+    row = {"id": None, "date": "2024-01-05", "type": "income", "amount": MAX_AMOUNT,
+           "category": "Salary", "description": ""}
+    storage.add_many([dict(row), dict(row)])
+    storage.close()
+    
+    tracker = BudgetTracker(SQLiteStorage())
+    assert tracker.load_error.startswith("Error totalling data")
+    assert tracker.count_transactions() == 2
+    tracker.close()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+
+import pytest
+
+import coincompass
+from coincompass import LoginWindow, PasswordManager
+
+
+@pytest.fixture
+def manager(workdir):
+    manager = PasswordManager(target_seconds=0.01)
+    # Keep the minimum cost so the tests stay quick
+    manager.calibrate()
+    return manager
+
+
+def stored_record():
+    with open("password.json") as file:
+        return json.load(file)
+
+
+def test_set_and_verify(manager):
+    assert not manager.password_exists()
+    assert not manager.verify_password("secret")
+    
+    manager.set_password("secret")
+    record = stored_record()
+    assert record["kdf"] in ("scrypt", "pbkdf2_sha256")
+    assert record["password"] != hashlib.sha256(b"secret").hexdigest()
+    
+    # A new manager reads the record back from disk
+    manager = PasswordManager()
+    assert manager.verify_password("secret")
+    assert not manager.verify_password("Secret")
+    assert not manager.verify_password("")
+
+
+def test_salts_differ(manager):
+    manager.set_password("secret")
+    first = stored_record()
+    manager.set_password("secret")
+    second = stored_record()
+    assert first["salt"] != second["salt"]
+    assert first["password"] != second["password"]
+
+
+def test_legacy_hash_is_upgraded_on_login(manager):
+    with open("password.json", "w") as file:
+        json.dump({"password": hashlib.sha256(b"secret").hexdigest()}, file)
+    
+    assert not manager.verify_password("wrong")
+    assert "kdf" not in stored_record()
+    
+    assert manager.verify_password("secret")
+    record = stored_record()
+    assert "kdf" in record
+    assert PasswordManager().verify_password("secret")
+
+
+def test_calibrate_stays_within_bounds(workdir):
+    manager = PasswordManager(target_seconds=1e-6)
+    params = manager.calibrate()
+    if params["kdf"] == "scrypt":
+        assert params["n"] == 2 ** 14
+    else:
+        assert params["iterations"] == 600_000
+    
+    # Measured once per run, and callers get their own copy
+    params["n"] = params["iterations"] = 1
+    assert manager.calibrate() == manager.kdf_params
+    
+    manager = PasswordManager(target_seconds=1000.0)
+    manager.derive_key = lambda password, params: ""
+    params = manager.calibrate()
+    if params["kdf"] == "scrypt":
+        assert params["n"] == 2 ** 17
+    else:
+        assert params["iterations"] == 10_000_000
+
+
+def test_attempts_lock_down_after_the_limit(manager, monkeypatch):
+    locked = []
+    monkeypatch.setattr(manager, "show_dead_screen", lambda: locked.append(True))
+    manager.set_password("secret")
+    
+    assert not manager.login("a")
+    assert not manager.login("b")
+    assert manager.login("secret")
+    assert manager.attempts == 0
+    
+    for _ in range(3):
+        assert not manager.login("wrong")
+    assert locked == [True]
+
+
+class FakeEntry:
+    def __init__(self, text):
+        self.text = text
+    
+    def get(self):
+        return self.text
+
+
+def test_login_ignores_submits_while_a_verify_runs(manager, monkeypatch):
+    window = LoginWindow.__new__(LoginWindow)
+    window.password_manager = manager
+    window.password_entry = FakeEntry("secret")
+    window.new_password = window.confirm_password = FakeEntry("secret")
+    started = []
+    window.run_in_background = lambda message, work, on_done: started.append(message)
+    monkeypatch.setattr(coincompass.messagebox, "showerror", lambda *args: None)
+    
+    window.busy = True
+    window.login()
+    window.create_password()
+    assert started == []
+    
+    window.busy = False
+    window.login()
+    assert started == ["Checking password..."]
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from ledger import BudgetTracker, create_storage
+
+BACKENDS = ["json", "journal", "columnar", "binary", "partitioned", "sqlite"]
+
+
+def occurrence_amounts(tracker):
+    return [(o["date"], o["amount"]) for o in tracker.get_occurrences("2023", "2023")]
+
+
+def test_skip_override_and_materialize(workdir):
+    tracker = BudgetTracker(create_storage("journal"))
+    assert tracker.add_recurring("1500", "Rent", "Flat", "expense", "monthly",
+                                 start="2023-01-31", until="2023-06-30")[0]
+    
+    # Month-end starts fall back to the last day of shorter months
+    assert occurrence_amounts(tracker) == [
+        ("2023-01-31", 150000), ("2023-02-28", 150000), ("2023-03-31", 150000),
+        ("2023-04-30", 150000), ("2023-05-31", 150000), ("2023-06-30", 150000)]
+    
+    assert tracker.skip_occurrence(1, "2023-03-31")[0]
+    assert tracker.override_occurrence(1, "2023-04-30", amount="1600", description="Rent rise")[0]
+    assert tracker.materialize_occurrence(1, "2023-05-31")[0]
+    assert not tracker.skip_occurrence(1, "2023-03-15")[0]
+    assert not tracker.skip_occurrence(2, "2023-03-31")[0]
+    
+    expected = [("2023-01-31", 150000), ("2023-02-28", 150000), ("2023-04-30", 160000), ("2023-06-30", 150000)]
+    assert occurrence_amounts(tracker) == expected
+    assert [(t["date"], t["amount"]) for t in tracker.get_transactions()] == [("2023-05-31", 150000)]
+    
+    # Occurrences and the recorded one both count, with nothing twice
+    assert tracker.get_balance()["expenses"] == 4 * 150000 + 160000
+    assert tracker.get_period_summary("2023-04", "2023-04")["expenses"] == 160000
+    assert tracker.get_period_summary("2023-03", "2023-03")["expenses"] == 0
+    assert tracker.balance_as_of("2023-02-28")["expenses"] == 300000
+    tracker.close()
+    
+    tracker = BudgetTracker(create_storage("journal"))
+    assert occurrence_amounts(tracker) == expected
+    assert tracker.get_occurrences("2023-04-30", "2023-04-30")[0]["description"] == "Rent rise"
+    tracker.close()
+
+
+def test_delete_keeps_recorded_occurrences(workdir):
+    tracker = BudgetTracker(create_storage("journal"))
+    assert tracker.add_recurring("10", "Gym", "", "expense", "weekly", start="2023-01-02", until="2023-01-30")[0]
+    assert len(tracker.get_occurrences("2023", "2023")) == 5
+    assert tracker.materialize_occurrence(1, "2023-01-09")[0]
+    
+    assert tracker.delete_recurring(1)[0]
+    assert tracker.get_occurrences("2023", "2023") == []
+    assert tracker.count_transactions() == 1
+    assert tracker.get_balance()["expenses"] == 1000
+    tracker.close()
+
+
+@pytest.mark.parametrize("kind", BACKENDS)
+def test_rules_and_summary_sit_beside_the_ledger(workdir, kind):
+    tracker = BudgetTracker(create_storage(kind))
+    assert tracker.add_recurring("1500", "Salary", "", "income", "monthly", start="2023-01-01")[0]
+    tracker.close()
+    
+    assert os.path.exists("budget_data.recurring.json")
+    assert os.path.exists("budget_data.summary.json")
+    assert not os.path.exists(os.path.join("budget_data", "manifest.recurring.json"))
+    
+    tracker = BudgetTracker(create_storage(kind))
+    assert [rule["id"] for rule in tracker.get_recurring()] == [1]
+    tracker.close()
+
+
+def test_bad_dates_are_rejected(workdir):
+    tracker = BudgetTracker(create_storage("journal"))
+    assert tracker.add_recurring("10", "Gym", "Daily pass", "expense", "daily", start="2023-01-01")[0]
+    
+    for date in ("junk", "2023-02-30", "2023-1-5"):
+        success, message = tracker.skip_occurrence(1, date)
+        assert not success
+        assert "YYYY-MM-DD" in message
+    assert tracker.get_recurring()[0]["exceptions"] == {}
+    
+    # A junk end bound would otherwise expand the rule out to year 9999
+    for start, end in (("2023", "junk"), ("junk", None), ("2023-13", None), ("2023-02-30", "2024"), ("23", None)):
+        for method in (tracker.get_occurrences, tracker.get_period_summary, tracker.build_report):
+            with pytest.raises(ValueError, match="YYYY"):
+                method(start, end)
+    tracker.close()
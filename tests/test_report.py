@@ -0,0 +1,30 @@
+import os
+
+import ledger
+from ledger import BudgetTracker, create_storage
+
+
+def test_report_workers_match_a_single_process(workdir, monkeypatch):
+    tracker = BudgetTracker(create_storage("sqlite"))
+    tracker.import_transactions(
+        (i, {"id": None, "date": f"2023-{i % 12 + 1:02d}-{i % 28 + 1:02d}", "type": "expense" if i % 3 else "income",
+             "amount": f"{i}.{i % 100:02d}", "category": f"Category {i % 5}", "description": f"Row {i}"})
+        for i in range(1, 301))
+    
+    single = tracker.build_report(workers=1)
+    assert single["workers"] == 1
+    
+    # Small chunks and a profiling environment the workers inherit
+    monkeypatch.setattr(ledger, "REPORT_MIN_CHUNK_ROWS", 50)
+    monkeypatch.setenv("COINCOMPASS_PROFILE", "cprofile")
+    parallel = tracker.build_report(workers=2)
+    assert parallel["workers"] == 2
+    assert parallel["sources"] > 1
+    
+    for key in ("income", "expenses", "balance", "categories", "months", "types", "rows"):
+        assert parallel[key] == single[key]
+    
+    # Workers must not dump stats over the parent's files
+    assert not os.path.exists("coincompass_stats.json")
+    assert not os.path.exists("coincompass.prof")
+    tracker.close()
@@ -0,0 +1,75 @@
+import pytest
+
+from ledger import BudgetTracker, SearchIndex, create_storage
+
+
+def row(transaction_id, description, category="Food"):
+    return {"id": transaction_id, "description": description, "category": category}
+
+
+def test_index_lookup_prefix_and_whole_words():
+    index = SearchIndex()
+    index.add_many([row(1, "Coffee at Joe's"), row(2, "Coffee beans"), row(3, "Cola", "Drinks")])
+    
+    assert index.lookup("co") == {1, 2, 3}
+    assert index.lookup("coffee be") == {2}
+    # A trailing space makes the last word whole
+    assert index.lookup("co ") == set()
+    assert index.lookup("drinks") == {3}
+    assert index.lookup("  ") is None
+    
+    index.remove(row(2, "Coffee beans"))
+    assert index.lookup("be") == set()
+    assert "beans" not in index.words
+    index.add(row(4, "Bean stew"))
+    assert index.lookup("bean") == {4}
+    assert index.words == sorted(index.postings)
+
+
+def brute_search(tracker, text):
+    words = text.lower().split()
+    results = []
+    for t in tracker.get_transactions():
+        haystack = (t["description"] + " " + t["category"]).lower().replace("'", " ").split()
+        if all(any(word == w or (i == len(words) - 1 and w.startswith(word)) for w in haystack)
+               for i, word in enumerate(words)):
+            results.append(t["id"])
+    return sorted(results)
+
+
+@pytest.mark.parametrize("kind", ["journal", "columnar", "sqlite"])
+def test_search_follows_edits_and_deletes(workdir, kind):
+    tracker = BudgetTracker(create_storage(kind), debug=True)
+    descriptions = ["Coffee beans", "Coffee at work", "Train ticket", "Train coffee", "Groceries"]
+    for i, description in enumerate(descriptions):
+        assert tracker.add_transaction("5", "Food" if i % 2 else "Travel", description, "expense", "2024-01-05")[0]
+    
+    # The index is built on the first search, then kept up to date
+    queries = ["coff", "coffee ", "train", "travel co", "gro", "beans"]
+    for query in queries:
+        assert sorted(t["id"] for t in tracker.search(query)) == brute_search(tracker, query)
+    
+    assert tracker.update_transaction(1, description="Tea leaves")[0]
+    assert tracker.update_transaction(3, category="Commute")[0]
+    assert tracker.delete_transaction(2)[0]
+    assert tracker.add_transaction("7", "Food", "Iced coffee", "expense", "2024-01-06")[0]
+    assert tracker.update_transactions([4, 5], description="Weekly shop")[0]
+    assert tracker.delete_transactions([6])[0]
+    
+    for query in queries + ["tea", "commute", "weekly sh", "iced"]:
+        assert sorted(t["id"] for t in tracker.search(query)) == brute_search(tracker, query), query
+    assert tracker.search("coffee") == []
+    tracker.close()
+
+
+def test_search_filters(workdir):
+    tracker = BudgetTracker(create_storage("journal"))
+    tracker.add_transaction("5", "Food", "Lunch", "expense", "2024-01-05")
+    tracker.add_transaction("50", "Food", "Lunch party", "expense", "2024-02-05")
+    tracker.add_transaction("500", "Salary", "Lunch money", "income", "2024-02-06")
+    
+    assert [t["id"] for t in tracker.search("lunch")] == [3, 2, 1]
+    assert [t["id"] for t in tracker.search("lunch", category="Food", start="2024-02")] == [2]
+    assert [t["id"] for t in tracker.search(transaction_type="income")] == [3]
+    assert [t["id"] for t in tracker.search(min_amount=1000, max_amount=5000)] == [2]
+    tracker.close()
@@ -0,0 +1,166 @@
+import os
+
+import pytest
+
+from ledger import BudgetTracker, JournalStorage, PartitionedStorage, SQLiteStorage, create_storage
+
+BACKENDS = ["json", "journal", "columnar", "binary", "partitioned", "sqlite"]
+
+
+def fill(tracker):
+    """Add a year of transactions, then update and delete a few"""
+    for month in range(1, 13):
+        assert tracker.add_transaction("1500", "Salary", "Pay", "income", f"2023-{month:02d}-01")[0]
+        assert tracker.add_transaction(f"{month}.05", "Food", f"Lunch {month}", "expense", f"2023-{month:02d}-15")[0]
+    assert tracker.update_transaction(2, amount="7.25", category="Dining")[0]
+    assert tracker.update_transaction(4, date="2024-02-29")[0]
+    assert tracker.delete_transaction(3)[0]
+
+
+def ledger_state(tracker):
+    return (
+        sorted((t["id"], t["date"], t["type"], t["amount"], t["category"], t["description"])
+               for t in tracker.get_transactions()),
+        tracker.get_balance(),
+        tracker.get_category_summary(),
+        tracker.get_period_summary("2023-03", "2023-03"),
+    )
+
+
+@pytest.mark.parametrize("kind", BACKENDS)
+def test_round_trip_and_reopen(workdir, kind):
+    tracker = BudgetTracker(create_storage(kind))
+    fill(tracker)
+    state = ledger_state(tracker)
+    assert len(state[0]) == 23
+    tracker.close()
+    
+    tracker = BudgetTracker(create_storage(kind))
+    assert ledger_state(tracker) == state
+    assert tracker.add_transaction("1", "Food", "", "expense", "2024-03-01")[0]
+    assert max(t["id"] for t in tracker.get_transactions()) == 25
+    tracker.close()
+
+
+@pytest.mark.parametrize("kind", BACKENDS)
+def test_lazy_reopen_matches_eager(workdir, kind):
+    tracker = BudgetTracker(create_storage(kind))
+    fill(tracker)
+    state = ledger_state(tracker)
+    tracker.close()
+    
+    tracker = BudgetTracker(create_storage(kind), lazy=True)
+    for _ in tracker.load_steps(chunk_size=5):
+        pass
+    assert ledger_state(tracker) == state
+    tracker.close()
+
+
+def test_journal_reopens_after_compaction(workdir):
+    tracker = BudgetTracker(JournalStorage(compact_threshold=5))
+    fill(tracker)
+    state = ledger_state(tracker)
+    tracker.close()
+    
+    tracker = BudgetTracker(JournalStorage(compact_threshold=5))
+    assert ledger_state(tracker) == state
+    tracker.close()
+
+
+def test_lazy_sqlite_tracker_reads_before_load(workdir):
+    tracker = BudgetTracker(SQLiteStorage())
+    tracker.add_transaction("12.34", "Food", "Lunch", "expense", "2024-01-05")
+    tracker.close()
+    
+    # The app draws every tab before it starts loading
+    tracker = BudgetTracker(create_storage("sqlite"), lazy=True)
+    assert tracker.count_transactions() == 0
+    assert tracker.get_transactions(offset=0, limit=50) == []
+    # Recent rows come from the summary saved at the last close
+    assert [t["amount"] for t in tracker.get_recent()] == [1234]
+    assert tracker.get_transaction(1) is None
+    assert tracker.search("lunch") == []
+    tracker.get_balance()
+    tracker.get_category_summary()
+    tracker.get_period_summary()
+    
+    tracker.load_data()
+    assert tracker.count_transactions() == 1
+    assert [t["amount"] for t in tracker.get_transactions()] == [1234]
+    assert tracker.get_balance()["balance"] == -1234
+    tracker.close()
+
+
+@pytest.mark.parametrize("kind", ["binary", "partitioned", "sqlite"])
+def test_json_ledger_is_migrated_on_first_use(workdir, kind):
+    tracker = BudgetTracker(create_storage("json"))
+    fill(tracker)
+    state = ledger_state(tracker)
+    tracker.close()
+    
+    tracker = BudgetTracker(create_storage(kind))
+    assert ledger_state(tracker) == state
+    tracker.close()
+
+
+@pytest.mark.parametrize("kind", ["journal", "columnar"])
+def test_appends_after_a_torn_journal_line_survive(workdir, kind):
+    tracker = BudgetTracker(create_storage(kind))
+    fill(tracker)
+    tracker.storage.compact()
+    for day in range(1, 4):
+        assert tracker.add_transaction("5", "Food", "", "expense", f"2024-03-0{day}")[0]
+    tracker.close()
+    
+    # An append cut short by a crash
+    with open("budget_data.journal", "a") as file:
+        file.write('{"op": "add", "transaction": {"id": 99, "da')
+    
+    tracker = BudgetTracker(create_storage(kind))
+    assert tracker.count_transactions() == 26
+    for day in range(4, 7):
+        assert tracker.add_transaction("5", "Food", "", "expense", f"2024-03-0{day}")[0]
+    state = ledger_state(tracker)
+    tracker.close()
+    
+    tracker = BudgetTracker(create_storage(kind))
+    assert tracker.count_transactions() == 29
+    assert ledger_state(tracker) == state
+    tracker.close()
+
+
+def test_close_writes_the_ledger_when_the_summary_cannot_be_saved(workdir):
+    tracker = BudgetTracker(create_storage("journal"))
+    assert tracker.add_transaction("12.34", "Food", "Lunch", "expense", "2024-01-05")[0]
+    
+    # Something in the way of the summary file
+    os.mkdir("budget_data.summary.json.tmp")
+    with pytest.raises(OSError):
+        tracker.close()
+    assert tracker.storage.worker is None
+    os.rmdir("budget_data.summary.json.tmp")
+    
+    tracker = BudgetTracker(create_storage("journal"))
+    assert tracker.count_transactions() == 1
+    tracker.close()
+
+
+def test_emptied_partition_stays_empty_after_a_crash(workdir, monkeypatch):
+    tracker = BudgetTracker(PartitionedStorage())
+    fill(tracker)
+    march = [t["id"] for t in tracker.get_transactions() if t["date"].startswith("2023-03")]
+    assert len(march) == 2
+    
+    # Crash between the manifest write and removing the emptied partition
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "remove", lambda path: None)
+        assert tracker.delete_transactions(march)[0]
+        state = ledger_state(tracker)
+        tracker.close()
+    assert os.path.exists(os.path.join("budget_data", "2023-03.json"))
+    
+    tracker = BudgetTracker(PartitionedStorage())
+    assert tracker.count_transactions() == 21
+    assert ledger_state(tracker) == state
+    tracker.close()
+    assert not os.path.exists(os.path.join("budget_data", "2023-03.json"))